@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+
+"""
+Script that pulls the docker images listed in the docker-prefetch-images attribute in
+the background after boot, so that they are present when the user first runs them.
+
+Pulls are limited to a number of concurrent pulls, and their starts are paced to a
+maximum average bandwidth. Note that the bandwidth of a pull itself isn't limited: the
+layers are transferred (and extracted) by the docker daemon, which also serves the
+pulls of the user, so a single large image is still pulled at the full speed of the
+network. Only the bytes a pull actually downloaded (the compressed layers that weren't
+present yet, sized from the manifest in the registry) delay the following pulls.
+
+Images referenced by digest that are already present are skipped without contacting
+the registry, for images referenced by tag docker itself only transfers the layers
+that are missing.
+
+The progress is written to a status file (for the user, e.g. `jq . <status file>`)
+and as Prometheus metrics.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+import json
+import logging
+from pathlib import Path
+import re
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+
+from workbench_utils import parse_size
+
+STATUS_PATH = Path("/run/docker-prefetch-images/status.json")
+METRICS_PATH = Path("/var/lib/workbench-metrics/docker-prefetch-images.prom")
+# Progress line of a layer in the output of docker pull, named by the first 12 hex
+# digits of the digest of the (compressed) layer.
+LAYER_PATTERN = re.compile(r"^(?P<layer>[0-9a-f]{12}): Pull complete$")
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+@dataclass
+class ImageStatus:
+    """Prefetch status of an image."""
+
+    image: str
+    state: str = "pending"  # pending, pulling, pulled, present, failed
+    size: Optional[int] = None
+    downloaded: Optional[int] = None
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+class Pacer:  # pylint: disable=too-few-public-methods
+    """
+    Paces the start of pulls to a maximum average bandwidth. The bytes of a pull are
+    transferred by the docker daemon at full speed, so they are accounted after each
+    pull and the next pull is delayed until the average rate since the start is back
+    under the limit.
+    """
+
+    def __init__(self, rate: int) -> None:
+        self.rate = rate
+        self.start = time.monotonic()
+        self.transferred = 0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Blocks until the next pull may start."""
+
+        with self.lock:
+            delay = self.start + self.transferred / self.rate - time.monotonic()
+        if delay > 0:
+            logging.info(f"Pacing pulls, waiting {delay:.0f}s")
+            time.sleep(delay)
+
+    def add(self, size: int) -> None:
+        """Accounts the bytes downloaded by a finished pull."""
+
+        with self.lock:
+            self.transferred += size
+
+
+class Prefetcher:
+    """Pulls the images, keeping track of their status."""
+
+    def __init__(self, images: List[str], rate: int, status_path: Path) -> None:
+        self.statuses: Dict[str, ImageStatus] = {
+            image: ImageStatus(image) for image in images
+        }
+        self.pacer = Pacer(rate)
+        self.status_path = status_path
+        self.lock = threading.Lock()
+        self.write_status()
+
+    def prefetch(self, image: str) -> None:
+        """Pulls an image (unless it's already present)."""
+
+        status = self.statuses[image]
+        if "@sha256:" in image:
+            size = image_size(image)
+            if size is not None:
+                logging.info(f"{image} is already present, skipping")
+                self.update(status, state="present", size=size)
+                return
+
+        self.pacer.wait()
+        self.update(status, state="pulling")
+        start = time.perf_counter()
+        result = subprocess.run(
+            ["docker", "pull", image],
+            check=False,
+            capture_output=True,
+            text=True,
+        )
+        seconds = time.perf_counter() - start
+
+        if result.returncode != 0:
+            logging.warning(f"Failed to pull {image}: {result.stderr.strip()}")
+            self.update(
+                status, state="failed", seconds=seconds, error=result.stderr.strip()
+            )
+            return
+
+        size = image_size(image) or 0
+        downloaded = downloaded_size(image, result.stdout, size)
+        self.pacer.add(downloaded)
+        logging.info(
+            f"Pulled {image} ({size} bytes, {downloaded} downloaded) in {seconds:.1f}s"
+        )
+        self.update(
+            status, state="pulled", size=size, downloaded=downloaded, seconds=seconds
+        )
+
+    def update(self, status: ImageStatus, **values: object) -> None:
+        """Updates the status of an image and writes the status file."""
+
+        with self.lock:
+            for name, value in values.items():
+                setattr(status, name, value)
+            self.write_status()
+
+    def write_status(self) -> None:
+        """Writes the status of all images."""
+
+        statuses = list(self.statuses.values())
+        complete = all(
+            status.state not in ("pending", "pulling") for status in statuses
+        )
+        temp_path = self.status_path.with_suffix(".tmp")
+        temp_path.write_text(
+            json.dumps(
+                {
+                    "complete": complete,
+                    "images": [asdict(status) for status in statuses],
+                },
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+        temp_path.rename(self.status_path)
+
+    def write_metrics(self, path: Path, seconds: float) -> None:
+        """Writes the Prometheus metrics of the prefetch."""
+
+        counts: Dict[str, int] = {}
+        for status in self.statuses.values():
+            counts[status.state] = counts.get(status.state, 0) + 1
+
+        lines = [
+            "# HELP docker_prefetch_images Number of prefetched images per state.",
+            "# TYPE docker_prefetch_images gauge",
+            *[
+                f'docker_prefetch_images{{state="{state}"}} {count}'
+                for state, count in sorted(counts.items())
+            ],
+            "# HELP docker_prefetch_seconds Time taken to prefetch all images.",
+            "# TYPE docker_prefetch_seconds gauge",
+            f"docker_prefetch_seconds {seconds}",
+            "# HELP docker_prefetch_pull_seconds Time taken to pull an image.",
+            "# TYPE docker_prefetch_pull_seconds gauge",
+            *[
+                f'docker_prefetch_pull_seconds{{image="{status.image}"}} {status.seconds}'
+                for status in self.statuses.values()
+                if status.seconds is not None
+            ],
+        ]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def main() -> None:
+    """Main function that prefetches the images."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--images", required=True, help="Semicolon-separated image references"
+    )
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--rate", default="50M", help="Maximum bytes per second")
+    parser.add_argument("--status-file", type=Path, default=STATUS_PATH)
+    parser.add_argument("--metrics-file", type=Path, default=METRICS_PATH)
+    args = parser.parse_args()
+
+    images = list(
+        dict.fromkeys(
+            image.strip() for image in args.images.split(";") if image.strip()
+        )
+    )
+    args.status_file.parent.mkdir(parents=True, exist_ok=True)
+    prefetcher = Prefetcher(images, parse_size(args.rate), args.status_file)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(prefetcher.prefetch, images))
+    seconds = time.perf_counter() - start
+
+    prefetcher.write_metrics(args.metrics_file, seconds)
+    logging.info(f"Prefetched {len(images)} images in {seconds:.1f}s")
+
+
+def image_size(image: str) -> Optional[int]:
+    """Returns the size of a local image (None if it isn't present)."""
+
+    result = subprocess.run(
+        ["docker", "image", "inspect", "--format", "{{.Size}}", image],
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    return int(result.stdout) if result.returncode == 0 else None
+
+
+def downloaded_size(image: str, output: str, size: int) -> int:
+    """
+    Returns the bytes downloaded by a pull: the compressed size of the layers that were
+    pulled (per the output of docker pull), as listed in the manifest of the image. If
+    the manifest isn't available, the (uncompressed) size of the image is used if any
+    layer was pulled.
+    """
+
+    pulled = [
+        match.group("layer")
+        for match in map(LAYER_PATTERN.match, output.splitlines())
+        if match is not None
+    ]
+    if not pulled:
+        return 0
+
+    result = subprocess.run(
+        ["docker", "manifest", "inspect", "--verbose", image],
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return size
+
+    # A list of manifests (one per platform) for multi-platform images.
+    manifests = json.loads(result.stdout)
+    layer_sizes = {}
+    for entry in manifests if isinstance(manifests, list) else [manifests]:
+        manifest = entry.get("SchemaV2Manifest") or entry.get("OCIManifest") or {}
+        for layer in manifest.get("layers", []):
+            layer_sizes[layer["digest"].split(":")[-1][:12]] = int(layer["size"])
+    if not all(layer in layer_sizes for layer in pulled):
+        return size
+    return sum(layer_sizes[layer] for layer in pulled)
+
+
+if __name__ == "__main__":
+    main()
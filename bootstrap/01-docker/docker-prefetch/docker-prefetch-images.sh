@@ -0,0 +1,21 @@
+#!/usr/bin/env bash
+
+set -o errexit
+set -o pipefail
+set -o nounset
+
+get_attribute() {
+    curl --fail "http://metadata.google.internal/computeMetadata/v1/instance/attributes/$1" -H "Metadata-Flavor: Google"
+}
+
+set +o errexit
+DOCKER_PREFETCH_IMAGES=$(get_attribute docker-prefetch-images)
+DOCKER_PREFETCH_IMAGES_SET=$?
+set -o errexit
+
+if [ $DOCKER_PREFETCH_IMAGES_SET -eq 0 ]; then
+    python3 /opt/docker-prefetch/docker-prefetch-images.py \
+        --images "${DOCKER_PREFETCH_IMAGES}" \
+        --concurrency "$(get_attribute docker-prefetch-concurrency || echo 2)" \
+        --rate "$(get_attribute docker-prefetch-rate || echo 50M)"
+fi
@@ -0,0 +1,86 @@
+#!/usr/bin/env bash
+
+# Configures the storage of docker on boot, before docker is started: places the data
+# root of docker (images, containers, build cache) on the volume chosen using the
+# docker-storage-volume attribute, and configures the (optional) pull-through registry
+# mirror that is run by docker-registry-mirror.service, with its storage on the same
+# volume. Both are written into /etc/docker/daemon.json, keeping the other settings.
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+USER_HOME_DIR=/home/ubuntu
+LOCAL_SSD_MOUNT_DIR=/mnt/disks/local-ssd
+DAEMON_CONFIG=/etc/docker/daemon.json
+MIRROR_PORT=5000
+
+get_attribute() {
+    curl --fail "http://metadata.google.internal/computeMetadata/v1/instance/attributes/$1" -H "Metadata-Flavor: Google"
+}
+
+STORAGE_VOLUME=$(get_attribute docker-storage-volume || echo data-disk)
+REGISTRY_MIRROR=$(get_attribute docker-registry-mirror || echo false)
+REGISTRY_MIRROR_UPSTREAM=$(get_attribute docker-registry-mirror-upstream || echo https://registry-1.docker.io)
+
+case ${STORAGE_VOLUME} in
+    boot-disk)
+        STORAGE_ROOT=/var/lib
+        ;;
+    data-disk)
+        # Excluded from the ownership fix of the home dir (see mount-data-disk.sh).
+        STORAGE_ROOT=${USER_HOME_DIR}/.docker-storage
+        ;;
+    local-ssd)
+        if mountpoint -q ${LOCAL_SSD_MOUNT_DIR} ; then
+            STORAGE_ROOT=${LOCAL_SSD_MOUNT_DIR}/docker-storage
+        else
+            echo "No local SSD mounted, using the data disk for docker"
+            STORAGE_ROOT=${USER_HOME_DIR}/.docker-storage
+        fi
+        ;;
+    /*)
+        STORAGE_ROOT=${STORAGE_VOLUME}
+        ;;
+    *)
+        echo "Unsupported docker storage volume: ${STORAGE_VOLUME}"
+        exit 1
+        ;;
+esac
+
+# Only the data root itself is restricted (like docker's default /var/lib/docker), the
+# storage root may be a shared dir such as /var/lib or a custom path.
+DATA_ROOT=${STORAGE_ROOT}/docker
+mkdir -p ${DATA_ROOT}
+chown root:root ${DATA_ROOT}
+chmod 710 ${DATA_ROOT}
+
+if [ ! -f ${DAEMON_CONFIG} ]; then
+    mkdir -p "$(dirname ${DAEMON_CONFIG})"
+    echo "{}" > ${DAEMON_CONFIG}
+fi
+
+if [ "${REGISTRY_MIRROR}" == "true" ]; then
+    MIRRORS="[\"http://127.0.0.1:${MIRROR_PORT}\"]"
+    mkdir -p ${STORAGE_ROOT}/registry-mirror
+else
+    MIRRORS="[]"
+fi
+
+jq --arg data_root ${DATA_ROOT} --argjson mirrors "${MIRRORS}" \
+    '. + {"data-root": $data_root, "registry-mirrors": $mirrors}' ${DAEMON_CONFIG} > ${DAEMON_CONFIG}.tmp
+mv ${DAEMON_CONFIG}.tmp ${DAEMON_CONFIG}
+
+# Used by docker-registry-mirror.service.
+cat << EOF > /run/docker-storage.env
+DOCKER_REGISTRY_MIRROR=${REGISTRY_MIRROR}
+DOCKER_REGISTRY_MIRROR_DIR=${STORAGE_ROOT}/registry-mirror
+DOCKER_REGISTRY_MIRROR_PORT=${MIRROR_PORT}
+DOCKER_REGISTRY_MIRROR_UPSTREAM=${REGISTRY_MIRROR_UPSTREAM}
+EOF
+
+# The pull metrics are written by docker-pull-timed, which is run by the user.
+mkdir -p /var/lib/workbench-metrics
+touch /var/lib/workbench-metrics/docker-pull.prom
+chown ubuntu:ubuntu /var/lib/workbench-metrics/docker-pull.prom
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+"""
+Pulls docker images (like `docker pull`), recording the time taken by each pull as
+Prometheus metrics, labelled with whether the pull went through the registry mirror.
+E.g. to compare a cold pull with a pull served by the mirror:
+
+  docker-pull-timed python:3.10
+  docker image rm python:3.10
+  docker-pull-timed python:3.10
+"""
+
+import argparse
+import json
+import logging
+from pathlib import Path
+import re
+import subprocess
+import time
+from typing import Dict, Tuple
+
+METRICS_PATH = Path("/var/lib/workbench-metrics/docker-pull.prom")
+METRIC_LINE = re.compile(r'^(docker_pull_\w+)\{image="([^"]*)",mirror="(\w+)"\} (\S+)$')
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+def main() -> None:
+    """Main function that pulls the images."""
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--metrics-file", type=Path, default=METRICS_PATH)
+    args = parser.parse_args()
+
+    mirror = "true" if uses_mirror() else "false"
+    metrics = read_metrics(args.metrics_file)
+
+    for image in args.images:
+        start = time.perf_counter()
+        subprocess.run(["docker", "pull", image], check=True)
+        seconds = time.perf_counter() - start
+        size = image_size(image)
+        logging.info(
+            f"Pulled {image} ({size} bytes) in {seconds:.1f}s, mirror={mirror}"
+        )
+
+        metrics[("docker_pull_seconds", image, mirror)] = seconds
+        metrics[("docker_pull_bytes", image, mirror)] = float(size)
+        count = metrics.get(("docker_pull_total", image, mirror), 0.0)
+        metrics[("docker_pull_total", image, mirror)] = count + 1
+
+    write_metrics(args.metrics_file, metrics)
+
+
+def uses_mirror() -> bool:
+    """Whether docker is configured to pull through a registry mirror."""
+
+    output = subprocess.run(
+        ["docker", "info", "--format", "{{json .RegistryConfig.Mirrors}}"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return bool(json.loads(output or "null"))
+
+
+def image_size(image: str) -> int:
+    """Returns the size of a pulled image in bytes."""
+
+    output = subprocess.run(
+        ["docker", "image", "inspect", "--format", "{{.Size}}", image],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return int(output)
+
+
+def read_metrics(path: Path) -> Dict[Tuple[str, str, str], float]:
+    """Reads the metrics of earlier pulls, keyed by (metric, image, mirror)."""
+
+    metrics = {}
+    if path.exists():
+        for line in path.read_text(encoding="utf-8").splitlines():
+            match = METRIC_LINE.match(line)
+            if match:
+                name, image, mirror, value = match.groups()
+                metrics[(name, image, mirror)] = float(value)
+    return metrics
+
+
+def write_metrics(path: Path, metrics: Dict[Tuple[str, str, str], float]) -> None:
+    """Writes the metrics of all pulls."""
+
+    help_texts = {
+        "docker_pull_seconds": ("gauge", "Time taken by the last pull of the image."),
+        "docker_pull_bytes": ("gauge", "Size of the image at its last pull."),
+        "docker_pull_total": ("counter", "Number of timed pulls of the image."),
+    }
+    lines = []
+    for name, (metric_type, help_text) in help_texts.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+        for (metric, image, mirror), value in sorted(metrics.items()):
+            if metric == name:
+                lines.append(f'{name}{{image="{image}",mirror="{mirror}"}} {value}')
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env bash
+
+# Runs the pull-through registry mirror (when enabled using the docker-registry-mirror
+# attribute), which caches the image layers pulled from the upstream registry on the
+# docker storage volume, so that repeated pulls are served locally. The registry image
+# is loaded from the tarball saved at build time, so no pull is needed on boot.
+#
+# The upstream can be pointed to another registry using the
+# docker-registry-mirror-upstream attribute, e.g. a local stand-in for tests:
+#   docker run -d -p 5001:5000 registry:2  # + push test images to localhost:5001
+# with docker-registry-mirror-upstream set to http://<host IP>:5001.
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+REGISTRY_IMAGE_TARBALL=/opt/docker-storage/registry.tar
+REGISTRY_IMAGE=registry:2.8.1
+CONTAINER_NAME=registry-mirror
+
+# Written by configure-docker-storage.sh.
+source /run/docker-storage.env
+
+if [ "${DOCKER_REGISTRY_MIRROR}" != "true" ]; then
+    echo "Registry mirror is not enabled, skipping"
+    exit 0
+fi
+
+if ! docker image inspect ${REGISTRY_IMAGE} > /dev/null 2>&1 ; then
+    docker load --input ${REGISTRY_IMAGE_TARBALL}
+fi
+
+docker rm --force ${CONTAINER_NAME} > /dev/null 2>&1 || true
+exec docker run --rm --name ${CONTAINER_NAME} \
+    --publish 127.0.0.1:${DOCKER_REGISTRY_MIRROR_PORT}:5000 \
+    --volume ${DOCKER_REGISTRY_MIRROR_DIR}:/var/lib/registry \
+    --env REGISTRY_PROXY_REMOTEURL=${DOCKER_REGISTRY_MIRROR_UPSTREAM} \
+    --env REGISTRY_STORAGE_DELETE_ENABLED=true \
+    ${REGISTRY_IMAGE}
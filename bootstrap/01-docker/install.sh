@@ -5,8 +5,13 @@ set -o pipefail
 set -o nounset
 set -o xtrace
 
-apt-get update
-apt-get install -y ca-certificates curl gnupg lsb-release
+SCRIPT_DIR=`dirname $0 | xargs realpath`
+
+# Install dependencies (unless already installed in a batch by build-runner.py).
+if [ -z "${WORKBENCH_APT_BATCHED:-}" ]; then
+    apt-get update
+    apt-get install -y ca-certificates curl gnupg lsb-release
+fi
 
 curl -fsSL https://download.docker.com/linux/ubuntu/gpg | gpg --dearmor -o /usr/share/keyrings/docker-archive-keyring.gpg
 
@@ -18,3 +23,31 @@ apt-get update
 apt-get install -y docker-ce docker-ce-cli containerd.io
 
 usermod -aG docker ubuntu
+
+# Install scripts.
+mkdir -p /opt/docker-storage
+cp ${SCRIPT_DIR}/docker-storage/* /opt/docker-storage/
+
+# Install the CLI for timing pulls.
+chmod +x /opt/docker-storage/docker-pull-timed.py
+ln -sf /opt/docker-storage/docker-pull-timed.py /usr/local/bin/docker-pull-timed
+
+# Save the image of the registry mirror, so that it can be run without pulling on boot
+# (and is kept when the data root of docker is moved).
+docker pull registry:2.8.1
+docker save --output /opt/docker-storage/registry.tar registry:2.8.1
+docker image rm registry:2.8.1
+
+# Install + enable services that configure the storage of docker on boot (before docker
+# is started) and run the registry mirror.
+cp ${SCRIPT_DIR}/docker-storage.service /etc/systemd/system/
+cp ${SCRIPT_DIR}/docker-registry-mirror.service /etc/systemd/system/
+systemctl enable docker-storage
+systemctl enable docker-registry-mirror
+
+# Install + enable service that prefetches the images listed in the
+# docker-prefetch-images attribute in the background after boot.
+mkdir -p /opt/docker-prefetch
+cp ${SCRIPT_DIR}/docker-prefetch/* /opt/docker-prefetch/
+cp ${SCRIPT_DIR}/docker-prefetch-images.service /etc/systemd/system/
+systemctl enable docker-prefetch-images
@@ -7,11 +7,26 @@ set -o xtrace
 
 SCRIPT_DIR=`dirname $0 | xargs realpath`
 
-apt-get update
-apt-get install -y jq
+# Install dependencies (unless already installed in a batch by build-runner.py).
+if [ -z "${WORKBENCH_APT_BATCHED:-}" ]; then
+    apt-get update
+    apt-get install -y jq
+fi
 
 mkdir -p /opt/workbench-bootstrap
 cp ${SCRIPT_DIR}/workbench-bootstrap/* /opt/workbench-bootstrap/
 
-cp ${SCRIPT_DIR}/workbench-bootstrap.service /etc/systemd/system/workbench-bootstrap.service
-systemctl enable workbench-bootstrap
+# Install the tool for analysing the critical path of the boot.
+chmod +x /opt/workbench-bootstrap/boot-analysis.py
+ln -sf /opt/workbench-bootstrap/boot-analysis.py /usr/local/bin/workbench-boot-analysis
+
+# Install the benchmark of the storage tiers (home, boot disk, local SSD, bucket mounts).
+chmod +x /opt/workbench-bootstrap/storage-benchmark.py
+ln -sf /opt/workbench-bootstrap/storage-benchmark.py /usr/local/bin/workbench-storage-benchmark
+
+# Mounting the disks and registering on the proxy are separate services, so that the
+# registration can run in parallel to the rest of the boot.
+cp ${SCRIPT_DIR}/workbench-disks.service /etc/systemd/system/
+cp ${SCRIPT_DIR}/workbench-proxy-registration.service /etc/systemd/system/
+systemctl enable workbench-disks
+systemctl enable workbench-proxy-registration
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+"""
+Reports the critical path of the current boot, from the start of the kernel to the
+first request that was proxied to the IDE, based on the timestamps of the units
+involved and the journal.
+
+The IDE can only serve the first request once both of the following chains have
+finished, the chain that finished last is on the critical path:
+* IDE: mounting the disks, bootstrapping the users home dir, starting the IDE.
+* Proxy: configuring the storage of Docker (which needs the disks), starting Docker
+  and registering the VM on the inverting proxy.
+
+The first proxied request is taken from the log of the IDE front proxy when it is
+enabled (see the ide-front-proxy attribute), which only logs requests sent by a browser.
+Otherwise, the first connection to the IDE port is reported instead: the activation of
+openvscode-server-proxy.service by openvscode-server.socket (in socket mode, once the
+server started by that connection is ready). Note that this connection may be a health
+check of the proxy agent rather than the first request of a user.
+"""
+
+import argparse
+from dataclasses import asdict, dataclass
+import json
+import subprocess
+from typing import Dict, List, Optional
+
+CHAINS = {
+    "ide": [
+        "workbench-disks.service",
+        "user-bootstrap.service",
+        "openvscode-server-bootstrap.service",
+        "openvscode-server.service",
+    ],
+    "proxy": [
+        "docker-storage.service",
+        "docker.service",
+        "workbench-proxy-registration.service",
+    ],
+}
+
+FIRST_REQUEST_UNIT = "ide-front-proxy.service"
+FIRST_REQUEST_MESSAGE = "First proxied request"
+# Started by openvscode-server.socket on the first connection to the IDE port.
+FIRST_CONNECTION_UNIT = "openvscode-server-proxy.service"
+
+
+@dataclass
+class Step:
+    """Step of the boot, with its start and end in seconds since the kernel started."""
+
+    name: str
+    start: Optional[float]
+    end: Optional[float]
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Time taken by the step (None if it didn't run or finish)."""
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+
+def main() -> None:
+    """Main function that prints the boot analysis."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    system = get_system_steps()
+    chains = {
+        name: [get_unit_step(unit) for unit in units] for name, units in CHAINS.items()
+    }
+    critical_chain = max(chains, key=lambda name: chain_end(chains[name]))
+    first_request = get_first_request()
+    first_request_name = "first proxied request"
+    if first_request is None:
+        first_request = get_unit_step(FIRST_CONNECTION_UNIT).start
+        first_request_name = "first connection to the IDE"
+
+    critical_path = system + chains[critical_chain]
+    if first_request is not None:
+        critical_path.append(
+            Step(
+                name=first_request_name,
+                start=chain_end(chains[critical_chain]),
+                end=first_request,
+            )
+        )
+
+    if args.json:
+        report = {
+            "critical_chain": critical_chain,
+            "critical_path": [
+                {**asdict(step), "duration": step.duration} for step in critical_path
+            ],
+            "chains": {
+                name: [{**asdict(step), "duration": step.duration} for step in steps]
+                for name, steps in chains.items()
+            },
+            "first_proxied_request": first_request,
+            "first_proxied_request_source": first_request_name,
+        }
+        print(json.dumps(report, indent=2))
+        return
+
+    print("Critical path (seconds since kernel start):")
+    print_steps(critical_path)
+    for name, steps in chains.items():
+        if name != critical_chain:
+            print(f"\nParallel chain '{name}':")
+            print_steps(steps)
+
+    if first_request is None:
+        print("\nNo proxied request or connection to the IDE seen yet.")
+    else:
+        print(f"\n{first_request_name.capitalize()} at {first_request:.3f}s")
+
+
+def print_steps(steps: List[Step]) -> None:
+    """Prints the steps as a table."""
+
+    print(f"{'STEP':<40} {'START':>9} {'END':>9} {'DURATION':>9}")
+    for step in steps:
+        print(
+            f"{step.name:<40} {format_seconds(step.start):>9}"
+            f" {format_seconds(step.end):>9} {format_seconds(step.duration):>9}"
+        )
+
+
+def format_seconds(value: Optional[float]) -> str:
+    """Formats a number of seconds (or '-' if unknown)."""
+    return "-" if value is None else f"{value:.3f}"
+
+
+def chain_end(steps: List[Step]) -> float:
+    """Returns the time at which the last step of a chain ended."""
+    return max((step.end for step in steps if step.end is not None), default=0.0)
+
+
+def get_system_steps() -> List[Step]:
+    """Returns the steps of the boot before the units of the workbench start."""
+
+    properties = show_properties(
+        None, ["InitRDTimestampMonotonic", "UserspaceTimestampMonotonic"]
+    )
+    initrd = to_seconds(properties["InitRDTimestampMonotonic"])
+    userspace = to_seconds(properties["UserspaceTimestampMonotonic"])
+
+    steps = [Step(name="kernel", start=0.0, end=initrd or userspace)]
+    if initrd is not None:
+        steps.append(Step(name="initrd", start=initrd, end=userspace))
+    return steps
+
+
+def get_unit_step(unit: str) -> Step:
+    """Returns the step of a unit, from its activation until it became active."""
+
+    properties = show_properties(
+        unit, ["InactiveExitTimestampMonotonic", "ActiveEnterTimestampMonotonic"]
+    )
+    return Step(
+        name=unit,
+        start=to_seconds(properties["InactiveExitTimestampMonotonic"]),
+        end=to_seconds(properties["ActiveEnterTimestampMonotonic"]),
+    )
+
+
+def get_first_request() -> Optional[float]:
+    """Returns the time of the first proxied request of this boot (if any)."""
+
+    result = subprocess.run(
+        [
+            "journalctl",
+            "--boot",
+            "--unit",
+            FIRST_REQUEST_UNIT,
+            "--grep",
+            FIRST_REQUEST_MESSAGE,
+            "--output",
+            "json",
+            "--lines",
+            "all",
+        ],
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    lines = result.stdout.splitlines()
+    if not lines:
+        return None
+    return to_seconds(json.loads(lines[0])["__MONOTONIC_TIMESTAMP"])
+
+
+def show_properties(unit: Optional[str], properties: List[str]) -> Dict[str, str]:
+    """Returns properties of a unit (or of the service manager if no unit is given)."""
+
+    result = subprocess.run(
+        ["systemctl", "show", *([unit] if unit else []), "-p", ",".join(properties)],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    values = dict(
+        line.split("=", 1) for line in result.stdout.splitlines() if "=" in line
+    )
+    return {name: values.get(name, "0") for name in properties}
+
+
+def to_seconds(microseconds: str) -> Optional[float]:
+    """Converts a monotonic timestamp in microseconds to seconds (None if not set)."""
+
+    value = int(microseconds)
+    return value / 1e6 if value > 0 else None
+
+
+if __name__ == "__main__":
+    main()
@@ -29,5 +29,8 @@ else
   fi
 fi
 
-chown -R ${USER}:${USER} ${USER_HOME_DIR}
+# Skip the storage of docker (see configure-docker-storage.sh), which is owned by root,
+# and the home dirs of the other users in multi-user mode (see configure-multi-user.sh).
+find ${USER_HOME_DIR} \( -path ${USER_HOME_DIR}/.docker-storage -o -path ${USER_HOME_DIR}/.workbench-users \) -prune \
+  -o -exec chown --no-dereference ${USER}:${USER} {} +
 rm -rf "${USER_HOME_DIR}/lost+found/"
@@ -0,0 +1,44 @@
+#!/usr/bin/env bash
+
+# Mounts the first local SSD (if the VM has one) on /mnt/disks/local-ssd, so that
+# other boot steps can use it as fast scratch space (e.g. for caches). Note that
+# the contents of a local SSD don't survive stopping the VM, so this should only
+# be used for data that can be recreated.
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+USER=ubuntu
+LOCAL_SSD_MOUNT_DIR=/mnt/disks/local-ssd
+
+LOCAL_SSD_DEVICE=""
+for DEVICE in /dev/disk/by-id/google-local-nvme-ssd-0 /dev/disk/by-id/google-local-ssd-0; do
+  if [ -b "${DEVICE}" ]; then
+    LOCAL_SSD_DEVICE=${DEVICE}
+    break
+  fi
+done
+
+if [ -z "${LOCAL_SSD_DEVICE}" ]; then
+  echo "No local SSD found, skipping"
+  exit 0
+fi
+
+if mountpoint -q ${LOCAL_SSD_MOUNT_DIR} ; then
+  echo "Local SSD is already mounted"
+  exit 0
+fi
+
+mkdir -p ${LOCAL_SSD_MOUNT_DIR}
+
+if ! mount -o discard,defaults "${LOCAL_SSD_DEVICE}" ${LOCAL_SSD_MOUNT_DIR} ; then
+  echo "Formatting new local SSD"
+  mkfs.ext4 -m 0 -F -E lazy_itable_init=0,lazy_journal_init=0,discard "${LOCAL_SSD_DEVICE}"
+  mount -o discard,defaults "${LOCAL_SSD_DEVICE}" ${LOCAL_SSD_MOUNT_DIR}
+fi
+
+chown ${USER}:${USER} ${LOCAL_SSD_MOUNT_DIR}
+rm -rf "${LOCAL_SSD_MOUNT_DIR}/lost+found/"
+echo "Successfully mounted local SSD ${LOCAL_SSD_DEVICE}"
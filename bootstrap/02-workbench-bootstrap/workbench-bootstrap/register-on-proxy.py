@@ -18,6 +18,7 @@ from dataclasses import dataclass
 import json
 import logging
 import subprocess
+import time
 from typing import Any, Dict, List, Iterable, Optional, TypeVar
 from urllib.parse import urlencode
 from urllib.request import Request, urlopen
@@ -25,6 +26,17 @@ from urllib.error import HTTPError
 
 AGENT_CONTAINER_NAME = "proxy-agent"
 AGENT_CONTAINER_URL = "gcr.io/inverting-proxy/agent"
+# Slice protecting the agent (and IDE) from heavy user jobs.
+AGENT_CGROUP_PARENT = "workbench-ide.slice"
+# Docker is started in parallel with the registration (it waits for the disks).
+DOCKER_TIMEOUT_SECONDS = 300
+
+IDE_PORT = 8080
+# Port of the front proxy that serves precompressed static assets of the IDE.
+IDE_FRONT_PROXY_PORT = 8082
+# Path answered by the front proxy itself (which rejects requests to the IDE that
+# aren't routed to a user in multi-user mode).
+IDE_FRONT_PROXY_HEALTH_CHECK_PATH = "/_health"
 
 T = TypeVar("T")  # pylint: disable=invalid-name
 
@@ -73,16 +85,24 @@ def main() -> None:
     )
 
     # Stop the proxy-agent if it's already running.
+    wait_for_docker()
     stop_existing_agent()
 
     # Start a new agent with the received backend ID. This agent will subscribe to the
     # proxy and set up the forwarding connection.
+    ide_port = get_ide_port()
     start_agent(
         backend_id=registration.backend_id,
         proxy_url=proxy_url,
         project_id=project_id,
         instance_id=instance_id,
         instance_zone=instance_zone,
+        port=ide_port,
+        health_check_path=(
+            IDE_FRONT_PROXY_HEALTH_CHECK_PATH
+            if ide_port == IDE_FRONT_PROXY_PORT
+            else "/"
+        ),
     )
 
     # Update the VM's metadata with the new proxy URL so that the Workbench service knows
@@ -148,6 +168,18 @@ def register_with_proxy(
     return register_result
 
 
+def wait_for_docker(timeout: float = DOCKER_TIMEOUT_SECONDS) -> None:
+    """Waits until the docker daemon accepts requests."""
+
+    deadline = time.monotonic() + timeout
+    while subprocess.run(
+        ["docker", "info"], check=False, capture_output=True
+    ).returncode:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Docker isn't running after {timeout}s")
+        time.sleep(1)
+
+
 def stop_existing_agent() -> None:
     """Stops an existing proxy agent if already running in Docker."""
 
@@ -212,6 +244,10 @@ def start_agent(
             "always",
             "--name",
             AGENT_CONTAINER_NAME,
+            "--cgroup-parent",
+            AGENT_CGROUP_PARENT,
+            "--oom-score-adj",
+            "-500",
         ]
         + env_args
         + [AGENT_CONTAINER_URL],
@@ -356,6 +392,22 @@ def get_proxy_mail() -> Optional[str]:
     return get_attribute_value("proxy-user-mail")
 
 
+def get_ide_port() -> int:
+    """
+    Fetches the port the agent should forward traffic to, which is the front proxy if it
+    is enabled using the ide-front-proxy attribute or if the multi-user mode is enabled
+    using the ide-users attribute (the front proxy routes the users to their IDE), and
+    the IDE itself otherwise.
+    """
+    if get_attribute_value("ide-users"):
+        logging.info("Forwarding traffic through the IDE front proxy (multi-user mode)")
+        return IDE_FRONT_PROXY_PORT
+    if get_attribute_value("ide-front-proxy") == "true":
+        logging.info("Forwarding traffic through the IDE front proxy")
+        return IDE_FRONT_PROXY_PORT
+    return IDE_PORT
+
+
 def get_proxy_url(region: str) -> str:
     """Fetches the proxy url for the given region."""
     if get_attribute_value("proxy-registration-url") is not None:
@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks the storage tiers of the VM: the home dir (on the data disk mounted by
+mount-data-disk.sh), the boot disk, the local SSD scratch space and the bucket mounts
+under /gcs. For each tier it measures the sequential and random read/write throughput,
+the rate of creating and stat'ing small files and the latency of listing a directory.
+
+Reads and writes use direct I/O (O_DIRECT) where the file system supports it, so they
+bypass the page cache. Where it isn't supported (e.g. the FUSE mounts of rclone), the
+written data is dropped from the page cache before it is read back instead.
+
+On the bucket mounts, rclone writes to its VFS cache on local disk and uploads the
+files in the background, so the write results are those of the cache volume. To read
+from the bucket rather than from the VFS cache, the data file is copied within the
+bucket (using the rc API of the mount) once it's uploaded, and the copy is read back.
+
+The results are written as a JSON report, together with the machine type and the
+mount options of each tier, so that reports of different machine types and mount
+profiles can be compared (see the compare command).
+"""
+
+import argparse
+from dataclasses import asdict, dataclass, field
+import json
+import logging
+import mmap
+import os
+from pathlib import Path
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from workbench_utils import parse_size
+
+HOME_DIR = Path("/home/ubuntu")
+BOOT_DISK_DIR = Path("/var/tmp")
+LOCAL_SSD_DIR = Path("/mnt/disks/local-ssd")
+GCS_DIR = Path("/gcs")
+RC_SOCKET_DIR = Path("/run/rclone-mount")
+UPLOAD_TIMEOUT_SECONDS = 600
+
+MACHINE_TYPE_URL = (
+    "http://metadata.google.internal/computeMetadata/v1/instance/machine-type"
+)
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+@dataclass
+class Settings:
+    """Settings of a benchmark run."""
+
+    size: int
+    block_size: int
+    random_block_size: int
+    random_ops: int
+    files: int
+    listings: int
+
+
+@dataclass
+class Tier:
+    """Storage tier to benchmark."""
+
+    name: str
+    path: str
+    filesystem: Optional[str] = None
+    mount_options: Optional[str] = None
+    direct_io: Optional[bool] = None
+    results: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+class TierBenchmark:
+    """Runs the benchmarks of a tier in a temporary directory on it."""
+
+    def __init__(self, tier: Tier, settings: Settings) -> None:
+        self.tier = tier
+        self.settings = settings
+        self.work_dir = Path(tier.path) / f".workbench-storage-benchmark-{os.getpid()}"
+        self.data_path = self.work_dir / "data"
+        self.files_dir = self.work_dir / "files"
+        self.copies = 0
+
+    def run(self) -> None:
+        """Runs all benchmarks (recording the errors of the ones that fail)."""
+
+        logging.info(f"Benchmarking {self.tier.name} ({self.tier.path})")
+        try:
+            self.work_dir.mkdir()
+        except OSError as error:
+            self.tier.errors["setup"] = str(error)
+            return
+
+        benchmarks: Dict[str, Callable[[], Dict[str, float]]] = {
+            "sequential_write": self.sequential_write,
+            "sequential_read": self.sequential_read,
+            "random_write": self.random_write,
+            "random_read": self.random_read,
+            "file_create": self.file_create,
+            "file_stat": self.file_stat,
+            "listing": self.listing,
+        }
+        try:
+            for name, benchmark in benchmarks.items():
+                try:
+                    self.tier.results[name] = benchmark()
+                    logging.info(f"{self.tier.name} {name}: {self.tier.results[name]}")
+                except OSError as error:
+                    logging.warning(f"{self.tier.name} {name} failed: {error}")
+                    self.tier.errors[name] = str(error)
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def open(self, flags: int, path: Optional[Path] = None) -> int:
+        """Opens the data file, using direct I/O if the file system supports it."""
+
+        path = path or self.data_path
+        if self.tier.direct_io is not False:
+            try:
+                fd = os.open(path, flags | os.O_DIRECT, 0o600)
+                self.tier.direct_io = True
+                return fd
+            except OSError:
+                self.tier.direct_io = False
+        return os.open(path, flags, 0o600)
+
+    def drop_cache(self, fd: int) -> None:
+        """Drops the data file from the page cache (when not using direct I/O)."""
+
+        if not self.tier.direct_io:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+    def read_path(self) -> Path:
+        """
+        Returns the data file to read back. On the bucket mounts this is a new copy of
+        the data file in the bucket, which isn't in the VFS cache of rclone.
+        """
+
+        tier_path = Path(self.tier.path).resolve()
+        rc_socket = RC_SOCKET_DIR / f"{tier_path.name}.sock"
+        if tier_path.parent != GCS_DIR or not rc_socket.exists():
+            return self.data_path
+
+        deadline = time.monotonic() + UPLOAD_TIMEOUT_SECONDS
+        while True:
+            disk_cache = rc_call(rc_socket, "vfs/stats").get("diskCache", {})
+            if not disk_cache.get("uploadsInProgress") and not disk_cache.get(
+                "uploadsQueued"
+            ):
+                break
+            if time.monotonic() > deadline:
+                raise OSError(f"The upload of {self.data_path} timed out")
+            time.sleep(1)
+
+        self.copies += 1
+        copy_path = self.work_dir / f"data-{self.copies}"
+        bucket_fs = f":gcs:{tier_path.name}"
+        rc_call(
+            rc_socket,
+            "operations/copyfile",
+            srcFs=bucket_fs,
+            srcRemote=str(self.data_path.relative_to(self.tier.path)),
+            dstFs=bucket_fs,
+            dstRemote=str(copy_path.relative_to(self.tier.path)),
+        )
+        # The directory listing of the mount is cached, so it has to pick up the copy.
+        rc_call(
+            rc_socket, "vfs/refresh", dir=str(self.work_dir.relative_to(self.tier.path))
+        )
+        return copy_path
+
+    def sequential_write(self) -> Dict[str, float]:
+        """Writes the data file sequentially."""
+
+        block_size = self.settings.block_size
+        buffer = aligned_buffer(block_size, fill=True)
+        fd = self.open(os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+        try:
+            start = time.perf_counter()
+            for _ in range(self.settings.size // block_size):
+                os.write(fd, buffer)
+            os.fsync(fd)
+            seconds = time.perf_counter() - start
+        finally:
+            os.close(fd)
+        return throughput(self.settings.size, seconds)
+
+    def sequential_read(self) -> Dict[str, float]:
+        """Reads the data file sequentially."""
+
+        block_size = self.settings.block_size
+        buffer = aligned_buffer(block_size)
+        fd = self.open(os.O_RDONLY, self.read_path())
+        try:
+            self.drop_cache(fd)
+            total = 0
+            start = time.perf_counter()
+            while True:
+                read = os.readv(fd, [buffer])
+                total += read
+                if read < block_size:
+                    break
+            seconds = time.perf_counter() - start
+        finally:
+            os.close(fd)
+        return throughput(total, seconds)
+
+    def random_write(self) -> Dict[str, float]:
+        """Writes blocks at random offsets of the data file."""
+
+        buffer = aligned_buffer(self.settings.random_block_size, fill=True)
+        fd = self.open(os.O_WRONLY)
+        try:
+            latencies = self.random_io(lambda offset: os.pwritev(fd, [buffer], offset))
+            start = time.perf_counter()
+            os.fsync(fd)
+            latencies[-1] += time.perf_counter() - start
+        finally:
+            os.close(fd)
+        return operations(latencies, self.settings.random_block_size)
+
+    def random_read(self) -> Dict[str, float]:
+        """Reads blocks at random offsets of the data file."""
+
+        buffer = aligned_buffer(self.settings.random_block_size)
+        fd = self.open(os.O_RDONLY, self.read_path())
+        try:
+            self.drop_cache(fd)
+            latencies = self.random_io(lambda offset: os.preadv(fd, [buffer], offset))
+        finally:
+            os.close(fd)
+        return operations(latencies, self.settings.random_block_size)
+
+    def random_io(self, operation: Callable[[int], int]) -> List[float]:
+        """Runs an operation at random (aligned) offsets, returning the latencies."""
+
+        blocks = self.settings.size // self.settings.random_block_size
+        latencies = []
+        for _ in range(self.settings.random_ops):
+            offset = random.randrange(blocks) * self.settings.random_block_size
+            start = time.perf_counter()
+            operation(offset)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    def file_create(self) -> Dict[str, float]:
+        """Creates small files (of one block) in a single directory."""
+
+        self.files_dir.mkdir()
+        content = os.urandom(4096)
+        start = time.perf_counter()
+        for index in range(self.settings.files):
+            (self.files_dir / f"file-{index}").write_bytes(content)
+        dir_fd = os.open(self.files_dir, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        return rate(self.settings.files, time.perf_counter() - start)
+
+    def file_stat(self) -> Dict[str, float]:
+        """Stats the small files."""
+
+        start = time.perf_counter()
+        for index in range(self.settings.files):
+            os.stat(self.files_dir / f"file-{index}")
+        return rate(self.settings.files, time.perf_counter() - start)
+
+    def listing(self) -> Dict[str, float]:
+        """Lists the directory of small files (including the type of each entry)."""
+
+        latencies = []
+        for _ in range(self.settings.listings):
+            start = time.perf_counter()
+            with os.scandir(self.files_dir) as entries:
+                for entry in entries:
+                    entry.is_file()
+            latencies.append(time.perf_counter() - start)
+        return {
+            "entries": self.settings.files,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        }
+
+
+def main() -> None:
+    """Main function that runs the benchmark or compares reports."""
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Benchmark the storage tiers")
+    run_parser.add_argument(
+        "--tier",
+        action="append",
+        default=[],
+        metavar="NAME=PATH",
+        help="Benchmark this dir (instead of the detected tiers), can be repeated",
+    )
+    run_parser.add_argument(
+        "--only", help="Comma-separated names of the detected tiers to benchmark"
+    )
+    run_parser.add_argument("--size", default="256M", help="Size of the data file")
+    run_parser.add_argument("--block-size", default="1M")
+    run_parser.add_argument("--random-block-size", default="4K")
+    run_parser.add_argument("--random-ops", type=int, default=2000)
+    run_parser.add_argument("--files", type=int, default=1000)
+    run_parser.add_argument("--listings", type=int, default=20)
+    run_parser.add_argument(
+        "--label", help="Label of the run in the report (e.g. the mount profile)"
+    )
+    run_parser.add_argument("--output", type=Path, help="Report file (default stdout)")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare JSON reports")
+    compare_parser.add_argument("reports", type=Path, nargs="+")
+
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        compare(args.reports)
+        return
+
+    settings = Settings(
+        size=parse_size(args.size),
+        block_size=parse_size(args.block_size),
+        random_block_size=parse_size(args.random_block_size),
+        random_ops=args.random_ops,
+        files=args.files,
+        listings=args.listings,
+    )
+    if settings.size < settings.block_size:
+        sys.exit("The size must be at least one block")
+
+    if args.tier:
+        tiers = [Tier(*tier.split("=", 1)) for tier in args.tier]
+    else:
+        tiers = detect_tiers()
+        if args.only:
+            tiers = [tier for tier in tiers if tier.name in args.only.split(",")]
+
+    mounts = read_mounts()
+    for tier in tiers:
+        mount = find_mount(Path(tier.path), mounts)
+        if mount is not None:
+            tier.filesystem, tier.mount_options = mount
+        TierBenchmark(tier, settings).run()
+
+    report = {
+        "label": args.label,
+        "machine": describe_machine(),
+        "settings": asdict(settings),
+        "tiers": [asdict(tier) for tier in tiers],
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        logging.info(f"Report written to {args.output}")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+def detect_tiers() -> List[Tier]:
+    """Detects the storage tiers that are present on the VM."""
+
+    tiers = [
+        Tier("home", str(HOME_DIR)),
+        Tier("boot-disk", str(BOOT_DISK_DIR)),
+    ]
+    if os.path.ismount(LOCAL_SSD_DIR):
+        tiers.append(Tier("local-ssd", str(LOCAL_SSD_DIR)))
+    if GCS_DIR.is_dir():
+        for bucket_dir in sorted(GCS_DIR.iterdir()):
+            # Accessing the dir triggers the automount of the bucket.
+            if bucket_dir.is_dir() and os.path.ismount(bucket_dir):
+                tiers.append(Tier(f"gcs/{bucket_dir.name}", str(bucket_dir)))
+    return tiers
+
+
+def read_mounts() -> Dict[str, List[str]]:
+    """Reads the file system type + options of the mount points."""
+
+    mounts = {}
+    with open("/proc/mounts", encoding="utf-8") as mounts_file:
+        for line in mounts_file:
+            device, mount_point, filesystem, options = line.split()[:4]
+            mounts[mount_point] = [f"{filesystem} ({device})", options]
+    return mounts
+
+
+def find_mount(path: Path, mounts: Dict[str, List[str]]) -> Optional[List[str]]:
+    """Returns the file system of the mount a path is on."""
+
+    for parent in [path.resolve(), *path.resolve().parents]:
+        if str(parent) in mounts:
+            return mounts[str(parent)]
+    return None
+
+
+def describe_machine() -> Dict[str, object]:
+    """Describes the machine, so reports of different machine types can be compared."""
+
+    try:
+        request = Request(MACHINE_TYPE_URL, headers={"Metadata-Flavor": "Google"})
+        with urlopen(request, timeout=2) as response:
+            machine_type: Optional[str] = response.read().decode().split("/")[-1]
+    except (URLError, OSError):
+        machine_type = None
+
+    return {
+        "machine_type": machine_type,
+        "cpus": os.cpu_count(),
+        "memory_bytes": os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES"),
+        "kernel": os.uname().release,
+    }
+
+
+def rc_call(rc_socket: Path, command: str, **params: str) -> Dict[str, Any]:
+    """Calls an rc command on the rclone mount serving its rc API on the socket."""
+
+    result = subprocess.run(
+        ["rclone", "rc", "--unix-socket", str(rc_socket), command]
+        + [f"{key}={value}" for key, value in params.items()],
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise OSError(f"rclone rc {command} failed: {result.stderr.strip()}")
+    output: Dict[str, Any] = json.loads(result.stdout or "{}")
+    return output
+
+
+def aligned_buffer(size: int, fill: bool = False) -> mmap.mmap:
+    """Returns a page-aligned buffer, as required for direct I/O."""
+
+    buffer = mmap.mmap(-1, size)
+    if fill:
+        buffer.write(os.urandom(size))
+    return buffer
+
+
+def throughput(size: int, seconds: float) -> Dict[str, float]:
+    """Results of a sequential benchmark."""
+
+    return {
+        "bytes": size,
+        "seconds": seconds,
+        "mb_per_second": size / 1024**2 / max(seconds, 1e-9),
+    }
+
+
+def operations(latencies: List[float], block_size: int) -> Dict[str, float]:
+    """Results of a random I/O benchmark."""
+
+    seconds = sum(latencies)
+    return {
+        "ops": len(latencies),
+        "iops": len(latencies) / max(seconds, 1e-9),
+        "mb_per_second": len(latencies) * block_size / 1024**2 / max(seconds, 1e-9),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def rate(count: int, seconds: float) -> Dict[str, float]:
+    """Results of a file benchmark."""
+
+    return {
+        "files": count,
+        "seconds": seconds,
+        "per_second": count / max(seconds, 1e-9),
+    }
+
+
+def percentile(values: List[float], percent: int) -> float:
+    """Returns a percentile of the values."""
+
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100)[percent - 1]
+
+
+def compare(paths: List[Path]) -> None:
+    """Prints the main metric of each benchmark of each tier side by side."""
+
+    metrics = {
+        "sequential_write": "mb_per_second",
+        "sequential_read": "mb_per_second",
+        "random_write": "iops",
+        "random_read": "iops",
+        "file_create": "per_second",
+        "file_stat": "per_second",
+        "listing": "p50_ms",
+    }
+    reports = [json.loads(path.read_text(encoding="utf-8")) for path in paths]
+    names = [
+        report["label"] or report["machine"]["machine_type"] or path.stem
+        for report, path in zip(reports, paths)
+    ]
+
+    tier_names = list(
+        dict.fromkeys(tier["name"] for report in reports for tier in report["tiers"])
+    )
+    print(f"{'TIER':<20} {'BENCHMARK':<30}" + "".join(f" {name:>16}" for name in names))
+    for tier_name in tier_names:
+        for benchmark, metric in metrics.items():
+            values = []
+            for report in reports:
+                tiers = {tier["name"]: tier for tier in report["tiers"]}
+                value = tiers.get(tier_name, {}).get("results", {}).get(benchmark)
+                values.append(f"{value[metric]:.1f}" if value else "-")
+            print(
+                f"{tier_name:<20} {f'{benchmark} ({metric})':<30}"
+                + "".join(f" {value:>16}" for value in values)
+            )
+
+
+if __name__ == "__main__":
+    main()
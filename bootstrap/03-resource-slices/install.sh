@@ -0,0 +1,33 @@
+#!/usr/bin/env bash
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+SCRIPT_DIR=`dirname $0 | xargs realpath`
+
+# Boot with the unified cgroup hierarchy (cgroup v2), which is required for the memory
+# protection (MemoryLow/MemoryHigh) of the slices.
+echo 'GRUB_CMDLINE_LINUX_DEFAULT="${GRUB_CMDLINE_LINUX_DEFAULT} systemd.unified_cgroup_hierarchy=1"' \
+    > /etc/default/grub.d/60-workbench-cgroups.cfg
+update-grub
+
+# Let docker manage its cgroups using systemd, so containers can be placed in slices.
+mkdir -p /etc/docker
+if [ ! -f /etc/docker/daemon.json ]; then
+    echo "{}" > /etc/docker/daemon.json
+fi
+jq '. + {"exec-opts": ["native.cgroupdriver=systemd"]}' /etc/docker/daemon.json > /tmp/daemon.json
+mv /tmp/daemon.json /etc/docker/daemon.json
+
+# Install scripts.
+mkdir -p /opt/workbench-slices
+cp ${SCRIPT_DIR}/workbench-slices/* /opt/workbench-slices/
+chmod +x /opt/workbench-slices/job-shell
+
+# Install slices + service that sizes them on boot.
+cp ${SCRIPT_DIR}/workbench-ide.slice /etc/systemd/system/
+cp ${SCRIPT_DIR}/workbench-jobs.slice /etc/systemd/system/
+cp ${SCRIPT_DIR}/workbench-slices.service /etc/systemd/system/
+systemctl enable workbench-slices
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+"""
+Script that sizes the resource slices of the IDE (openvscode-server + proxy agent) and
+of user jobs (started from the IDE terminal), based on the size of the machine type.
+
+The IDE slice gets a memory protection (MemoryLow) so that its memory is reclaimed
+last, while the jobs slice is throttled (MemoryHigh) before it can take the memory
+that is reserved for the IDE. CPU and IO weights are static (see the slice units).
+"""
+
+from dataclasses import dataclass
+import logging
+import os
+import subprocess
+from typing import Dict, Optional
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from workbench_utils import get_total_memory
+
+IDE_SLICE = "workbench-ide.slice"
+JOBS_SLICE = "workbench-jobs.slice"
+
+# Memory reserved for the IDE, as a fraction of the total memory (within bounds).
+IDE_MEMORY_FRACTION = 0.15
+IDE_MEMORY_MIN = 1024**3
+IDE_MEMORY_MAX = 4 * 1024**3
+# Memory reserved for the system (kernel, docker, etc.) outside of both slices.
+SYSTEM_MEMORY = 512 * 1024**2
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+@dataclass
+class SliceSizes:
+    """Memory settings of the slices in bytes."""
+
+    ide_memory_low: int
+    jobs_memory_high: int
+
+
+def main() -> None:
+    """Main function that sizes the slices for the current machine."""
+
+    total_memory = get_total_memory()
+    sizes = compute_slice_sizes(total_memory)
+
+    logging.info(
+        f"Sizing slices for machine type '{get_machine_type()}'"
+        f" ({os.cpu_count()} vCPUs, {total_memory // 1024**2} MiB): {sizes}"
+    )
+
+    set_slice_properties(IDE_SLICE, {"MemoryLow": str(sizes.ide_memory_low)})
+    set_slice_properties(JOBS_SLICE, {"MemoryHigh": str(sizes.jobs_memory_high)})
+
+
+def compute_slice_sizes(total_memory: int) -> SliceSizes:
+    """Computes the slice sizes for a machine with the given amount of memory."""
+
+    ide_memory = int(total_memory * IDE_MEMORY_FRACTION)
+    ide_memory = min(max(ide_memory, IDE_MEMORY_MIN), IDE_MEMORY_MAX)
+
+    return SliceSizes(
+        ide_memory_low=ide_memory,
+        jobs_memory_high=max(total_memory - ide_memory - SYSTEM_MEMORY, ide_memory),
+    )
+
+
+def set_slice_properties(slice_name: str, properties: Dict[str, str]) -> None:
+    """Sets properties on a slice (until the next reboot)."""
+
+    subprocess.run(
+        ["systemctl", "set-property", "--runtime", slice_name]
+        + [f"{key}={value}" for key, value in properties.items()],
+        check=True,
+        capture_output=True,
+    )
+
+
+def get_machine_type() -> Optional[str]:
+    """Fetches the machine type of the current VM (e.g. 'n1-standard-4')."""
+
+    request = Request(
+        "http://metadata/computeMetadata/v1/instance/machine-type",
+        headers={"Metadata-Flavor": "Google"},
+    )
+    try:
+        with urlopen(request, timeout=5) as result:
+            machine_type: str = result.read().decode()
+    except URLError:
+        return None
+    return machine_type.split("/")[-1]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark that checks whether the IDE stays responsive while heavy user jobs are
+running. Measures the round-trip latency of requests to the IDE, first on an idle
+machine and then while a CPU hog (one busy process per vCPU) and a memory hog are
+running in the user jobs slice. Prints the results as JSON.
+
+Needs to be run as root (e.g. using sudo), as it starts the hogs using systemd-run.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+from urllib.request import urlopen
+
+JOBS_SLICE = "workbench-jobs.slice"
+
+CPU_HOG = "while True: pass"
+# Allocates (and touches) memory in chunks of 64 MiB until the given fraction of the
+# available memory is used, then keeps touching it so it stays resident.
+MEMORY_HOG = """
+import sys, time
+chunks = []
+target = int(sys.argv[1])
+while len(chunks) * 64 * 1024**2 < target:
+    chunks.append(bytearray(64 * 1024**2))
+while True:
+    for chunk in chunks:
+        chunk[::4096] = b"x" * len(chunk[::4096])
+    time.sleep(0.1)
+"""
+
+
+def main() -> None:
+    """Main function that runs the benchmark."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://127.0.0.1:8080/")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--warmup", type=float, default=10, help="In seconds")
+    parser.add_argument(
+        "--memory-fraction",
+        type=float,
+        default=0.9,
+        help="Fraction of the available memory used by the memory hog",
+    )
+    args = parser.parse_args()
+
+    results = {"idle": measure_latency(args.url, args.requests)}
+
+    units = start_hogs(args.memory_fraction)
+    try:
+        time.sleep(args.warmup)
+        results["under_load"] = measure_latency(args.url, args.requests)
+    finally:
+        subprocess.run(["systemctl", "stop"] + units, check=False)
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+def start_hogs(memory_fraction: float) -> List[str]:
+    """Starts the CPU and memory hogs in the jobs slice, returning their units."""
+
+    commands = {
+        f"slice-benchmark-cpu-{index}": [sys.executable, "-c", CPU_HOG]
+        for index in range(os.cpu_count() or 1)
+    }
+    commands["slice-benchmark-memory"] = [
+        sys.executable,
+        "-c",
+        MEMORY_HOG,
+        str(int(get_available_memory() * memory_fraction)),
+    ]
+
+    for unit, command in commands.items():
+        subprocess.run(
+            ["systemd-run", f"--unit={unit}", f"--slice={JOBS_SLICE}", "--quiet"]
+            + command,
+            check=True,
+        )
+    return [f"{unit}.service" for unit in commands]
+
+
+def measure_latency(url: str, requests: int) -> Dict[str, float]:
+    """Measures the round-trip latency (in ms) of a number of requests to the IDE."""
+
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        with urlopen(url, timeout=60) as response:
+            response.read()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "max_ms": latencies[-1],
+    }
+
+
+def get_available_memory() -> int:
+    """Returns the available memory of the machine in bytes."""
+
+    with open("/proc/meminfo", encoding="utf-8") as file:
+        for line in file:
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024
+    raise ValueError("MemAvailable not found in /proc/meminfo")
+
+
+if __name__ == "__main__":
+    main()
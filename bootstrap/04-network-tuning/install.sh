@@ -0,0 +1,18 @@
+#!/usr/bin/env bash
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+SCRIPT_DIR=`dirname $0 | xargs realpath`
+
+# Install scripts + CLI for applying/reverting the profile at runtime.
+mkdir -p /opt/network-tuning
+cp ${SCRIPT_DIR}/network-tuning/* /opt/network-tuning/
+chmod +x /opt/network-tuning/network-tuning.py
+ln -sf /opt/network-tuning/network-tuning.py /usr/local/bin/network-tuning
+
+# Install + enable service that applies the profile on boot.
+cp ${SCRIPT_DIR}/network-tuning.service /etc/systemd/system/network-tuning.service
+systemctl enable network-tuning
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark that checks that the network tuning profile applies and reverts cleanly,
+measuring the TCP throughput over loopback with the original values, with the profile
+applied and after reverting it. Loopback doesn't exercise the NIC or the congestion
+control on a real path, so it mainly shows the effect of the socket buffers; compare
+e.g. bucket mount reads for the full effect. Run as root, reports the results as JSON.
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List
+
+TUNING_SCRIPT = Path(__file__).parent / "network-tuning.py"
+CHUNK_SIZE = 1024**2
+
+
+def main() -> None:
+    """Main function that runs the benchmark."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profile", default="high", choices=["auto", "high"])
+    parser.add_argument("--size", type=int, default=2048, help="MiB sent per stream")
+    parser.add_argument("--streams", type=int, default=4)
+    args = parser.parse_args()
+
+    if os.geteuid() != 0:
+        sys.exit("Run as root, the benchmark applies and reverts the profile")
+    if run_tuning(["status"]).strip() != "null":
+        sys.exit("A profile is applied, revert it first (network-tuning revert)")
+
+    profile: Dict[str, str] = json.loads(
+        run_tuning(["show", "--profile", args.profile])
+    )
+    original = read_values(list(profile))
+
+    results: Dict[str, object] = {
+        "original": measure(args.size, args.streams),
+    }
+
+    run_tuning(["apply", "--profile", args.profile])
+    state = json.loads(run_tuning(["status"]))
+    results["skipped"] = [key for key in profile if key not in state["applied"]]
+    results["applied_mismatches"] = {
+        key: {"expected": value, "actual": state["current"][key]}
+        for key, value in state["applied"].items()
+        if state["current"][key] != value
+    }
+    results["applied"] = measure(args.size, args.streams)
+
+    run_tuning(["revert"])
+    reverted = read_values(list(profile))
+    results["reverted_mismatches"] = {
+        key: {"expected": value, "actual": reverted[key]}
+        for key, value in original.items()
+        if reverted[key] != value
+    }
+    results["reverted"] = measure(args.size, args.streams)
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    if results["applied_mismatches"] or results["reverted_mismatches"]:
+        sys.exit(1)
+
+
+def run_tuning(args: List[str]) -> str:
+    """Runs the tuning script, returning its output."""
+
+    return subprocess.run(
+        [sys.executable, str(TUNING_SCRIPT), *args],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+
+def read_values(keys: List[str]) -> Dict[str, str]:
+    """Reads sysctl values (normalizing the whitespace like the tuning script)."""
+
+    return {
+        key: " ".join(
+            Path("/proc/sys", key.replace(".", "/")).read_text(encoding="utf-8").split()
+        )
+        for key in keys
+    }
+
+
+def measure(size: int, streams: int) -> Dict[str, float]:
+    """Measures the throughput of parallel TCP streams over loopback."""
+
+    server = socket.create_server(("127.0.0.1", 0), backlog=streams)
+    port = server.getsockname()[1]
+    received = [0] * streams
+
+    def receive(index: int) -> None:
+        connection, _ = server.accept()
+        with connection:
+            while True:
+                data = connection.recv(CHUNK_SIZE)
+                if not data:
+                    break
+                received[index] += len(data)
+
+    def send() -> None:
+        payload = b"\0" * CHUNK_SIZE
+        with socket.create_connection(("127.0.0.1", port)) as connection:
+            for _ in range(size):
+                connection.sendall(payload)
+
+    receivers = [
+        threading.Thread(target=receive, args=(index,)) for index in range(streams)
+    ]
+    senders = [threading.Thread(target=send) for _ in range(streams)]
+    start = time.perf_counter()
+    for thread in receivers + senders:
+        thread.start()
+    for thread in receivers + senders:
+        thread.join()
+    seconds = time.perf_counter() - start
+    server.close()
+
+    return {
+        "bytes": sum(received),
+        "seconds": seconds,
+        "gbps": sum(received) * 8 / 1e9 / seconds,
+    }
+
+
+if __name__ == "__main__":
+    main()
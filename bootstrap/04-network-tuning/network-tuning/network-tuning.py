@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+"""
+Script that applies a sysctl profile tuning the network stack for high-throughput
+transfers (bucket mounts, docker pulls, the proxy tunnel), matched to the number of
+vCPUs of the machine and the bandwidth it can expect. The profile is selected using
+the network-tuning-profile attribute on boot:
+* auto (default): sized for the egress bandwidth of the machine type (2 Gbps per vCPU,
+  up to 32 Gbps, unless overridden by the network-tuning-bandwidth attribute in Gbps).
+* high: sized for the maximum bandwidth, regardless of the machine type.
+* off: keeps the defaults of the kernel (reverting a profile that was applied).
+
+The values of the kernel before the profile was applied are kept in a state file, so
+that the profile can be reverted at runtime (`network-tuning revert`).
+"""
+
+import argparse
+import json
+import logging
+import os
+from pathlib import Path
+import subprocess
+import sys
+from typing import Any, Dict, Optional
+
+from workbench_utils import get_attribute_value
+
+STATE_PATH = Path("/run/network-tuning/state.json")
+SYSCTL_ROOT = Path("/proc/sys")
+PROFILES = ["auto", "high", "off"]
+
+# Egress bandwidth of Compute Engine VMs: 2 Gbps per vCPU, up to 32 Gbps.
+BANDWIDTH_PER_CPU_GBPS = 2
+BANDWIDTH_MAX_GBPS = 32
+# Socket buffers are sized to the bandwidth-delay product of this round-trip time
+# (generous for in-region GCS, so that single streams can reach the full bandwidth).
+BUFFER_RTT_SECONDS = 0.05
+BUFFER_MIN = 16 * 1024**2
+BUFFER_MAX = 128 * 1024**2
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+def main() -> None:
+    """Main function that applies, reverts or shows the profile."""
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command, description in [
+        ("apply", "Apply a profile (by default the one of the attributes)"),
+        ("show", "Print the values of a profile as JSON, without applying it"),
+    ]:
+        subparser = subparsers.add_parser(command, help=description)
+        subparser.add_argument("--profile", choices=PROFILES)
+        subparser.add_argument("--bandwidth", type=float, help="Expected Gbps")
+    subparsers.add_parser("revert", help="Revert to the values before the profile")
+    subparsers.add_parser("status", help="Print the applied profile as JSON")
+    args = parser.parse_args()
+
+    if args.command in ("apply", "show"):
+        profile = (
+            args.profile or get_attribute_value("network-tuning-profile") or "auto"
+        )
+        if profile not in PROFILES:
+            logging.warning(f"Unknown profile '{profile}', using 'auto'")
+            profile = "auto"
+        bandwidth = args.bandwidth
+        if bandwidth is None:
+            attribute = get_attribute_value("network-tuning-bandwidth")
+            bandwidth = float(attribute) if attribute else None
+        values = compute_profile(profile, os.cpu_count() or 1, bandwidth)
+
+        if args.command == "show":
+            json.dump(values, sys.stdout, indent=2)
+            print()
+        elif profile == "off":
+            revert()
+        else:
+            apply(profile, values)
+    elif args.command == "revert":
+        revert()
+    else:
+        state = load_state()
+        if state is not None:
+            state["current"] = {key: read_sysctl(key) for key in state["applied"]}
+        json.dump(state, sys.stdout, indent=2)
+        print()
+
+
+def compute_profile(
+    profile: str, cpus: int, bandwidth_gbps: Optional[float] = None
+) -> Dict[str, str]:
+    """Computes the sysctl values of a profile for a machine."""
+
+    if profile == "off":
+        return {}
+    if profile == "high":
+        # Sized as for the largest machine types.
+        cpus = max(cpus, BANDWIDTH_MAX_GBPS // BANDWIDTH_PER_CPU_GBPS)
+    if bandwidth_gbps is None:
+        bandwidth_gbps = min(cpus * BANDWIDTH_PER_CPU_GBPS, BANDWIDTH_MAX_GBPS)
+
+    buffer_size = int(bandwidth_gbps * 1e9 / 8 * BUFFER_RTT_SECONDS)
+    buffer_size = min(max(buffer_size, BUFFER_MIN), BUFFER_MAX)
+    backlog = min(max(1024 * cpus, 4096), 65535)
+
+    return {
+        # Socket buffers, autotuned by the kernel up to the maximum.
+        "net.core.rmem_max": str(buffer_size),
+        "net.core.wmem_max": str(buffer_size),
+        "net.ipv4.tcp_rmem": f"4096 131072 {buffer_size}",
+        "net.ipv4.tcp_wmem": f"4096 16384 {buffer_size}",
+        # BBR with fair queueing (for pacing) keeps the throughput up on lossy paths.
+        "net.core.default_qdisc": "fq",
+        "net.ipv4.tcp_congestion_control": "bbr",
+        # Don't shrink the congestion window of idle connections (e.g. the tunnel).
+        "net.ipv4.tcp_slow_start_after_idle": "0",
+        "net.ipv4.tcp_mtu_probing": "1",
+        # Queues of pending connections and packets.
+        "net.core.somaxconn": str(backlog),
+        "net.ipv4.tcp_max_syn_backlog": str(backlog),
+        "net.core.netdev_max_backlog": str(backlog),
+        # More ephemeral ports for many concurrent connections (e.g. parallel pulls),
+        # starting above the ports of the services on the VM.
+        "net.ipv4.ip_local_port_range": "16384 65535",
+    }
+
+
+def apply(profile: str, values: Dict[str, str]) -> None:
+    """Applies the values of a profile, keeping the original values for reverting."""
+
+    if "bbr" in values.get("net.ipv4.tcp_congestion_control", ""):
+        try:
+            subprocess.run(["modprobe", "tcp_bbr"], check=False, capture_output=True)
+        except FileNotFoundError:
+            logging.warning("modprobe not found, BBR is only used if already loaded")
+        if "bbr" not in read_sysctl("net.ipv4.tcp_available_congestion_control"):
+            logging.warning("BBR is not available, keeping the congestion control")
+            values = {
+                key: value
+                for key, value in values.items()
+                if key != "net.ipv4.tcp_congestion_control"
+            }
+
+    state = load_state()
+    original = state["original"] if state is not None else {}
+    for key in values:
+        original.setdefault(key, read_sysctl(key))
+    # Saved before changing anything, so that a partially applied profile is reverted.
+    save_state({"profile": profile, "original": original, "applied": {}})
+
+    applied = {}
+    for key, value in values.items():
+        try:
+            write_sysctl(key, value)
+            applied[key] = value
+        except OSError as error:
+            # E.g. a qdisc or congestion control that isn't built into the kernel.
+            logging.warning(f"Failed to set {key} to {value}: {error}")
+    save_state({"profile": profile, "original": original, "applied": applied})
+    logging.info(f"Applied the '{profile}' profile: {applied}")
+
+
+def revert() -> None:
+    """Reverts the values of the applied profile to the original values."""
+
+    state = load_state()
+    if state is None:
+        logging.info("No profile applied")
+        return
+
+    for key, value in state["original"].items():
+        if read_sysctl(key) != value:
+            write_sysctl(key, value)
+    STATE_PATH.unlink()
+    logging.info(f"Reverted the '{state['profile']}' profile: {state['original']}")
+
+
+def read_sysctl(key: str) -> str:
+    """Reads a sysctl value (normalizing the whitespace between multiple values)."""
+
+    path = SYSCTL_ROOT / key.replace(".", "/")
+    return " ".join(path.read_text(encoding="utf-8").split())
+
+
+def write_sysctl(key: str, value: str) -> None:
+    """Writes a sysctl value."""
+
+    path = SYSCTL_ROOT / key.replace(".", "/")
+    path.write_text(value, encoding="utf-8")
+
+
+def load_state() -> Optional[Dict[str, Any]]:
+    """Loads the state of the applied profile (None if no profile is applied)."""
+
+    if not STATE_PATH.exists():
+        return None
+    state: Dict[str, Any] = json.loads(STATE_PATH.read_text(encoding="utf-8"))
+    return state
+
+
+def save_state(state: Dict[str, Any]) -> None:
+    """Saves the state of the applied profile."""
+
+    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    STATE_PATH.write_text(json.dumps(state, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env bash
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+SCRIPT_DIR=`dirname $0 | xargs realpath`
+
+# Enable the pressure stall information (PSI) of the kernel, which is disabled by
+# default on Ubuntu, for the memory pressure monitor.
+echo 'GRUB_CMDLINE_LINUX_DEFAULT="${GRUB_CMDLINE_LINUX_DEFAULT} psi=1"' \
+    > /etc/default/grub.d/61-workbench-psi.cfg
+update-grub
+
+# The zram module is shipped with the extra modules of the (cloud) kernel, which
+# depend on the kernel version so aren't part of the apt batch of build-runner.py (the
+# installed package isn't captured by the outputs, so the step isn't cacheable).
+if ! modinfo zram > /dev/null 2>&1; then
+    if [ -z "${WORKBENCH_APT_BATCHED:-}" ]; then
+        apt-get update
+    fi
+    apt-get install -y "linux-modules-extra-$(uname -r)"
+fi
+
+# Install scripts.
+mkdir -p /opt/memory-pressure
+cp ${SCRIPT_DIR}/memory-pressure/* /opt/memory-pressure/
+
+# Install + enable services that set up zram swap and monitor the memory pressure.
+cp ${SCRIPT_DIR}/zram-swap.service /etc/systemd/system/zram-swap.service
+cp ${SCRIPT_DIR}/memory-pressure-monitor.service /etc/systemd/system/memory-pressure-monitor.service
+systemctl enable zram-swap
+systemctl enable memory-pressure-monitor
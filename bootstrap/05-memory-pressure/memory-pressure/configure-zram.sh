@@ -0,0 +1,56 @@
+#!/usr/bin/env bash
+
+# Sets up compressed swap in memory (zram) on boot, sized from the total memory using
+# the zram-swap-size attribute:
+# - auto (default): half of the memory, up to 16G.
+# - off: no zram swap.
+# - a size like 8G.
+# As the pages swapped to zram are compressed (typically 3-4x), this lets the kernel
+# move cold pages out of the way under memory pressure instead of going straight to
+# the OOM killer.
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+ZRAM_MAX_SIZE_MB=16384
+
+get_attribute() {
+    curl --fail "http://metadata.google.internal/computeMetadata/v1/instance/attributes/$1" -H "Metadata-Flavor: Google"
+}
+
+ZRAM_SWAP_SIZE=$(get_attribute zram-swap-size || echo auto)
+
+if [ "${ZRAM_SWAP_SIZE}" == "off" ]; then
+    echo "zram swap is disabled"
+    exit 0
+fi
+
+if grep -q "^/dev/zram" /proc/swaps; then
+    echo "zram swap is already set up"
+    exit 0
+fi
+
+if [ "${ZRAM_SWAP_SIZE}" == "auto" ]; then
+    TOTAL_MEMORY_MB=$(( $(grep MemTotal /proc/meminfo | awk '{print $2}') / 1024 ))
+    ZRAM_SWAP_SIZE="$(( TOTAL_MEMORY_MB / 2 < ZRAM_MAX_SIZE_MB ? TOTAL_MEMORY_MB / 2 : ZRAM_MAX_SIZE_MB ))M"
+fi
+
+if ! modprobe zram; then
+    echo "WARNING: zram is not available in this kernel, skipping"
+    exit 0
+fi
+
+# Prefer zstd (better ratio at a similar speed), the kernel default is used otherwise.
+ZRAM_DEVICE=$(zramctl --find --size ${ZRAM_SWAP_SIZE} --algorithm zstd) \
+    || ZRAM_DEVICE=$(zramctl --find --size ${ZRAM_SWAP_SIZE})
+mkswap ${ZRAM_DEVICE}
+swapon --priority 100 ${ZRAM_DEVICE}
+
+# Swapping to memory is cheap: swap more eagerly (rather than dropping the page cache)
+# and one page at a time (no readahead, which only helps on disks).
+sysctl -w vm.swappiness=100
+sysctl -w vm.page-cluster=0
+
+echo "Set up ${ZRAM_SWAP_SIZE} of zram swap on ${ZRAM_DEVICE}"
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+
+"""
+Monitor that protects the IDE and the proxy agent against running out of memory, by
+terminating the largest process of the user jobs slice (where the shells of the IDE
+terminal run) before the kernel OOM killer has to step in.
+
+The memory pressure is monitored using the pressure stall information (PSI) of the
+kernel: a PSI trigger on /proc/pressure/memory wakes the monitor up as soon as tasks
+start stalling on memory, so it doesn't have to poll at a high rate. It intervenes
+when either
+* all (non-idle) tasks were stalled on memory for more than the threshold share of the
+  last 10 seconds ('full avg10'), i.e. the machine is thrashing, or
+* the available memory and free swap are both nearly exhausted.
+Without PSI (e.g. a kernel booted without psi=1), only the latter is checked.
+
+The largest process (by resident + swapped memory) of the slice is sent SIGTERM, and
+SIGKILL if it doesn't exit within a grace period. Interventions are logged (see
+`journalctl -u memory-pressure-monitor`) and exported as Prometheus metrics, together
+with the memory pressure and the zram swap usage.
+"""
+
+import argparse
+from dataclasses import dataclass
+import logging
+import os
+from pathlib import Path
+import select
+import signal
+import time
+from typing import Dict, List, Optional
+
+from workbench_utils import get_attribute_value
+
+PRESSURE_PATH = Path("/proc/pressure/memory")
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+METRICS_PATH = Path("/var/lib/workbench-metrics/memory-pressure.prom")
+JOBS_SLICE = "workbench-jobs.slice"
+
+# Wake up when tasks were stalled on memory for 150ms within a 1s window.
+PSI_TRIGGER = b"some 150000 1000000\0"
+# Interval of the checks (and metrics) without any trigger.
+CHECK_INTERVAL_SECONDS = 5
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+@dataclass
+class Pressure:
+    """Memory pressure of the machine (shares of the last 10s in %, totals in us)."""
+
+    some_avg10: float
+    full_avg10: float
+    some_total: int
+    full_total: int
+
+
+@dataclass
+class Settings:
+    """Settings of the monitor."""
+
+    slices: List[str]
+    full_threshold: float
+    min_available: float
+    grace_seconds: float
+    cooldown_seconds: float
+    metrics_path: Path
+    dry_run: bool
+
+
+@dataclass
+class Process:
+    """Candidate process for an intervention."""
+
+    pid: int
+    command: str
+    memory_bytes: int
+
+
+class Monitor:
+    """Monitors the memory pressure and terminates jobs when it's too high."""
+
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self.interventions = 0
+        self.last_intervention: Optional[float] = None
+        self.last_victim_bytes = 0
+
+    def run(self) -> None:
+        """Runs the monitor until stopped."""
+
+        poller = select.poll()
+        interval = CHECK_INTERVAL_SECONDS
+        if not PRESSURE_PATH.exists():
+            # Kernels without PSI (or booted without psi=1), check every second.
+            logging.warning(
+                f"{PRESSURE_PATH} not found, only intervening on the available memory"
+            )
+            interval = 1
+        else:
+            try:
+                trigger = os.open(PRESSURE_PATH, os.O_RDWR | os.O_NONBLOCK)
+                os.write(trigger, PSI_TRIGGER)
+                poller.register(trigger, select.POLLPRI)
+                logging.info(
+                    f"Registered PSI trigger {PSI_TRIGGER!r} on {PRESSURE_PATH}"
+                )
+            except OSError as error:
+                # E.g. kernels without PSI triggers, check every second instead.
+                logging.warning(f"Failed to register a PSI trigger, polling: {error}")
+                interval = 1
+
+        settings = self.settings
+        logging.info(
+            f"Monitoring {', '.join(settings.slices)} (full avg10 >="
+            f" {settings.full_threshold}% or available memory + swap <"
+            f" {settings.min_available:.0%})"
+        )
+        while True:
+            # Returns on a PSI event or after the interval.
+            poller.poll(interval * 1000)
+            self.check()
+            self.write_metrics()
+
+    def check(self) -> None:
+        """Checks the memory pressure, intervening if it's too high."""
+
+        if (
+            self.last_intervention is not None
+            and time.time() - self.last_intervention < self.settings.cooldown_seconds
+        ):
+            return
+
+        pressure = read_pressure()
+        full_avg10 = pressure.full_avg10 if pressure is not None else 0.0
+        available = read_available_fraction()
+        if (
+            full_avg10 < self.settings.full_threshold
+            and available >= self.settings.min_available
+        ):
+            return
+
+        victim = self.find_largest_process()
+        if victim is None:
+            return
+        logging.warning(
+            f"Memory pressure too high (full avg10 {full_avg10}%, available"
+            f" memory + swap {available:.1%}), terminating the largest job: pid"
+            f" {victim.pid} ({victim.command}) using {victim.memory_bytes // 1024**2}"
+            " MiB"
+        )
+        self.interventions += 1
+        self.last_intervention = time.time()
+        self.last_victim_bytes = victim.memory_bytes
+        if not self.settings.dry_run:
+            terminate(victim.pid, self.settings.grace_seconds)
+
+    def find_largest_process(self) -> Optional[Process]:
+        """Finds the process using the most memory in the slices."""
+
+        largest: Optional[Process] = None
+        for slice_name in self.settings.slices:
+            for procs_path in (CGROUP_ROOT / slice_name).glob("**/cgroup.procs"):
+                try:
+                    pids = [
+                        int(pid)
+                        for pid in procs_path.read_text(encoding="utf-8").split()
+                    ]
+                except OSError:
+                    continue
+                for pid in pids:
+                    process = read_process(pid)
+                    if process is not None and (
+                        largest is None or process.memory_bytes > largest.memory_bytes
+                    ):
+                        largest = process
+        return largest
+
+    def write_metrics(self) -> None:
+        """Writes the Prometheus metrics of the monitor."""
+
+        pressure = read_pressure()
+        meminfo = read_meminfo()
+        zram = read_zram_stats()
+        lines = [
+            "# HELP memory_pressure_interventions_total Jobs terminated by the monitor.",
+            "# TYPE memory_pressure_interventions_total counter",
+            f"memory_pressure_interventions_total {self.interventions}",
+            "# HELP memory_pressure_last_intervention_timestamp_seconds Time of the last"
+            " intervention.",
+            "# TYPE memory_pressure_last_intervention_timestamp_seconds gauge",
+            "memory_pressure_last_intervention_timestamp_seconds"
+            f" {self.last_intervention or 0}",
+            "# HELP memory_pressure_last_intervention_bytes Memory used by the last"
+            " terminated job.",
+            "# TYPE memory_pressure_last_intervention_bytes gauge",
+            f"memory_pressure_last_intervention_bytes {self.last_victim_bytes}",
+            "# HELP memory_pressure_swap_used_bytes Swap in use.",
+            "# TYPE memory_pressure_swap_used_bytes gauge",
+            "memory_pressure_swap_used_bytes"
+            f" {meminfo.get('SwapTotal', 0) - meminfo.get('SwapFree', 0)}",
+            "# HELP memory_pressure_zram_bytes Data stored in zram swap, before and"
+            " after compression.",
+            "# TYPE memory_pressure_zram_bytes gauge",
+            f'memory_pressure_zram_bytes{{kind="original"}} {zram.get("original", 0)}',
+            f'memory_pressure_zram_bytes{{kind="compressed"}}'
+            f' {zram.get("compressed", 0)}',
+        ]
+        if pressure is not None:
+            lines += [
+                "# HELP memory_pressure_avg10 Share of the last 10s tasks were stalled"
+                " on memory (%).",
+                "# TYPE memory_pressure_avg10 gauge",
+                f'memory_pressure_avg10{{kind="some"}} {pressure.some_avg10}',
+                f'memory_pressure_avg10{{kind="full"}} {pressure.full_avg10}',
+                "# HELP memory_pressure_stall_seconds_total Time tasks were stalled on"
+                " memory.",
+                "# TYPE memory_pressure_stall_seconds_total counter",
+                f'memory_pressure_stall_seconds_total{{kind="some"}}'
+                f" {pressure.some_total / 1e6}",
+                f'memory_pressure_stall_seconds_total{{kind="full"}}'
+                f" {pressure.full_total / 1e6}",
+            ]
+        self.settings.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.settings.metrics_path.with_suffix(".tmp")
+        temp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        temp_path.rename(self.settings.metrics_path)
+
+
+def main() -> None:
+    """Main function that starts the monitor."""
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--slice",
+        action="append",
+        help=f"Slice whose processes may be terminated (default {JOBS_SLICE})",
+    )
+    parser.add_argument(
+        "--full-threshold",
+        type=float,
+        help="Full avg10 memory pressure (in %%) to intervene at (default: attribute"
+        " memory-pressure-threshold or 20)",
+    )
+    parser.add_argument(
+        "--min-available",
+        type=float,
+        default=0.05,
+        help="Share of available memory + free swap to intervene below",
+    )
+    parser.add_argument("--grace-seconds", type=float, default=5)
+    parser.add_argument("--cooldown-seconds", type=float, default=10)
+    parser.add_argument("--metrics-file", type=Path, default=METRICS_PATH)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Only log the interventions"
+    )
+    args = parser.parse_args()
+
+    if get_attribute_value("memory-pressure-monitor") == "false":
+        logging.info("The memory pressure monitor is disabled")
+        return
+
+    full_threshold = args.full_threshold
+    if full_threshold is None:
+        full_threshold = float(get_attribute_value("memory-pressure-threshold") or 20)
+
+    settings = Settings(
+        slices=args.slice or [JOBS_SLICE],
+        full_threshold=full_threshold,
+        min_available=args.min_available,
+        grace_seconds=args.grace_seconds,
+        cooldown_seconds=args.cooldown_seconds,
+        metrics_path=args.metrics_file,
+        dry_run=args.dry_run,
+    )
+    Monitor(settings).run()
+
+
+def read_pressure() -> Optional[Pressure]:
+    """Reads the memory pressure of the machine (None if PSI isn't available)."""
+
+    try:
+        text = PRESSURE_PATH.read_text(encoding="utf-8")
+    except OSError:
+        return None
+    values: Dict[str, Dict[str, str]] = {}
+    for line in text.splitlines():
+        kind, *fields = line.split()
+        values[kind] = dict(field.split("=") for field in fields)
+    return Pressure(
+        some_avg10=float(values["some"]["avg10"]),
+        full_avg10=float(values["full"]["avg10"]),
+        some_total=int(values["some"]["total"]),
+        full_total=int(values["full"]["total"]),
+    )
+
+
+def read_meminfo() -> Dict[str, int]:
+    """Reads /proc/meminfo in bytes."""
+
+    meminfo = {}
+    with open("/proc/meminfo", encoding="utf-8") as file:
+        for line in file:
+            key, value = line.split(":")
+            meminfo[key] = int(value.split()[0]) * 1024
+    return meminfo
+
+
+def read_available_fraction() -> float:
+    """Returns the share of the memory + swap that is still available."""
+
+    meminfo = read_meminfo()
+    available = meminfo["MemAvailable"] + meminfo.get("SwapFree", 0)
+    return available / (meminfo["MemTotal"] + meminfo.get("SwapTotal", 0))
+
+
+def read_zram_stats() -> Dict[str, int]:
+    """Reads the original and compressed size of the data in the zram devices."""
+
+    stats = {"original": 0, "compressed": 0}
+    for mm_stat in Path("/sys/block").glob("zram*/mm_stat"):
+        fields = mm_stat.read_text(encoding="utf-8").split()
+        stats["original"] += int(fields[0])
+        stats["compressed"] += int(fields[1])
+    return stats
+
+
+def read_process(pid: int) -> Optional[Process]:
+    """Reads the memory use of a process (None if it's gone or OOM-protected)."""
+
+    try:
+        if int(Path(f"/proc/{pid}/oom_score_adj").read_text(encoding="utf-8")) == -1000:
+            return None
+        status = {}
+        for line in (
+            Path(f"/proc/{pid}/status").read_text(encoding="utf-8").splitlines()
+        ):
+            key, _, value = line.partition(":")
+            status[key] = value.strip()
+    except (OSError, ValueError):
+        return None
+
+    memory = sum(
+        int(status[key].split()[0]) * 1024
+        for key in ["VmRSS", "VmSwap"]
+        if key in status
+    )
+    return Process(pid=pid, command=status.get("Name", "?"), memory_bytes=memory)
+
+
+def terminate(pid: int, grace_seconds: float) -> None:
+    """Terminates a process, killing it if it doesn't exit within the grace period."""
+
+    try:
+        os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + grace_seconds
+        while time.monotonic() < deadline:
+            if not Path(f"/proc/{pid}").exists():
+                logging.info(f"Process {pid} exited")
+                return
+            time.sleep(0.1)
+        logging.warning(f"Process {pid} didn't exit within {grace_seconds}s, killing")
+        os.kill(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -15,11 +15,44 @@ tar -xvf openvscode-server-v${OPENVSCODE_SERVER_VERSION}-linux-x64.tar.gz -C /op
 chown -R root:root /opt/openvscode-server && \
 rm openvscode-server-v${OPENVSCODE_SERVER_VERSION}-linux-x64.tar.gz
 
-# Install + enable service to start on boot.
+# Install + enable service to start on boot. The IDE port is owned by a socket unit
+# that starts the server on the first connection, while the server itself is also
+# started eagerly on boot (disable openvscode-server.service to only start on demand).
 cp ${SCRIPT_DIR}/openvscode-server.service /etc/systemd/system/openvscode-server.service
+cp ${SCRIPT_DIR}/openvscode-server.socket /etc/systemd/system/openvscode-server.socket
+cp ${SCRIPT_DIR}/openvscode-server-proxy.service /etc/systemd/system/openvscode-server-proxy.service
+cp ${SCRIPT_DIR}/openvscode-server-ttfb.service /etc/systemd/system/openvscode-server-ttfb.service
+systemctl enable openvscode-server.socket
 systemctl enable openvscode-server
+# The time-to-first-byte probe is opt-in (systemctl enable openvscode-server-ttfb): its
+# request on boot would start the server in socket mode, defeating the activation on
+# demand.
 
-# Install extensions.
-runuser --user ubuntu -- /opt/openvscode-server/bin/openvscode-server --install-extension ms-python.python
-runuser --user ubuntu -- /opt/openvscode-server/bin/openvscode-server --install-extension tamasfe.even-better-toml
-runuser --user ubuntu -- /opt/openvscode-server/bin/openvscode-server --install-extension akamud.vscode-theme-onedark
+# Install bootstrap scripts + service that prepare the home dir on boot.
+mkdir -p /opt/openvscode-server-bootstrap
+cp ${SCRIPT_DIR}/openvscode-server-bootstrap/* /opt/openvscode-server-bootstrap/
+cp ${SCRIPT_DIR}/openvscode-server-bootstrap.service /etc/systemd/system/openvscode-server-bootstrap.service
+systemctl enable openvscode-server-bootstrap
+
+# Install the CLI reporting the inotify watches per process.
+chmod +x /opt/openvscode-server-bootstrap/inotify-report.py
+ln -sf /opt/openvscode-server-bootstrap/inotify-report.py /usr/local/bin/inotify-report
+
+# Install the multi-user mode: a service that creates the users in the ide-users
+# attribute on boot and starts an instance of the templated server for each of them,
+# and the CLI + timer reporting the resource use and latency of each instance.
+cp ${SCRIPT_DIR}/openvscode-server@.service /etc/systemd/system/openvscode-server@.service
+cp ${SCRIPT_DIR}/openvscode-multi-user.service /etc/systemd/system/openvscode-multi-user.service
+cp ${SCRIPT_DIR}/ide-users-report.service /etc/systemd/system/ide-users-report.service
+cp ${SCRIPT_DIR}/ide-users-report.timer /etc/systemd/system/ide-users-report.timer
+systemctl enable openvscode-multi-user
+systemctl enable ide-users-report.timer
+chmod +x /opt/openvscode-server-bootstrap/ide-users-report.py
+ln -sf /opt/openvscode-server-bootstrap/ide-users-report.py /usr/local/bin/ide-users-report
+
+# Bundle the pinned extensions on the boot disk, so they can be installed offline
+# on boot (the extensions dir in the home dir is shadowed by the data disk).
+python3 /opt/openvscode-server-bootstrap/install-extensions.py bundle ${SCRIPT_DIR}/extensions.txt
+
+# Install extensions (for instances without a data disk).
+bash /opt/openvscode-server-bootstrap/openvscode-server-bootstrap.sh
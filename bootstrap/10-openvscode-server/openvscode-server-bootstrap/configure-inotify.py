@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+"""
+Script that sizes the inotify limits of the kernel (fs.inotify.max_user_watches and
+fs.inotify.max_user_instances) based on the memory of the machine, so that the file
+watchers of openvscode-server don't run out of watches on large workspaces.
+
+Each watch uses roughly 1 KiB of (unswappable) kernel memory, so the maximum number of
+watches is chosen such that all watches together can use at most a fixed fraction of
+the total memory.
+"""
+
+from dataclasses import dataclass
+import logging
+from pathlib import Path
+import subprocess
+
+from workbench_utils import get_total_memory
+
+SYSCTL_PATH = Path("/run/sysctl.d/60-workbench-inotify.conf")
+
+WATCH_SIZE = 1080
+WATCHES_MEMORY_FRACTION = 0.05
+MIN_WATCHES = 131072
+MAX_WATCHES = 4194304
+INSTANCES_PER_GIB = 128
+MIN_INSTANCES = 256
+MAX_INSTANCES = 2048
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+@dataclass
+class InotifyLimits:
+    """Inotify limits of the kernel."""
+
+    max_user_watches: int
+    max_user_instances: int
+
+
+def main() -> None:
+    """Main function that applies the inotify limits for the current machine."""
+
+    limits = compute_limits(get_total_memory())
+    logging.info(f"Setting inotify limits: {limits}")
+
+    SYSCTL_PATH.parent.mkdir(parents=True, exist_ok=True)
+    SYSCTL_PATH.write_text(
+        f"fs.inotify.max_user_watches = {limits.max_user_watches}\n"
+        f"fs.inotify.max_user_instances = {limits.max_user_instances}\n"
+    )
+    subprocess.run(["sysctl", "-p", str(SYSCTL_PATH)], check=True)
+
+
+def compute_limits(total_memory: int) -> InotifyLimits:
+    """Computes the inotify limits for a machine with the given amount of memory."""
+
+    watches = int(total_memory * WATCHES_MEMORY_FRACTION / WATCH_SIZE)
+    instances = int(total_memory / 1024**3 * INSTANCES_PER_GIB)
+
+    return InotifyLimits(
+        max_user_watches=min(max(watches, MIN_WATCHES), MAX_WATCHES),
+        max_user_instances=min(max(instances, MIN_INSTANCES), MAX_INSTANCES),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env bash
+
+# This script configures the multi-user mode on boot, in which every user listed in the
+# ide-users attribute gets its own openvscode-server instance (openvscode-server@.service)
+# on its own port and in its own resource slice, behind the IDE front proxy that routes
+# the requests of each user to their instance.
+#
+# For every user it
+# - creates the user (not in the docker group nor a sudoer, unlike the default user, as
+#   both are equivalent to root).
+# - bind mounts their home dir from the data disk, so it survives boot disk upgrades.
+# - prepares the home dir for openvscode-server (extensions + machine settings).
+# - generates the connection token of the user (once, kept in their home dir), which
+#   their instance requires, so that other users can't use it through the front proxy
+#   or on its local port.
+# - assigns a port and starts the instance.
+#
+# The default instance (of the default user, who has sudo) requires a connection token
+# as well in multi-user mode, passed to openvscode-server.service in ubuntu.env.
+#
+# The ports of all users are written to /run/openvscode-users/users.json for the front
+# proxy and ide-users-report, the tokens to tokens.json (only readable by the default
+# user, which runs the front proxy, and hands out the links of the users with
+# `ide-users-report --links`).
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+DEFAULT_USER=ubuntu
+DEFAULT_PORT=8080
+USERS_ROOT=/home/ubuntu/.workbench-users
+RUN_DIR=/run/openvscode-users
+BASE_PORT=8100
+
+SCRIPT_DIR=`dirname $0 | xargs realpath`
+
+get_attribute() {
+    curl --fail "http://metadata.google.internal/computeMetadata/v1/instance/attributes/$1" -H "Metadata-Flavor: Google"
+}
+
+# Generates the connection token of a user (once), and adds it to tokens.json. Tokens
+# are only read from files (never expanded in commands), so they don't end up in the
+# trace of this script in the journal.
+add_token() {
+    local USER_NAME=$1
+    local TOKEN_FILE=$2
+    if [ ! -s ${TOKEN_FILE} ]; then
+        (umask 077 && openssl rand -hex 32 > ${TOKEN_FILE})
+    fi
+    chown ${USER_NAME}:${USER_NAME} ${TOKEN_FILE}
+    chmod 600 ${TOKEN_FILE}
+    (umask 077 && jq --arg user ${USER_NAME} --rawfile token ${TOKEN_FILE} '. + {($user): ($token | rtrimstr("\n"))}' \
+        ${RUN_DIR}/tokens.json.tmp > ${RUN_DIR}/tokens.json.next)
+    mv ${RUN_DIR}/tokens.json.next ${RUN_DIR}/tokens.json.tmp
+}
+
+IDE_USERS=$(get_attribute ide-users || echo "")
+IDE_USER_MEMORY_HIGH=$(get_attribute ide-user-memory-high || echo "")
+
+mkdir -p ${RUN_DIR}
+USERS_JSON=$(jq -n --arg user ${DEFAULT_USER} --argjson port ${DEFAULT_PORT} '{($user): $port}')
+
+if [ -z "${IDE_USERS}" ]; then
+    echo "Multi-user mode is not enabled"
+    echo "${USERS_JSON}" > ${RUN_DIR}/users.json
+    rm -f ${RUN_DIR}/tokens.json ${RUN_DIR}/${DEFAULT_USER}.env
+    exit 0
+fi
+
+(umask 077 && echo "{}" > ${RUN_DIR}/tokens.json.tmp)
+DEFAULT_TOKEN_FILE=/home/${DEFAULT_USER}/.openvscode-server/connection-token
+add_token ${DEFAULT_USER} ${DEFAULT_TOKEN_FILE}
+echo "IDE_TOKEN_ARGS=--connection-token-file ${DEFAULT_TOKEN_FILE}" > ${RUN_DIR}/${DEFAULT_USER}.env
+
+PORT=${BASE_PORT}
+for IDE_USER in ${IDE_USERS//;/ }; do
+    # User names are also used in slice names, where a dash denotes a parent slice.
+    if [[ ! ${IDE_USER} =~ ^[a-z_][a-z0-9_]{0,31}$ ]]; then
+        echo "Skipping invalid user name: ${IDE_USER}"
+        continue
+    fi
+    if [ ${IDE_USER} == ${DEFAULT_USER} ]; then
+        continue
+    fi
+
+    USER_HOME_DIR=/home/${IDE_USER}
+    if ! id -u ${IDE_USER} > /dev/null 2>&1; then
+        useradd --home-dir ${USER_HOME_DIR} --no-create-home --shell /bin/bash ${IDE_USER}
+    fi
+    # Users created by earlier versions of the image were in the docker group.
+    if id -nG ${IDE_USER} | grep -qw docker; then
+        gpasswd --delete ${IDE_USER} docker
+    fi
+
+    mkdir -p ${USERS_ROOT}/${IDE_USER} ${USER_HOME_DIR}
+    if ! mountpoint -q ${USER_HOME_DIR}; then
+        mount --bind ${USERS_ROOT}/${IDE_USER} ${USER_HOME_DIR}
+    fi
+    if [ ! -f ${USER_HOME_DIR}/.bashrc ]; then
+        cp -r /etc/skel/. ${USER_HOME_DIR}/
+    fi
+
+    python3 ${SCRIPT_DIR}/install-extensions.py install \
+        --extensions-dir ${USER_HOME_DIR}/.openvscode-server/extensions \
+        --metrics ${RUN_DIR}/${IDE_USER}-extensions.prom
+    python3 ${SCRIPT_DIR}/merge-machine-settings.py \
+        --settings ${USER_HOME_DIR}/.openvscode-server/data/Machine/settings.json
+    chown -R ${IDE_USER}:${IDE_USER} ${USER_HOME_DIR}
+    chmod 700 ${USER_HOME_DIR}
+
+    # Optional memory limit per user, the slice of each user is a child of the IDE slice.
+    if [ -n "${IDE_USER_MEMORY_HIGH}" ]; then
+        mkdir -p /run/systemd/system/workbench-ide-${IDE_USER}.slice.d
+        printf "[Slice]\nMemoryHigh=%s\n" ${IDE_USER_MEMORY_HIGH} \
+            > /run/systemd/system/workbench-ide-${IDE_USER}.slice.d/50-memory.conf
+    fi
+
+    TOKEN_FILE=${USER_HOME_DIR}/.openvscode-server/connection-token
+    add_token ${IDE_USER} ${TOKEN_FILE}
+    printf "IDE_PORT=%s\nIDE_TOKEN_FILE=%s\n" ${PORT} ${TOKEN_FILE} > ${RUN_DIR}/${IDE_USER}.env
+    USERS_JSON=$(echo "${USERS_JSON}" | jq --arg user ${IDE_USER} --argjson port ${PORT} '. + {($user): $port}')
+    PORT=$((PORT + 1))
+done
+
+echo "${USERS_JSON}" > ${RUN_DIR}/users.json.tmp
+mv ${RUN_DIR}/users.json.tmp ${RUN_DIR}/users.json
+chown ${DEFAULT_USER}:${DEFAULT_USER} ${RUN_DIR}/tokens.json.tmp
+mv ${RUN_DIR}/tokens.json.tmp ${RUN_DIR}/tokens.json
+
+systemctl daemon-reload
+for IDE_USER in $(jq -r 'keys[]' ${RUN_DIR}/users.json); do
+    if [ ${IDE_USER} != ${DEFAULT_USER} ]; then
+        systemctl --no-block start openvscode-server@${IDE_USER}.service
+    fi
+done
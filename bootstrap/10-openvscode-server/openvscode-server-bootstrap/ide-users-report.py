@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+
+"""
+Reports the memory use, CPU time and request latency of the openvscode-server instance
+of every user in multi-user mode (see configure-multi-user.sh). Memory and CPU are read
+from the cgroup of each instance (which includes its extension hosts and terminals),
+latency is measured for requests sent directly to the instance and through the IDE
+front proxy, which routes them using the cookie of the user (both with the connection
+token of the user, which their instance requires).
+
+With --links, prints the link with which each user selects their instance through the
+front proxy instead (to be appended to the URL of the proxy and handed out to them).
+"""
+
+import argparse
+from dataclasses import asdict, dataclass
+import json
+import logging
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+USERS_PATH = Path("/run/openvscode-users/users.json")
+TOKENS_PATH = Path("/run/openvscode-users/tokens.json")
+METRICS_PATH = Path("/var/lib/workbench-metrics/openvscode-users.prom")
+DEFAULT_USER = "ubuntu"
+FRONT_PROXY_PORT = 8082
+USER_COOKIE = "workbench-ide-user"
+# Cookie in which openvscode-server expects the connection token.
+TOKEN_COOKIE = "vscode-tkn"
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+@dataclass
+class UserReport:
+    """Resource use and latency of the instance of a user."""
+
+    user: str
+    port: int
+    state: str
+    memory_bytes: Optional[int]
+    cpu_seconds: Optional[float]
+    direct_latency_seconds: Optional[float]
+    routed_latency_seconds: Optional[float]
+
+
+def main() -> None:
+    """Main function that reports the users."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users-file", type=Path, default=USERS_PATH)
+    parser.add_argument("--tokens-file", type=Path, default=TOKENS_PATH)
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--front-proxy-port", type=int, default=FRONT_PROXY_PORT)
+    parser.add_argument("--json", action="store_true", help="Report as JSON")
+    parser.add_argument(
+        "--links", action="store_true", help="Print the link of each user's IDE"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        help=f"Write the report as Prometheus metrics (e.g. {METRICS_PATH})",
+    )
+    args = parser.parse_args()
+
+    if not args.users_file.exists():
+        sys.exit(f"{args.users_file} not found, is openvscode-multi-user.service done?")
+    users: Dict[str, int] = json.loads(args.users_file.read_text(encoding="utf-8"))
+    tokens: Dict[str, str] = (
+        json.loads(args.tokens_file.read_text(encoding="utf-8"))
+        if args.tokens_file.exists()
+        else {}
+    )
+
+    if args.links:
+        for user, token in tokens.items():
+            print(f"{user:<16} /_user/{user}?tkn={token}")
+        return
+
+    reports = [
+        report_user(user, port, tokens.get(user), args.front_proxy_port, args.requests)
+        for user, port in users.items()
+    ]
+
+    if args.metrics_file is not None:
+        write_metrics(args.metrics_file, reports)
+    if args.json:
+        json.dump([asdict(report) for report in reports], sys.stdout, indent=2)
+        print()
+    elif args.metrics_file is None:
+        print_table(reports)
+
+
+def report_user(
+    user: str, port: int, token: Optional[str], front_proxy_port: int, requests: int
+) -> UserReport:
+    """Reports the instance of a user."""
+
+    unit = (
+        "openvscode-server.service"
+        if user == DEFAULT_USER
+        else f"openvscode-server@{user}.service"
+    )
+    properties = systemd_properties(
+        unit, ["ActiveState", "MemoryCurrent", "CPUUsageNSec"]
+    )
+    cpu_nsec = parse_int(properties.get("CPUUsageNSec"))
+    cookies = {TOKEN_COOKIE: token} if token is not None else {}
+
+    return UserReport(
+        user=user,
+        port=port,
+        state=properties.get("ActiveState", "unknown"),
+        memory_bytes=parse_int(properties.get("MemoryCurrent")),
+        cpu_seconds=cpu_nsec / 1e9 if cpu_nsec is not None else None,
+        direct_latency_seconds=measure_latency(port, cookies, requests),
+        routed_latency_seconds=measure_latency(
+            front_proxy_port, {USER_COOKIE: user, **cookies}, requests
+        ),
+    )
+
+
+def systemd_properties(unit: str, names: List[str]) -> Dict[str, str]:
+    """Reads properties of a systemd unit."""
+
+    result = subprocess.run(
+        ["systemctl", "show", unit, *[f"--property={name}" for name in names]],
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    return dict(
+        line.split("=", 1) for line in result.stdout.splitlines() if "=" in line
+    )
+
+
+def parse_int(value: Optional[str]) -> Optional[int]:
+    """Parses an integer property (None if it is not set, e.g. '[not set]')."""
+
+    return int(value) if value is not None and value.isdigit() else None
+
+
+def measure_latency(
+    port: int, cookies: Dict[str, str], requests: int
+) -> Optional[float]:
+    """Returns the median time to load the IDE page (None if the requests fail)."""
+
+    headers = (
+        {"Cookie": "; ".join(f"{name}={value}" for name, value in cookies.items())}
+        if cookies
+        else {}
+    )
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            with urlopen(
+                Request(f"http://127.0.0.1:{port}/", headers=headers), timeout=10
+            ) as response:
+                response.read()
+        except (URLError, OSError) as error:
+            logging.debug(f"Request to port {port} failed: {error}")
+            return None
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def print_table(reports: List[UserReport]) -> None:
+    """Prints the reports as a table."""
+
+    print(
+        f"{'USER':<16} {'PORT':>5} {'STATE':<10} {'MEMORY':>10} {'CPU':>9}"
+        f" {'DIRECT':>9} {'ROUTED':>9}"
+    )
+    for report in reports:
+        memory = (
+            f"{report.memory_bytes / 1024**2:.0f}M"
+            if report.memory_bytes is not None
+            else "-"
+        )
+        print(
+            f"{report.user:<16} {report.port:>5} {report.state:<10} {memory:>10}"
+            f" {format_seconds(report.cpu_seconds):>9}"
+            f" {format_seconds(report.direct_latency_seconds):>9}"
+            f" {format_seconds(report.routed_latency_seconds):>9}"
+        )
+
+
+def format_seconds(seconds: Optional[float]) -> str:
+    """Formats a duration for the table."""
+
+    return f"{seconds:.3f}s" if seconds is not None else "-"
+
+
+def write_metrics(path: Path, reports: List[UserReport]) -> None:
+    """Writes the reports as Prometheus metrics."""
+
+    lines = [
+        "# HELP openvscode_user_memory_bytes Memory used by the IDE of a user.",
+        "# TYPE openvscode_user_memory_bytes gauge",
+        *[
+            f'openvscode_user_memory_bytes{{user="{report.user}"}} {report.memory_bytes}'
+            for report in reports
+            if report.memory_bytes is not None
+        ],
+        "# HELP openvscode_user_cpu_seconds CPU time used by the IDE of a user.",
+        "# TYPE openvscode_user_cpu_seconds counter",
+        *[
+            f'openvscode_user_cpu_seconds{{user="{report.user}"}} {report.cpu_seconds}'
+            for report in reports
+            if report.cpu_seconds is not None
+        ],
+        "# HELP openvscode_user_latency_seconds Time to load the IDE page of a user.",
+        "# TYPE openvscode_user_latency_seconds gauge",
+    ]
+    for report in reports:
+        for route, latency in [
+            ("direct", report.direct_latency_seconds),
+            ("routed", report.routed_latency_seconds),
+        ]:
+            if latency is not None:
+                lines.append(
+                    f'openvscode_user_latency_seconds{{user="{report.user}",'
+                    f'route="{route}"}} {latency}'
+                )
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(".tmp")
+    temp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    temp_path.rename(path)
+
+
+if __name__ == "__main__":
+    main()
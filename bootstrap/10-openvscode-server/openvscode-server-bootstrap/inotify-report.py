@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+"""
+Reports the number of inotify instances and watches used per process, together with
+the limits of the kernel. Useful for finding out which file watchers are using up the
+inotify watches. Run as root (e.g. using sudo) to include processes of all users.
+"""
+
+import argparse
+from dataclasses import asdict, dataclass
+import json
+import os
+from pathlib import Path
+import pwd
+from typing import List, Optional
+
+
+@dataclass
+class ProcessWatches:
+    """Inotify usage of a single process."""
+
+    pid: int
+    user: str
+    command: str
+    instances: int
+    watches: int
+
+
+def main() -> None:
+    """Main function that prints the report."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--top", type=int, default=20, help="Number of processes")
+    args = parser.parse_args()
+
+    processes = sorted(
+        (usage for usage in map(get_process_watches, list_pids()) if usage),
+        key=lambda usage: usage.watches,
+        reverse=True,
+    )
+    limits = {
+        name: int(Path(f"/proc/sys/fs/inotify/{name}").read_text(encoding="utf-8"))
+        for name in ("max_user_watches", "max_user_instances")
+    }
+
+    if args.json:
+        report = {
+            "limits": limits,
+            "total_watches": sum(usage.watches for usage in processes),
+            "processes": [asdict(usage) for usage in processes],
+        }
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'PID':>8} {'USER':<10} {'INSTANCES':>9} {'WATCHES':>9}  COMMAND")
+    for usage in processes[: args.top]:
+        print(
+            f"{usage.pid:>8} {usage.user:<10} {usage.instances:>9}"
+            f" {usage.watches:>9}  {usage.command}"
+        )
+    print(
+        f"\nTotal: {sum(usage.watches for usage in processes)} watches"
+        f" (limits: {limits['max_user_watches']} watches and"
+        f" {limits['max_user_instances']} instances per user)"
+    )
+
+
+def list_pids() -> List[int]:
+    """Lists the PIDs of all running processes."""
+    return [int(entry) for entry in os.listdir("/proc") if entry.isdigit()]
+
+
+def get_process_watches(pid: int) -> Optional[ProcessWatches]:
+    """Counts the inotify instances and watches of a process (None if it has none)."""
+
+    instances = watches = 0
+    try:
+        for fd in os.listdir(f"/proc/{pid}/fd"):
+            if os.readlink(f"/proc/{pid}/fd/{fd}") != "anon_inode:inotify":
+                continue
+            instances += 1
+            with open(f"/proc/{pid}/fdinfo/{fd}", encoding="utf-8") as fdinfo:
+                watches += sum(line.startswith("inotify wd:") for line in fdinfo)
+
+        if instances == 0:
+            return None
+
+        with open(f"/proc/{pid}/cmdline", "rb") as cmdline:
+            command = cmdline.read().replace(b"\0", b" ").decode(errors="replace")
+        uid = os.stat(f"/proc/{pid}").st_uid
+    except (FileNotFoundError, PermissionError, ProcessLookupError):
+        return None
+
+    return ProcessWatches(
+        pid=pid,
+        user=get_user_name(uid),
+        command=command.strip()[:80],
+        instances=instances,
+        watches=watches,
+    )
+
+
+def get_user_name(uid: int) -> str:
+    """Returns the name of the user with the given UID."""
+
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return str(uid)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+
+"""
+Script that manages an offline bundle of pinned openvscode-server extensions, so that
+the extensions can be installed into the user's extensions directory on (first) boot
+without network access. This is needed because the extensions directory is on the
+data disk, which shadows anything installed into the home directory at build time.
+
+Supports the following commands:
+* bundle: downloads the pinned .vsix files (from Open VSX) into the bundle directory
+  and writes a manifest with their versions and checksums. Run at image build time.
+* install: installs the extensions from the bundle that are missing or outdated in the
+  extensions directory, by extracting the .vsix files in parallel. Run at boot.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import time
+from typing import List, Tuple
+from urllib.request import urlopen
+import zipfile
+
+BUNDLE_DIR = Path("/opt/openvscode-server-extensions")
+EXTENSIONS_DIR = Path("/home/ubuntu/.openvscode-server/extensions")
+METRICS_PATH = Path("/var/lib/workbench-metrics/openvscode-extensions.prom")
+
+OPEN_VSX_URL = "https://open-vsx.org/api"
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+@dataclass
+class BundledExtension:
+    """A pinned extension in the bundle."""
+
+    id: str
+    version: str
+    file: str
+    sha256: str
+
+    @property
+    def folder_name(self) -> str:
+        """Name of the folder the extension is installed in."""
+        return f"{self.id.lower()}-{self.version}"
+
+
+def main() -> None:
+    """Main function that dispatches to the requested command."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bundle-dir", type=Path, default=BUNDLE_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    bundle_parser = subparsers.add_parser("bundle")
+    bundle_parser.add_argument(
+        "extensions_file",
+        type=Path,
+        help="File listing the extensions to bundle as 'publisher.name@version'",
+    )
+
+    install_parser = subparsers.add_parser("install")
+    install_parser.add_argument("--extensions-dir", type=Path, default=EXTENSIONS_DIR)
+    install_parser.add_argument("--workers", type=int, default=4)
+    install_parser.add_argument("--metrics", type=Path, default=METRICS_PATH)
+
+    args = parser.parse_args()
+
+    if args.command == "bundle":
+        bundle(args.bundle_dir, args.extensions_file)
+    else:
+        install(args.bundle_dir, args.extensions_dir, args.workers, args.metrics)
+
+
+def bundle(bundle_dir: Path, extensions_file: Path) -> None:
+    """Downloads the pinned extensions into the bundle and writes its manifest."""
+
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    extensions = []
+
+    for line in extensions_file.read_text().splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+
+        extension_id, version = line.split("@")
+        publisher, name = extension_id.split(".", 1)
+        file_name = f"{extension_id}-{version}.vsix"
+
+        url = f"{OPEN_VSX_URL}/{publisher}/{name}/{version}/file/{file_name}"
+        logging.info(f"Downloading '{url}'")
+        with urlopen(url) as response, open(bundle_dir / file_name, "wb") as file:
+            shutil.copyfileobj(response, file)
+
+        extensions.append(
+            BundledExtension(
+                id=extension_id,
+                version=version,
+                file=file_name,
+                sha256=sha256sum(bundle_dir / file_name),
+            )
+        )
+
+    manifest = [asdict(extension) for extension in extensions]
+    (bundle_dir / "manifest.json").write_text(json.dumps(manifest, indent=2) + "\n")
+
+
+def install(
+    bundle_dir: Path, extensions_dir: Path, workers: int, metrics: Path
+) -> None:
+    """Installs the missing/outdated extensions of the bundle (in parallel)."""
+
+    start = time.monotonic()
+
+    manifest = json.loads((bundle_dir / "manifest.json").read_text())
+    extensions = [BundledExtension(**values) for values in manifest]
+
+    extensions_dir.mkdir(parents=True, exist_ok=True)
+    pending = [
+        extension
+        for extension in extensions
+        if needs_install(extension, extensions_dir)
+    ]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(
+            executor.map(
+                lambda extension: install_extension(
+                    extension, bundle_dir, extensions_dir
+                ),
+                pending,
+            )
+        )
+
+    duration = time.monotonic() - start
+    logging.info(
+        f"Installed {len(pending)} of {len(extensions)} bundled extensions"
+        f" in {duration:.2f}s"
+    )
+    write_metrics(metrics, installed=len(pending), duration=duration)
+
+
+def needs_install(extension: BundledExtension, extensions_dir: Path) -> bool:
+    """
+    Checks if an extension is missing or outdated. Versions that are newer than the
+    bundled one (e.g. updated by the user) are left alone.
+    """
+
+    for folder, version in installed_versions(extension.id, extensions_dir):
+        if parse_version(version) >= parse_version(extension.version):
+            logging.info(f"Extension '{extension.id}' is up to date ({folder.name})")
+            return False
+    return True
+
+
+def installed_versions(
+    extension_id: str, extensions_dir: Path
+) -> List[Tuple[Path, str]]:
+    """Returns the folders (with versions) in which the given extension is installed."""
+
+    prefix = f"{extension_id.lower()}-"
+    return [
+        (folder, folder.name[len(prefix) :])
+        for folder in extensions_dir.iterdir()
+        if folder.is_dir()
+        and folder.name.lower().startswith(prefix)
+        and (folder / "package.json").exists()
+    ]
+
+
+def install_extension(
+    extension: BundledExtension, bundle_dir: Path, extensions_dir: Path
+) -> None:
+    """Extracts the .vsix of an extension into the extensions directory."""
+
+    vsix_path = bundle_dir / extension.file
+    if sha256sum(vsix_path) != extension.sha256:
+        raise ValueError(f"Checksum mismatch for '{vsix_path}'")
+
+    logging.info(f"Installing extension '{extension.id}' ({extension.version})")
+
+    # Extract into a temporary folder first so a partial install is never picked up.
+    with tempfile.TemporaryDirectory(dir=extensions_dir, prefix=".tmp-") as tmp_dir:
+        with zipfile.ZipFile(vsix_path) as vsix:
+            members = [
+                name for name in vsix.namelist() if name.startswith("extension/")
+            ]
+            vsix.extractall(tmp_dir, members=members)
+
+        target = extensions_dir / extension.folder_name
+        if target.exists():
+            shutil.rmtree(target)
+        os.rename(Path(tmp_dir) / "extension", target)
+
+    # Remove the outdated versions of the extension.
+    for folder, version in installed_versions(extension.id, extensions_dir):
+        if version != extension.version:
+            logging.info(f"Removing outdated extension folder '{folder.name}'")
+            shutil.rmtree(folder)
+
+
+def parse_version(version: str) -> Tuple[int, ...]:
+    """Parses a version (e.g. '2022.12.1') into a comparable tuple."""
+    return tuple(int(part) if part.isdigit() else 0 for part in version.split("."))
+
+
+def sha256sum(path: Path) -> str:
+    """Computes the SHA256 checksum of a file."""
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024**2), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_metrics(path: Path, installed: int, duration: float) -> None:
+    """Records the number of installed extensions and the time taken as metrics."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        "# HELP openvscode_extensions_installed Extensions installed from the bundle.\n"
+        "# TYPE openvscode_extensions_installed gauge\n"
+        f"openvscode_extensions_installed {installed}\n"
+        "# HELP openvscode_extensions_install_seconds Time taken to install them.\n"
+        "# TYPE openvscode_extensions_install_seconds gauge\n"
+        f"openvscode_extensions_install_seconds {duration:.3f}\n"
+    )
+
+
+if __name__ == "__main__":
+    main()
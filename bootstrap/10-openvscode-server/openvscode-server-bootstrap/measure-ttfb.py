@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+"""
+Script that measures the time-to-first-byte of openvscode-server from boot, i.e. the
+time from kernel start until the first request to the IDE port returns its first byte.
+
+The request is sent when the script is started (on boot, at the point where the proxy
+agent would send its first request), so the result includes the time that connection
+spends queued on openvscode-server.socket while the server is (socket-)activated.
+The result is logged and exported as metrics, labelled with the start mode
+('eager' if openvscode-server.service is started on boot, 'socket' otherwise).
+
+The probe is opt-in (openvscode-server-ttfb.service isn't enabled by default), as in
+socket mode its own request starts the server on boot: the 'socket' result is the cold
+start of the server as seen by a request at that point of the boot, not the time a user
+actually waited.
+"""
+
+import argparse
+import logging
+from pathlib import Path
+import socket
+import subprocess
+import time
+
+METRICS_PATH = Path("/var/lib/workbench-metrics/openvscode-server-ttfb.prom")
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+def main() -> None:
+    """Main function that measures and records the time-to-first-byte."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", type=Path, default=METRICS_PATH)
+    args = parser.parse_args()
+
+    mode = get_start_mode()
+    request_time = time.clock_gettime(time.CLOCK_BOOTTIME)
+    first_byte_time = wait_for_first_byte(args.host, args.port, args.timeout)
+
+    logging.info(
+        f"Start mode '{mode}': request sent {request_time:.2f}s after boot,"
+        f" first byte {first_byte_time - request_time:.2f}s later"
+        f" ({first_byte_time:.2f}s after boot)"
+    )
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(
+        "# HELP openvscode_server_request_seconds Seconds from boot until the request.\n"
+        "# TYPE openvscode_server_request_seconds gauge\n"
+        f'openvscode_server_request_seconds{{mode="{mode}"}} {request_time:.3f}\n'
+        "# HELP openvscode_server_ttfb_seconds Seconds from boot until the first byte.\n"
+        "# TYPE openvscode_server_ttfb_seconds gauge\n"
+        f'openvscode_server_ttfb_seconds{{mode="{mode}"}} {first_byte_time:.3f}\n'
+    )
+
+
+def get_start_mode() -> str:
+    """Returns whether openvscode-server is started eagerly or by socket activation."""
+
+    result = subprocess.run(
+        ["systemctl", "is-enabled", "openvscode-server.service"],
+        check=False,
+        capture_output=True,
+    )
+    return "eager" if result.stdout.decode().strip() == "enabled" else "socket"
+
+
+def wait_for_first_byte(host: str, port: int, timeout: float) -> float:
+    """
+    Sends a request to the given port (retrying while the connection is refused) and
+    returns the time since boot at which the first byte of the response arrived.
+    """
+
+    deadline = time.monotonic() + timeout
+
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=timeout) as sock:
+                sock.sendall(f"GET / HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+                if sock.recv(1):
+                    return time.clock_gettime(time.CLOCK_BOOTTIME)
+        except OSError:
+            pass
+
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"No response from {host}:{port} within {timeout}s")
+        time.sleep(0.1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+"""
+Script that merges the default machine settings of the image into the machine settings
+of openvscode-server. Settings that are already present are left alone, so that any
+changes made by the user are kept.
+"""
+
+import argparse
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict
+
+DEFAULTS_PATH = Path(__file__).parent / "machine-settings.json"
+SETTINGS_PATH = Path("/home/ubuntu/.openvscode-server/data/Machine/settings.json")
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+def main() -> None:
+    """Main function that merges the default settings."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--defaults", type=Path, default=DEFAULTS_PATH)
+    parser.add_argument("--settings", type=Path, default=SETTINGS_PATH)
+    args = parser.parse_args()
+
+    defaults: Dict[str, Any] = json.loads(args.defaults.read_text())
+
+    settings: Dict[str, Any] = {}
+    if args.settings.exists():
+        try:
+            settings = json.loads(args.settings.read_text() or "{}")
+        except json.JSONDecodeError:
+            # Settings may contain comments, which we can't safely rewrite.
+            logging.warning(f"Can't parse '{args.settings}', skipping defaults")
+            return
+
+    missing = {key: value for key, value in defaults.items() if key not in settings}
+    if not missing:
+        return
+
+    logging.info(f"Adding default machine settings: {', '.join(missing)}")
+    args.settings.parent.mkdir(parents=True, exist_ok=True)
+    args.settings.write_text(json.dumps({**settings, **missing}, indent=4) + "\n")
+
+
+if __name__ == "__main__":
+    main()
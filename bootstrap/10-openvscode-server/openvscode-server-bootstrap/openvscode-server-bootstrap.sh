@@ -0,0 +1,27 @@
+#!/usr/bin/env bash
+
+# This script prepares the user's home directory for openvscode-server on boot,
+# before the server itself is started.
+#
+# Examples of tasks include
+# - Installing the bundled extensions that are missing or outdated in the
+#   (possibly freshly mounted) extensions directory.
+# - Adding the default machine settings of the image (e.g. the terminal profile
+#   that starts shells in the user jobs slice and the excludes of the file watcher).
+# - Sizing the inotify limits of the kernel for the file watcher.
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+USER=ubuntu
+USER_HOME_DIR=/home/ubuntu
+
+SCRIPT_DIR=`dirname $0 | xargs realpath`
+
+python3 ${SCRIPT_DIR}/configure-inotify.py
+python3 ${SCRIPT_DIR}/install-extensions.py install \
+    --extensions-dir ${USER_HOME_DIR}/.openvscode-server/extensions
+python3 ${SCRIPT_DIR}/merge-machine-settings.py
+chown -R ${USER}:${USER} ${USER_HOME_DIR}/.openvscode-server
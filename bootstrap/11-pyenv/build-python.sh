@@ -0,0 +1,94 @@
+#!/usr/bin/env bash
+
+# Builds a Python version using pyenv's python-build, with a build cache. Usage:
+#
+#   build-python.sh <version> <prefix> [optimized|default]
+#
+# The optimized profile (default) builds with profile guided optimizations + link time
+# optimizations, the default profile uses the default build flags (used for comparing
+# the performance of both, see python-benchmark.py).
+#
+# Builds are stored as tarballs in the build cache (PYTHON_BUILD_CACHE_DIR), keyed by
+# the version, build flags, OS release and architecture. When PYTHON_BUILD_CACHE_BUCKET
+# is set (e.g. gs://my-bucket/python-builds), the cache is also synced with that bucket,
+# so that builds are reused across image builds. Tarballs are relocatable: when they
+# are extracted into another prefix than they were built in, the references to the
+# original prefix (script shebangs, sysconfig data, pkg-config files) are rewritten.
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+VERSION=$1
+PREFIX=$2
+PROFILE=${3:-optimized}
+
+PYENV_ROOT=${PYENV_ROOT:-/home/ubuntu/.pyenv}
+PYTHON_BUILD_CACHE_DIR=${PYTHON_BUILD_CACHE_DIR:-/var/cache/python-builds}
+PYTHON_BUILD_CACHE_BUCKET=${PYTHON_BUILD_CACHE_BUCKET:-}
+
+case ${PROFILE} in
+    optimized)
+        export PYTHON_CONFIGURE_OPTS="--enable-optimizations --with-lto"
+        ;;
+    default)
+        export PYTHON_CONFIGURE_OPTS=""
+        ;;
+    *)
+        echo "Unsupported build profile: ${PROFILE}"
+        exit 1
+        ;;
+esac
+# Generic x86-64 code, so that the build runs on all machine types.
+export PYTHON_CFLAGS="-march=x86-64 -mtune=generic"
+MAKE_OPTS="-j$(nproc)"
+export MAKE_OPTS
+
+BUILD_KEY=$(echo "${VERSION}|${PYTHON_CONFIGURE_OPTS}|${PYTHON_CFLAGS}|$(lsb_release -sr)|$(uname -m)" \
+    | sha256sum | cut -c1-16)
+TARBALL=python-${VERSION}-${PROFILE}-${BUILD_KEY}.tar.gz
+BUILD_INFO=${PREFIX}/.python-build-info
+
+mkdir -p ${PYTHON_BUILD_CACHE_DIR}
+START=$(date +%s)
+
+if [ ! -f ${PYTHON_BUILD_CACHE_DIR}/${TARBALL} ] && [ -n "${PYTHON_BUILD_CACHE_BUCKET}" ]; then
+    gsutil cp ${PYTHON_BUILD_CACHE_BUCKET}/${TARBALL} ${PYTHON_BUILD_CACHE_DIR}/${TARBALL} || true
+fi
+
+if [ -f ${PYTHON_BUILD_CACHE_DIR}/${TARBALL} ]; then
+    echo "Using cached build ${TARBALL}"
+    rm -rf "${PREFIX}"
+    mkdir -p "${PREFIX}"
+    tar -xzf ${PYTHON_BUILD_CACHE_DIR}/${TARBALL} -C "${PREFIX}"
+
+    # Make the build refer to its new prefix.
+    BUILD_PREFIX=$(grep "^prefix=" "${BUILD_INFO}" | cut -d= -f2-)
+    if [ "${BUILD_PREFIX}" != "${PREFIX}" ]; then
+        (grep -rlIsF "${BUILD_PREFIX}" "${PREFIX}/bin" "${PREFIX}/lib/pkgconfig" \
+            "${PREFIX}"/lib/python*/_sysconfigdata*.py || true) \
+            | xargs --no-run-if-empty sed -i "s#${BUILD_PREFIX}#${PREFIX}#g"
+        sed -i "s#^prefix=.*#prefix=${PREFIX}#" "${BUILD_INFO}"
+    fi
+else
+    echo "Building ${TARBALL}"
+    ${PYENV_ROOT}/plugins/python-build/bin/python-build "${VERSION}" "${PREFIX}"
+
+    cat << EOF > "${BUILD_INFO}"
+prefix=${PREFIX}
+version=${VERSION}
+profile=${PROFILE}
+configure_opts=${PYTHON_CONFIGURE_OPTS}
+cflags=${PYTHON_CFLAGS}
+EOF
+
+    tar -czf ${PYTHON_BUILD_CACHE_DIR}/${TARBALL}.tmp -C "${PREFIX}" .
+    mv ${PYTHON_BUILD_CACHE_DIR}/${TARBALL}.tmp ${PYTHON_BUILD_CACHE_DIR}/${TARBALL}
+
+    if [ -n "${PYTHON_BUILD_CACHE_BUCKET}" ]; then
+        gsutil cp ${PYTHON_BUILD_CACHE_DIR}/${TARBALL} ${PYTHON_BUILD_CACHE_BUCKET}/${TARBALL} || true
+    fi
+fi
+
+echo "Installed Python ${VERSION} (${PROFILE}) into ${PREFIX} in $(( $(date +%s) - START ))s"
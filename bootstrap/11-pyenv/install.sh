@@ -10,24 +10,39 @@ USER_HOME_DIR=/home/ubuntu
 
 SCRIPT_DIR=`dirname $0 | xargs realpath`
 
-# Install dependencies.
-apt-get update
-apt-get install -y make build-essential libssl-dev zlib1g-dev libbz2-dev \
-    libreadline-dev libsqlite3-dev wget curl llvm libncurses5-dev libncursesw5-dev \
-    xz-utils tk-dev libffi-dev liblzma-dev
+# Space-separated list of Python versions to install, the first one is set as global.
+PYTHON_VERSIONS=${PYTHON_VERSIONS:-3.9.14}
+
+# Install dependencies (unless already installed in a batch by build-runner.py).
+if [ -z "${WORKBENCH_APT_BATCHED:-}" ]; then
+    apt-get update
+    apt-get install -y make build-essential libssl-dev zlib1g-dev libbz2-dev \
+        libreadline-dev libsqlite3-dev wget curl llvm libncurses5-dev libncursesw5-dev \
+        xz-utils tk-dev libffi-dev liblzma-dev
+fi
 
 # Install pyenv.
 export PYENV_ROOT=${USER_HOME_DIR}/.pyenv
 bash ${SCRIPT_DIR}/pyenv-installer.sh
 chown -R ${USER}:${USER} ${PYENV_ROOT}
 
-# Setup env.
-cat << 'EOF' >> ${USER_HOME_DIR}/.bashrc
-export PYENV_ROOT="$HOME/.pyenv"
-command -v pyenv >/dev/null || export PATH="$PYENV_ROOT/bin:$PATH"
-eval "$(pyenv init -)"
-EOF
+# Install the Python versions (optimized builds, reused from the build cache if possible).
+for VERSION in ${PYTHON_VERSIONS}; do
+    bash ${SCRIPT_DIR}/build-python.sh ${VERSION} ${PYENV_ROOT}/versions/${VERSION}
+done
+chown -R ${USER}:${USER} ${PYENV_ROOT}
+runuser --user ${USER} -- ${PYENV_ROOT}/bin/pyenv rehash
+runuser --user ${USER} -- ${PYENV_ROOT}/bin/pyenv global ${PYTHON_VERSIONS%% *}
+
+# Install scripts for building + benchmarking Python versions.
+mkdir -p /opt/python-builds
+cp ${SCRIPT_DIR}/build-python.sh ${SCRIPT_DIR}/python-benchmark.py /opt/python-builds/
 
-# Install a base Python version.
-${PYENV_ROOT}/bin/pyenv install 3.9.14
-runuser --user ${USER} -- ${PYENV_ROOT}/bin/pyenv global 3.9.14
+# Setup env: generate the shell init snippet with the output of pyenv precomputed, and
+# regenerate it on boot when pyenv or the Python versions changed (or the user's home
+# dir is on the data disk).
+mkdir -p /opt/pyenv-shell-init
+cp ${SCRIPT_DIR}/shell-init/* /opt/pyenv-shell-init/
+python3 /opt/pyenv-shell-init/generate-shell-init.py --user ${USER}
+cp ${SCRIPT_DIR}/pyenv-shell-init.service /etc/systemd/system/
+systemctl enable pyenv-shell-init
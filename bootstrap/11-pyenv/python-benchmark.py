@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark in the style of pyperformance that compares the performance of two Python
+interpreters, e.g. the optimized (PGO+LTO) build of the image against a default build:
+
+  bash /opt/python-builds/build-python.sh 3.9.14 /tmp/python-default default
+  python3 /opt/python-builds/python-benchmark.py \\
+      --baseline /tmp/python-default/bin/python \\
+      --candidate ~/.pyenv/versions/3.9.14/bin/python
+
+Each workload is run in a fresh interpreter process a number of times, the median time
+of each workload is reported as JSON, together with the speedup of the candidate.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+# Workloads, each is run as a script that should define a `bench()` function.
+WORKLOADS = {
+    "nbody": """
+def bench():
+    bodies = [([0.0, 0.0, 0.0], [0.01, 0.0, 0.0], 39.47),
+              ([4.84, -1.16, -0.10], [0.60, 2.81, -0.02], 0.037),
+              ([8.34, 4.12, -0.40], [-1.01, 1.82, 0.008], 0.011),
+              ([12.89, -15.11, -0.22], [1.08, 0.86, -0.01], 0.0017),
+              ([15.37, -25.91, 0.17], [0.97, 0.59, -0.03], 0.002)]
+    pairs = [(a, b) for i, a in enumerate(bodies) for b in bodies[i + 1:]]
+    for _ in range(20000):
+        for (p1, v1, m1), (p2, v2, m2) in pairs:
+            dx, dy, dz = p1[0] - p2[0], p1[1] - p2[1], p1[2] - p2[2]
+            mag = 0.01 * (dx * dx + dy * dy + dz * dz) ** -1.5
+            v1[0] -= dx * m2 * mag; v1[1] -= dy * m2 * mag; v1[2] -= dz * m2 * mag
+            v2[0] += dx * m1 * mag; v2[1] += dy * m1 * mag; v2[2] += dz * m1 * mag
+        for p, v, _ in bodies:
+            p[0] += 0.01 * v[0]; p[1] += 0.01 * v[1]; p[2] += 0.01 * v[2]
+""",
+    "fannkuch": """
+def bench():
+    n = 8
+    perm1 = list(range(n))
+    count = [0] * n
+    max_flips, r = 0, n
+    while True:
+        while r != 1:
+            count[r - 1] = r
+            r -= 1
+        perm = perm1[:]
+        flips = 0
+        k = perm[0]
+        while k:
+            perm[:k + 1] = perm[k::-1]
+            flips += 1
+            k = perm[0]
+        max_flips = max(max_flips, flips)
+        while r != n:
+            perm1.insert(r, perm1.pop(0))
+            count[r] -= 1
+            if count[r] > 0:
+                break
+            r += 1
+        else:
+            return max_flips
+""",
+    "json": """
+import json
+DATA = {"key%d" % i: [i, str(i), {"nested": [1.5, True, None]}] for i in range(2000)}
+def bench():
+    for _ in range(20):
+        json.loads(json.dumps(DATA))
+""",
+    "regex": """
+import re
+TEXT = " ".join("user%d@example.com visited /page/%d at 12:%02d" % (i, i, i % 60)
+                for i in range(5000))
+def bench():
+    for _ in range(10):
+        re.findall(r"(\\w+)@(\\w+)\\.com", TEXT)
+        re.sub(r"/page/(\\d+)", r"/p/\\1", TEXT)
+""",
+    "dict_and_strings": """
+def bench():
+    counts = {}
+    for i in range(300000):
+        word = "w" + str(i % 1000)
+        counts[word] = counts.get(word, 0) + 1
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:10]
+""",
+    "generators": """
+def fib():
+    a, b = 0, 1
+    while True:
+        yield a
+        a, b = b, a + b
+def bench():
+    for _ in range(200):
+        sum(x % 7 for x, _ in zip(fib(), range(2000)))
+""",
+}
+
+RUNNER = """
+import time
+{workload}
+bench()  # Warmup.
+timings = []
+for _ in range({loops}):
+    start = time.perf_counter()
+    bench()
+    timings.append(time.perf_counter() - start)
+print(min(timings))
+"""
+
+
+def main() -> None:
+    """Main function that runs the benchmark."""
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--baseline", required=True, help="Path to a Python binary")
+    parser.add_argument("--candidate", required=True, help="Path to a Python binary")
+    parser.add_argument("--processes", type=int, default=5)
+    parser.add_argument("--loops", type=int, default=3)
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name, workload in WORKLOADS.items():
+        baseline = run_workload(args.baseline, workload, args.processes, args.loops)
+        candidate = run_workload(args.candidate, workload, args.processes, args.loops)
+        results[name] = {
+            "baseline_seconds": baseline,
+            "candidate_seconds": candidate,
+            "speedup": baseline / candidate,
+        }
+
+    speedups = [result["speedup"] for result in results.values()]
+    json.dump(
+        {
+            "workloads": results,
+            "geometric_mean_speedup": statistics.geometric_mean(speedups),
+        },
+        sys.stdout,
+        indent=2,
+    )
+    print()
+
+
+def run_workload(python: str, workload: str, processes: int, loops: int) -> float:
+    """Runs a workload in a number of fresh processes, returning the median time."""
+
+    timings: List[float] = []
+    for _ in range(processes):
+        output = subprocess.run(
+            [python, "-c", RUNNER.format(workload=workload, loops=loops)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        timings.append(float(output))
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+"""
+Generates the shell init snippet of pyenv (+ poetry) that is sourced by the .bashrc
+of the user, with the output of `pyenv init -` and `pyenv virtualenv-init -`
+precomputed, so new shells don't have to run pyenv to initialize it. The generated
+snippet also leaves out the parts of the pyenv output that start subprocesses in each
+new shell (deduplicating PATH, rehashing the shims) and only registers the prompt hook
+of pyenv-virtualenv (which runs pyenv on every prompt) when auto-activation of
+virtualenvs is enabled.
+
+The snippet is only regenerated when pyenv, its plugins or the Python versions change
+(or the options used to generate it). If pyenv isn't installed (e.g. removed by the
+user), the snippet only sets up poetry. The pyenv/poetry lines that were appended to
+the .bashrc by earlier versions of the image are replaced by sourcing the snippet.
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+from pathlib import Path
+import pwd
+import re
+import subprocess
+from typing import List
+
+SNIPPET_PATH = Path(".config/workbench/shell-init.bash")
+SOURCE_LINE = f"if [ -f ~/{SNIPPET_PATH} ]; then source ~/{SNIPPET_PATH}; fi"
+SOURCE_COMMENT = "# Shell init of pyenv + poetry (see generate-shell-init.py)."
+
+# Lines appended to the .bashrc by earlier versions of the image.
+LEGACY_LINES = {
+    'export PYENV_ROOT="$HOME/.pyenv"',
+    'export PYENV_ROOT="${HOME}/.pyenv"',
+    'command -v pyenv >/dev/null || export PATH="$PYENV_ROOT/bin:$PATH"',
+    'export PATH="${PYENV_ROOT}/bin:$PATH"',
+    'eval "$(pyenv init -)"',
+    'eval "$(pyenv init --path)"',
+    'eval "$(pyenv virtualenv-init -)"',
+    'export PATH="${HOME}/.poetry/bin:$PATH"',
+}
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+def main() -> None:
+    """Main function that generates the snippet."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--user", default="ubuntu")
+    parser.add_argument(
+        "--auto-activate",
+        action="store_true",
+        help="Activate the virtualenv of .python-version files on every prompt",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Regenerate even if nothing changed"
+    )
+    args = parser.parse_args()
+
+    user = pwd.getpwnam(args.user)
+    home_dir = Path(user.pw_dir)
+    pyenv_root = home_dir / ".pyenv"
+    snippet_path = home_dir / SNIPPET_PATH
+
+    key = compute_key(pyenv_root, home_dir, args.auto_activate)
+    if not args.force and read_key(snippet_path) == key:
+        logging.info(f"{snippet_path} is up to date")
+    else:
+        snippet = generate_snippet(
+            pyenv_root, home_dir, args.user, key, args.auto_activate
+        )
+        snippet_path.parent.mkdir(parents=True, exist_ok=True)
+        snippet_path.write_text(snippet, encoding="utf-8")
+        logging.info(f"Generated {snippet_path} ({key})")
+
+    bashrc_path = home_dir / ".bashrc"
+    update_bashrc(bashrc_path)
+
+    for path in [
+        snippet_path.parent.parent,
+        snippet_path.parent,
+        snippet_path,
+        bashrc_path,
+    ]:
+        os.chown(path, user.pw_uid, user.pw_gid)
+
+
+def compute_key(pyenv_root: Path, home_dir: Path, auto_activate: bool) -> str:
+    """Computes the key of everything the generated snippet depends on."""
+
+    digest = hashlib.sha256()
+    digest.update(Path(__file__).read_bytes())
+    digest.update(f"{pyenv_root}|{auto_activate}".encode())
+    if (pyenv_root / "libexec" / "pyenv").is_file():
+        digest.update((pyenv_root / "libexec" / "pyenv").read_bytes())
+    for directory in ["versions", "plugins"]:
+        if (pyenv_root / directory).is_dir():
+            for child in sorted((pyenv_root / directory).iterdir()):
+                digest.update(f"{directory}/{child.name}".encode())
+    digest.update(str((home_dir / ".poetry" / "bin").is_dir()).encode())
+    return digest.hexdigest()[:16]
+
+
+def read_key(snippet_path: Path) -> str:
+    """Reads the key of an existing snippet (empty if there is none)."""
+
+    if not snippet_path.exists():
+        return ""
+    with open(snippet_path, encoding="utf-8") as snippet:
+        match = re.match(r"# key: (\w+)", snippet.readline())
+    return match.group(1) if match else ""
+
+
+def generate_snippet(
+    pyenv_root: Path, home_dir: Path, user: str, key: str, auto_activate: bool
+) -> str:
+    """Generates the snippet, running pyenv as the user."""
+
+    lines = [
+        f"# key: {key}",
+        "# Generated by generate-shell-init.py, changes will be overwritten.",
+    ]
+    pyenv_installed = (pyenv_root / "bin" / "pyenv").is_file()
+    path_dirs = []
+    if pyenv_installed:
+        lines.append(f'export PYENV_ROOT="{pyenv_root}"')
+        path_dirs += [pyenv_root / "bin", pyenv_root / "shims"]
+    else:
+        logging.warning(f"pyenv not found in {pyenv_root}, only setting up poetry")
+    if (home_dir / ".poetry" / "bin").is_dir():
+        path_dirs.append(home_dir / ".poetry" / "bin")
+    for path_dir in path_dirs:
+        lines.append(
+            f'case ":${{PATH}}:" in *":{path_dir}:"*) ;;'
+            f' *) export PATH="{path_dir}:${{PATH}}" ;; esac'
+        )
+    if not pyenv_installed:
+        return "\n".join(lines) + "\n"
+
+    lines += strip_subprocesses(run_pyenv(pyenv_root, home_dir, user, ["init", "-"]))
+
+    if (pyenv_root / "plugins" / "pyenv-virtualenv").is_dir():
+        lines += run_pyenv(pyenv_root, home_dir, user, ["virtualenv-init", "-"])
+        if not auto_activate:
+            lines.append('PROMPT_COMMAND="${PROMPT_COMMAND//_pyenv_virtualenv_hook;/}"')
+
+    return "\n".join(lines) + "\n"
+
+
+def run_pyenv(
+    pyenv_root: Path, home_dir: Path, user: str, args: List[str]
+) -> List[str]:
+    """Runs pyenv as the user in a clean environment, returning its output lines."""
+
+    env = {
+        "HOME": str(home_dir),
+        "PATH": f"{pyenv_root}/bin:/usr/local/bin:/usr/bin:/bin",
+        "PYENV_ROOT": str(pyenv_root),
+        "PYENV_SHELL": "bash",
+    }
+    command = [
+        "env",
+        "--ignore-environment",
+        *map("=".join, env.items()),
+        str(pyenv_root / "bin" / "pyenv"),
+        *args,
+        "bash",
+    ]
+    if os.getuid() == 0:
+        command = ["runuser", "--user", user, "--", *command]
+    output = subprocess.run(
+        command, cwd=home_dir, check=True, capture_output=True, text=True
+    ).stdout
+    return output.rstrip("\n").splitlines()
+
+
+def strip_subprocesses(lines: List[str]) -> List[str]:
+    """
+    Strips the statements of `pyenv init -` that start subprocesses (deduplicating
+    the PATH, rehashing the shims), the PATH is set up by the snippet itself instead.
+    """
+
+    stripped = []
+    in_statement = False
+    for line in lines:
+        if line.startswith('PATH="$('):
+            in_statement = True
+        if in_statement:
+            in_statement = not line.endswith(')"')
+            continue
+        if "/shims:${PATH}" in line or line.startswith("command pyenv rehash"):
+            continue
+        stripped.append(line)
+    return stripped
+
+
+def update_bashrc(bashrc_path: Path) -> None:
+    """Replaces the legacy pyenv/poetry lines of the .bashrc by sourcing the snippet."""
+
+    lines = (
+        bashrc_path.read_text(encoding="utf-8").splitlines()
+        if bashrc_path.exists()
+        else []
+    )
+    updated = [line for line in lines if line.strip() not in LEGACY_LINES]
+    if SOURCE_LINE not in updated:
+        updated += [SOURCE_COMMENT, SOURCE_LINE]
+
+    if updated != lines:
+        bashrc_path.write_text("\n".join(updated) + "\n", encoding="utf-8")
+        logging.info(f"Updated {bashrc_path}")
+
+
+if __name__ == "__main__":
+    main()
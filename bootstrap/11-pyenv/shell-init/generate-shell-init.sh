@@ -0,0 +1,18 @@
+#!/usr/bin/env bash
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+get_attribute() {
+    curl --fail "http://metadata.google.internal/computeMetadata/v1/instance/attributes/$1" -H "Metadata-Flavor: Google"
+}
+
+AUTO_ACTIVATE=$(get_attribute pyenv-virtualenv-auto-activate || echo false)
+
+if [ "${AUTO_ACTIVATE}" == "true" ]; then
+    python3 /opt/pyenv-shell-init/generate-shell-init.py --auto-activate
+else
+    python3 /opt/pyenv-shell-init/generate-shell-init.py
+fi
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark that compares the startup time of new interactive shells (and the time
+spent on each prompt) between the legacy .bashrc setup, which runs pyenv to initialize
+it in every shell, and the precomputed snippet of generate-shell-init.py. Run as the
+user, after generating the snippet. Reports the timings as JSON.
+"""
+
+import argparse
+import json
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+
+# The pyenv init of the .bashrc before the snippet: appended by both 11-pyenv and the
+# user bootstrap (for a freshly seeded home dir).
+LEGACY_RC = """
+export PYENV_ROOT="$HOME/.pyenv"
+command -v pyenv >/dev/null || export PATH="$PYENV_ROOT/bin:$PATH"
+eval "$(pyenv init -)"
+export PYENV_ROOT="${HOME}/.pyenv"
+export PATH="${PYENV_ROOT}/bin:$PATH"
+eval "$(pyenv init --path)"
+eval "$(pyenv virtualenv-init -)"
+"""
+
+SNIPPET_RC = "source ~/.config/workbench/shell-init.bash\n"
+
+# Runs the prompt command a number of times, like bash does before each prompt.
+PROMPTS_COMMAND = 'for _ in $(seq {prompts}); do eval "${{PROMPT_COMMAND:-:}}"; done'
+
+
+def main() -> None:
+    """Main function that runs the benchmark."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--prompts", type=int, default=20)
+    args = parser.parse_args()
+
+    if not (Path.home() / ".config/workbench/shell-init.bash").exists():
+        sys.exit("No snippet found, run generate-shell-init.py first")
+
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, rc in [("legacy", LEGACY_RC), ("snippet", SNIPPET_RC)]:
+            rc_path = Path(temp_dir) / f"{name}.bashrc"
+            rc_path.write_text(rc, encoding="utf-8")
+
+            startup = time_shell(rc_path, "true", args.runs)
+            prompts = time_shell(
+                rc_path, PROMPTS_COMMAND.format(prompts=args.prompts), args.runs
+            )
+            results[name] = {
+                "startup_seconds": startup,
+                "prompt_seconds": max(prompts - startup, 0.0) / args.prompts,
+            }
+
+    results["speedup"] = {
+        metric: results["legacy"][metric] / max(results["snippet"][metric], 1e-6)
+        for metric in results["legacy"]
+    }
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+def time_shell(rc_path: Path, command: str, runs: int) -> float:
+    """Runs a command in new interactive shells, returning the median time taken."""
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            ["bash", "--rcfile", str(rc_path), "-i", "-c", command],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ It does, in order:
 """
 
 import argparse
+import hashlib
 import json
 import os
 import re
@@ -23,13 +24,15 @@ import site
 import subprocess
 import sys
 import tempfile
+import time
 
 from contextlib import closing
 from contextlib import contextmanager
-from functools import cmp_to_key
 from io import UnsupportedOperation
 from pathlib import Path
+from typing import List
 from typing import Optional
+from urllib.error import HTTPError
 from urllib.request import Request
 from urllib.request import urlopen
 
@@ -271,8 +274,11 @@ class PoetryInstallationError(RuntimeError):
 
 
 class VirtualEnvironment:
-    def __init__(self, path: Path) -> None:
+    SEED_ORIGIN_FILE = "poetry_seed_origin"
+
+    def __init__(self, path: Path, seeded: bool = False) -> None:
         self._path = path
+        self._seeded = seeded
         # str is required for compatibility with subprocess run on CPython <= 3.7 on Windows
         self._python = str(
             self._path.joinpath("Scripts/python.exe" if WINDOWS else "bin/python")
@@ -282,8 +288,47 @@ class VirtualEnvironment:
     def path(self):
         return self._path
 
+    @property
+    def seeded(self) -> bool:
+        return self._seeded
+
+    @classmethod
+    def from_seed(cls, seed: Path, target: Path) -> "VirtualEnvironment":
+        """
+        Creates an environment by copying a seed environment, rewriting the references
+        to the path of the environment the seed was made from (e.g. in scripts).
+        """
+        if target.exists():
+            shutil.rmtree(target)
+        shutil.copytree(seed, target, symlinks=True)
+
+        origin = target.joinpath(cls.SEED_ORIGIN_FILE).read_bytes()
+        target.joinpath(cls.SEED_ORIGIN_FILE).unlink()
+        for script in target.joinpath("Scripts" if WINDOWS else "bin").iterdir():
+            if script.is_symlink() or not script.is_file():
+                continue
+
+            content = script.read_bytes()
+            if b"\0" not in content and origin in content:
+                script.write_bytes(content.replace(origin, str(target).encode()))
+
+        return cls(target, seeded=True)
+
+    def save_seed(self, seed: Path) -> None:
+        """
+        Saves a copy of the environment as seed for future environments.
+        """
+        seed_tmp = seed.with_name(seed.name + ".tmp")
+        if seed_tmp.exists():
+            shutil.rmtree(seed_tmp)
+        shutil.copytree(self._path, seed_tmp, symlinks=True)
+        seed_tmp.joinpath(self.SEED_ORIGIN_FILE).write_text(str(self._path))
+        if seed.exists():
+            shutil.rmtree(seed)
+        seed_tmp.rename(seed)
+
     @classmethod
-    def make(cls, target: Path) -> "VirtualEnvironment":
+    def make(cls, target: Path, pip_args: tuple = ()) -> "VirtualEnvironment":
         try:
             import venv
 
@@ -314,7 +359,7 @@ class VirtualEnvironment:
         env = cls(target)
 
         # we do this here to ensure that outdated system default pip does not trigger older bugs
-        env.pip("install", "--disable-pip-version-check", "--upgrade", "pip")
+        env.pip("install", "--disable-pip-version-check", "--upgrade", *pip_args, "pip")
 
         return env
 
@@ -430,6 +475,10 @@ class Cursor:
 
 class Installer:
     METADATA_URL = "https://pypi.org/pypi/poetry/json"
+    VERSION_METADATA_URL = "https://pypi.org/pypi/poetry/{version}/json"
+    MIRROR_FILE_REGEX = re.compile(
+        r"poetry-([^-/]+?)(?:-py[23][^/]*\.whl|\.tar\.gz|\.zip)(?:#.*)?$"
+    )
     VERSION_REGEX = re.compile(
         r"v?(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:\.(\d+))?"
         "("
@@ -448,6 +497,11 @@ class Installer:
         accept_all: bool = False,
         git: Optional[str] = None,
         path: Optional[str] = None,
+        offline: bool = False,
+        index_mirror: Optional[str] = None,
+        cache_ttl: int = 3600,
+        wheelhouse: Optional[str] = None,
+        seed_dir: Optional[str] = None,
     ) -> None:
         self._version = version
         self._preview = preview
@@ -455,6 +509,11 @@ class Installer:
         self._accept_all = accept_all
         self._git = git
         self._path = path
+        self._offline = offline
+        self._index_mirror = index_mirror
+        self._cache_ttl = cache_ttl
+        self._wheelhouse = Path(wheelhouse) if wheelhouse else None
+        self._seed_dir = Path(seed_dir) if seed_dir else None
         self._data_dir = data_dir()
         self._bin_dir = bin_dir()
         self._cursor = Cursor()
@@ -522,7 +581,10 @@ class Installer:
         )
 
         with self.make_env(version) as env:
-            self.install_poetry(version, env)
+            if not env.seeded:
+                self.install_poetry(version, env)
+                self.compile_env(version, env)
+                self.save_seed(version, env)
             self.make_bin(version, env)
             self._data_dir.joinpath("VERSION").write_text(version)
             self._install_comment(version, "Done")
@@ -577,9 +639,15 @@ class Installer:
                 shutil.rmtree(env_path_saved)
             shutil.move(env_path, env_path_saved)
 
+        seed = self._seed_path(version)
+
         try:
-            self._install_comment(version, "Creating environment")
-            yield VirtualEnvironment.make(env_path)
+            if seed is not None and seed.exists():
+                self._install_comment(version, "Copying seed environment")
+                yield VirtualEnvironment.from_seed(seed, env_path)
+            else:
+                self._install_comment(version, "Creating environment")
+                yield VirtualEnvironment.make(env_path, self.pip_index_args())
         except Exception as e:
             if env_path.exists():
                 self._install_comment(
@@ -629,7 +697,134 @@ class Installer:
         else:
             specification = f"poetry=={version}"
 
-        env.pip("install", specification)
+        requirements = self._wheelhouse_requirements(version)
+        if requirements is not None and requirements.exists():
+            # Install exactly the distributions (and hashes) of the wheelhouse.
+            env.pip(
+                "install",
+                *self.pip_index_args(),
+                "--require-hashes",
+                "--requirement",
+                str(requirements),
+            )
+        else:
+            env.pip("install", *self.pip_index_args(), specification)
+
+    def compile_env(self, version: str, env: VirtualEnvironment) -> None:
+        """
+        Precompiles the bytecode of the environment, so that the first poetry
+        invocation doesn't have to.
+        """
+        self._install_comment(version, "Compiling bytecode")
+        env.python("-m", "compileall", "-q", "-j", "0", str(env.path))
+
+    def save_seed(self, version: str, env: VirtualEnvironment) -> None:
+        seed = self._seed_path(version)
+        if seed is None:
+            return
+
+        self._install_comment(version, "Saving seed environment")
+        try:
+            seed.parent.mkdir(parents=True, exist_ok=True)
+            env.save_seed(seed)
+        except OSError:
+            # Seeding is best effort (e.g. the seed dir may not be writable).
+            pass
+
+    def _seed_path(self, version: str) -> Optional[Path]:
+        if self._seed_dir is None or self._git or self._path:
+            return None
+
+        # Seeds are only valid for the Python they were created with.
+        python_key = hashlib.sha256(
+            "{}|{}".format(sys.executable, sys.version).encode()
+        ).hexdigest()[:12]
+
+        return self._seed_dir.joinpath("{}-{}".format(version, python_key))
+
+    def _wheelhouse_requirements(self, version: str) -> Optional[Path]:
+        if self._wheelhouse is None or self._git or self._path:
+            return None
+
+        return self._wheelhouse.joinpath("poetry-{}-requirements.txt".format(version))
+
+    def pip_index_args(self) -> tuple:
+        """
+        Returns the arguments that make pip install from the index mirror and/or the
+        wheelhouse (if any), and only from those in offline mode.
+        """
+        args = ()
+        index_url = False
+        if self._index_mirror:
+            index_url = re.match(r"https?://", self._index_mirror) is not None
+            option = "--index-url" if index_url else "--find-links"
+            args += (option, self._index_mirror)
+
+        if self._wheelhouse:
+            args += ("--find-links", str(self._wheelhouse))
+
+        if self._offline and not index_url:
+            args = ("--no-index",) + args
+
+        return args
+
+    def build_wheelhouse(self, version: str) -> int:
+        """
+        Builds wheels of poetry (and all its dependencies) into the wheelhouse, plus
+        a requirements file pinning their versions and hashes.
+        """
+        self._write(
+            "Building wheelhouse for {} ({})".format(
+                colorize("info", "Poetry"), colorize("info", version)
+            )
+        )
+        self._wheelhouse.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.TemporaryDirectory(prefix="poetry-installer") as temp_dir:
+            env = VirtualEnvironment.make(
+                Path(temp_dir).joinpath("venv"), self.pip_index_args()
+            )
+            env.pip(
+                "wheel",
+                *self.pip_index_args(),
+                "--wheel-dir",
+                str(self._wheelhouse),
+                f"poetry=={version}",
+            )
+            env.pip(
+                "install",
+                "--no-index",
+                "--find-links",
+                str(self._wheelhouse),
+                f"poetry=={version}",
+            )
+            frozen = env.pip("freeze").stdout.decode().splitlines()
+
+        wheels = {}
+        for wheel in self._wheelhouse.glob("*.whl"):
+            name, wheel_version = wheel.name.split("-")[:2]
+            wheels[(self._normalize_name(name), wheel_version)] = wheel
+
+        lines = []
+        for requirement in frozen:
+            name, _, requirement_version = requirement.partition("==")
+            wheel = wheels.get((self._normalize_name(name), requirement_version))
+            if wheel is None:
+                raise PoetryInstallationError(
+                    return_code=1, log=f"No wheel found for {requirement}"
+                )
+
+            digest = hashlib.sha256(wheel.read_bytes()).hexdigest()
+            lines.append(f"{requirement} --hash=sha256:{digest}")
+
+        self._wheelhouse_requirements(version).write_text("\n".join(lines) + "\n")
+        self._write("Wrote {} requirements".format(len(lines)))
+
+        return 0
+
+    @staticmethod
+    def _normalize_name(name: str) -> str:
+        return re.sub(r"[-_.]+", "_", name).lower()
 
     def display_pre_message(self) -> None:
         kwargs = {
@@ -727,35 +922,53 @@ class Installer:
         if self._data_dir.joinpath("VERSION").exists():
             current_version = self._data_dir.joinpath("VERSION").read_text().strip()
 
-        self._write(colorize("info", "Retrieving Poetry metadata"))
+        start = time.perf_counter()
+        version = self._resolve_version()
+        if version is None:
+            return None, None
 
-        metadata = json.loads(self._get(self.METADATA_URL).decode())
+        self._write(
+            colorize(
+                "comment",
+                "Resolved Poetry version {} in {:.3f}s".format(
+                    version, time.perf_counter() - start
+                ),
+            )
+        )
 
-        def _compare_versions(x, y):
-            mx = self.VERSION_REGEX.match(x)
-            my = self.VERSION_REGEX.match(y)
+        if current_version == version and not self._force:
+            self._write(
+                "The latest version ({}) is already installed.".format(
+                    colorize("b", version)
+                )
+            )
 
-            vx = tuple(int(p) for p in mx.groups()[:3]) + (mx.group(5),)
-            vy = tuple(int(p) for p in my.groups()[:3]) + (my.group(5),)
+            return None, current_version
 
-            if vx < vy:
-                return -1
-            elif vx > vy:
-                return 1
+        return version, current_version
 
-            return 0
+    def _resolve_version(self) -> Optional[str]:
+        if self._version and not self._offline:
+            # A pinned version doesn't need the full release list, only a check that
+            # it exists (unless the cached release list already tells us).
+            releases = self._read_cached_releases()
+            if releases is not None and self._version in releases:
+                return self._version
 
-        self._write("")
-        releases = sorted(
-            metadata["releases"].keys(), key=cmp_to_key(_compare_versions)
-        )
+            if self._version_exists(self._version):
+                return self._version
+
+            # Fall back to the full release list (e.g. for mirrors of PyPI that don't
+            # serve the metadata of individual versions).
+
+        releases = self.get_releases()
 
         if self._version and self._version not in releases:
             self._write(
                 colorize("error", "Version {} does not exist.".format(self._version))
             )
 
-            return None, None
+            return None
 
         version = self._version
         if not version:
@@ -768,16 +981,110 @@ class Installer:
 
                 break
 
-        if current_version == version and not self._force:
-            self._write(
-                "The latest version ({}) is already installed.".format(
-                    colorize("b", version)
-                )
+        return version
+
+    def get_releases(self) -> List[str]:
+        """
+        Returns the releases of Poetry, sorted from oldest to newest. In offline mode
+        these are taken from the index mirror, otherwise from PyPI (cached on disk).
+        """
+        if self._offline:
+            return sorted(self._get_mirror_releases(), key=self._version_key)
+
+        releases = self._read_cached_releases()
+        if releases is not None:
+            return releases
+
+        self._write(colorize("info", "Retrieving Poetry metadata"))
+
+        metadata = json.loads(self._get(self.METADATA_URL).decode())
+        releases = sorted(metadata["releases"].keys(), key=self._version_key)
+        self._write_cached_releases(releases)
+
+        return releases
+
+    def _version_key(self, version: str):
+        m = self.VERSION_REGEX.match(version)
+
+        return tuple(int(p) for p in m.groups()[:3]) + (m.group(5),)
+
+    def _version_exists(self, version: str) -> bool:
+        try:
+            self._get(self.VERSION_METADATA_URL.format(version=version))
+        except HTTPError as e:
+            if e.code == 404:
+                return False
+
+            raise
+
+        return True
+
+    def _get_mirror_releases(self) -> List[str]:
+        if not self._index_mirror and not self._wheelhouse:
+            raise PoetryInstallationError(
+                return_code=1,
+                log="Offline mode requires an index mirror or a wheelhouse.",
             )
 
-            return None, current_version
+        names = []
+        if self._index_mirror and re.match(r"https?://", self._index_mirror):
+            # Simple (PEP 503) index, served over HTTP.
+            page = self._get(self._index_mirror.rstrip("/") + "/poetry/").decode()
+            names += re.findall(r'href=["\']([^"\']+)["\']', page)
+        elif self._index_mirror:
+            # Flat directory of distributions (or a simple index on disk).
+            mirror = Path(self._index_mirror)
+            names += [
+                path.name
+                for directory in (mirror, mirror.joinpath("poetry"))
+                if directory.is_dir()
+                for path in directory.iterdir()
+            ]
+
+        if self._wheelhouse and self._wheelhouse.is_dir():
+            names += [path.name for path in self._wheelhouse.iterdir()]
+
+        releases = set()
+        for name in names:
+            m = self.MIRROR_FILE_REGEX.search(name)
+            if m is not None and self.VERSION_REGEX.fullmatch(m.group(1)):
+                releases.add(m.group(1))
+
+        return list(releases)
+
+    def _releases_cache_path(self) -> Path:
+        cache_dir = os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+
+        return Path(cache_dir).joinpath("pypoetry-installer", "releases.json")
+
+    def _read_cached_releases(self) -> Optional[List[str]]:
+        path = self._releases_cache_path()
+        if self._cache_ttl <= 0 or not path.exists():
+            return None
 
-        return version, current_version
+        try:
+            cache = json.loads(path.read_text())
+        except ValueError:
+            return None
+
+        if time.time() - cache.get("fetched_at", 0) > self._cache_ttl:
+            return None
+
+        return cache.get("releases")
+
+    def _write_cached_releases(self, releases: List[str]) -> None:
+        if self._cache_ttl <= 0:
+            return
+
+        path = self._releases_cache_path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(
+                json.dumps({"fetched_at": time.time(), "releases": releases})
+            )
+        except OSError:
+            # Caching is best effort.
+            pass
 
     def _write(self, line) -> None:
         sys.stdout.write(line + "\n")
@@ -852,6 +1159,54 @@ def main():
         ),
     )
 
+    parser.add_argument(
+        "--offline",
+        help="resolve and install poetry from the index mirror only",
+        dest="offline",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--index-mirror",
+        dest="index_mirror",
+        action="store",
+        help=(
+            "Local index mirror to resolve and install poetry from, either a directory "
+            "of distributions or the URL of a simple index."
+        ),
+    )
+    parser.add_argument(
+        "--wheelhouse",
+        dest="wheelhouse",
+        action="store",
+        help=(
+            "Directory of wheels to install poetry from, using the hashes pinned in the "
+            "wheelhouse (see --build-wheelhouse)."
+        ),
+    )
+    parser.add_argument(
+        "--build-wheelhouse",
+        help="build the wheelhouse for the given version instead of installing it",
+        dest="build_wheelhouse",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--seed-dir",
+        dest="seed_dir",
+        action="store",
+        help=(
+            "Directory of seed environments, which are copied instead of creating a new "
+            "environment and installing poetry into it (saved after each install)."
+        ),
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        dest="cache_ttl",
+        type=int,
+        help="seconds to cache the list of poetry releases for (0 disables caching)",
+    )
+
     args = parser.parse_args()
 
     installer = Installer(
@@ -863,12 +1218,25 @@ def main():
         or not is_interactive(),
         path=args.path,
         git=args.git,
+        offline=args.offline or string_to_bool(os.getenv("POETRY_OFFLINE", "0")),
+        index_mirror=args.index_mirror or os.getenv("POETRY_INDEX_MIRROR"),
+        cache_ttl=args.cache_ttl
+        if args.cache_ttl is not None
+        else int(os.getenv("POETRY_INSTALLER_CACHE_TTL", "3600")),
+        wheelhouse=args.wheelhouse or os.getenv("POETRY_WHEELHOUSE"),
+        seed_dir=args.seed_dir or os.getenv("POETRY_SEED_DIR"),
     )
 
     if args.uninstall or string_to_bool(os.getenv("POETRY_UNINSTALL", "0")):
         return installer.uninstall()
 
+    if args.build_wheelhouse and not (args.version and installer._wheelhouse):
+        parser.error("--build-wheelhouse requires --version and --wheelhouse")
+
     try:
+        if args.build_wheelhouse:
+            return installer.build_wheelhouse(args.version)
+
         return installer.run()
     except PoetryInstallationError as e:
         installer._write(colorize("error", "Poetry installation failed."))
@@ -10,18 +10,31 @@ USER_HOME_DIR=/home/ubuntu
 
 SCRIPT_DIR=`dirname $0 | xargs realpath`
 
-# Install dependencies.
-apt-get update
-apt-get install -y python3.8-venv
+# Install dependencies (unless already installed in a batch by build-runner.py).
+if [ -z "${WORKBENCH_APT_BATCHED:-}" ]; then
+    apt-get update
+    apt-get install -y python3.8-venv
+fi
 
-# Install poetry.
+POETRY_VERSION=1.2.2
+POETRY_INSTALLER_DIR=/opt/poetry-installer
+
+# Build a wheelhouse of poetry + its dependencies (with pinned hashes), so that poetry
+# can be (re)installed without network access, e.g. using:
+#   python3 /opt/poetry-installer/install-poetry.py --version 1.2.2 --offline \
+#       --wheelhouse /opt/poetry-installer/wheelhouse --seed-dir /opt/poetry-installer/seeds
+mkdir -p ${POETRY_INSTALLER_DIR}
+cp ${SCRIPT_DIR}/install-poetry.py ${POETRY_INSTALLER_DIR}/
+python3 ${POETRY_INSTALLER_DIR}/install-poetry.py --version ${POETRY_VERSION} \
+    --build-wheelhouse --wheelhouse ${POETRY_INSTALLER_DIR}/wheelhouse
+
+# Install poetry from the wheelhouse, which also saves a seed environment that later
+# installs copy instead of installing all packages again.
 export POETRY_HOME=${USER_HOME_DIR}/.poetry
 mkdir -p ${POETRY_HOME}
-python3 ${SCRIPT_DIR}/install-poetry.py --version 1.2.2
+python3 ${POETRY_INSTALLER_DIR}/install-poetry.py --version ${POETRY_VERSION} --offline \
+    --wheelhouse ${POETRY_INSTALLER_DIR}/wheelhouse --seed-dir ${POETRY_INSTALLER_DIR}/seeds
 chown -R ${USER}:${USER} ${POETRY_HOME}
 
-# Setup env.
-cat << 'EOF' >> ${USER_HOME_DIR}/.bashrc
-export PATH="${HOME}/.poetry/bin:$PATH"
-EOF
+# Setup env (poetry is added to the PATH by the shell init of 11-pyenv).
 runuser --user ubuntu ${POETRY_HOME}/bin/poetry config virtualenvs.in-project true
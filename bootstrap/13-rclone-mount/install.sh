@@ -10,11 +10,34 @@ SCRIPT_DIR=`dirname $0 | xargs realpath`
 # Install rclone.
 bash ${SCRIPT_DIR}/install-rclone.sh
 
+# Allow rclone to be used as mount helper (used by the automount units).
+ln -sf /usr/bin/rclone /sbin/mount.rclone
+
 # Copy rclone-mount scripts.
 mkdir -p /opt/rclone-mount
 cp ${SCRIPT_DIR}/rclone-mount.sh /opt/rclone-mount/
+cp ${SCRIPT_DIR}/rclone_rc.py /opt/rclone-mount/
+cp ${SCRIPT_DIR}/workbench_utils.py /opt/rclone-mount/
+cp ${SCRIPT_DIR}/rclone-cache-coordinator.py /opt/rclone-mount/
+cp ${SCRIPT_DIR}/rclone-stats-collector.py /opt/rclone-mount/
+cp ${SCRIPT_DIR}/rclone-mountctl.py /opt/rclone-mount/
+cp ${SCRIPT_DIR}/rclone-prewarm.sh /opt/rclone-mount/
+cp ${SCRIPT_DIR}/rclone-prewarm.py /opt/rclone-mount/
+
+# Install the CLI for controlling the mounts.
+chmod +x /opt/rclone-mount/rclone-mountctl.py
+ln -sf /opt/rclone-mount/rclone-mountctl.py /usr/local/bin/rclone-mountctl
 
 # Create rclone services.
 cp ${SCRIPT_DIR}/rclone-mount.service /etc/systemd/system/
 cp ${SCRIPT_DIR}/rclone-mount@.service /etc/systemd/system/
+cp ${SCRIPT_DIR}/rclone-rc-socket@.service /etc/systemd/system/
+cp ${SCRIPT_DIR}/rclone-rc-socket-access@.service /etc/systemd/system/
+cp ${SCRIPT_DIR}/rclone-cache-coordinator.service /etc/systemd/system/
+cp ${SCRIPT_DIR}/rclone-cache-coordinator.timer /etc/systemd/system/
+cp ${SCRIPT_DIR}/rclone-stats-collector.service /etc/systemd/system/
+cp ${SCRIPT_DIR}/rclone-prewarm.service /etc/systemd/system/
 systemctl enable rclone-mount
+systemctl enable rclone-cache-coordinator.timer
+systemctl enable rclone-stats-collector
+systemctl enable rclone-prewarm
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+
+"""
+Script that coordinates the VFS caches of the rclone bucket mounts, so that all mounts
+share a single disk budget instead of each growing its own unbounded cache.
+
+Supports the following commands:
+* prepare: run before the mounts are started. Places the caches of all mounts on the
+  chosen volume (data disk, local SSD or a custom path), resolves the disk budget and
+  gives each mount an equal initial share of it.
+* rebalance: run periodically while the mounts are running. Splits the budget across
+  the running mounts based on the free space on the volume and how much data each
+  mount recently had to fetch from GCS (i.e. its cache misses), using rclone's remote
+  control API to read the stats of each mount.
+
+rclone copies the VFS options when a mount is created, so the cache limits of a running
+mount can't be changed. The limit of each mount is written to its environment file
+(read when it's mounted), and a mount is only remounted to apply it when the limit
+changed significantly and the mount is idle (no open files or pending uploads). Busy
+mounts pick up their new limit when they're remounted, e.g. by the automount. The limit
+a mount actually runs with is read back from its VFS options.
+"""
+
+import argparse
+from dataclasses import asdict, dataclass
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import time
+from typing import Any, Dict, List, Optional
+
+from rclone_rc import RC_SOCKET_DIR, RcloneRcError, format_size, list_mounts, rc_call
+from workbench_utils import parse_size
+
+USER_HOME_DIR = Path("/home/ubuntu")
+LOCAL_SSD_DIR = Path("/mnt/disks/local-ssd")
+
+CONFIG_PATH = RC_SOCKET_DIR / "coordinator.json"
+STATE_PATH = RC_SOCKET_DIR / "coordinator-state.json"
+ALLOCATIONS_PATH = RC_SOCKET_DIR / "cache-allocations.json"
+ENV_PATH = RC_SOCKET_DIR / "rclone-mount.env"
+MOUNT_DIR = Path("/gcs")
+USER = "ubuntu"
+
+# Fraction of the volume that is always kept free for other users of the disk.
+RESERVED_FRACTION = 0.05
+# Fraction of the budget that is split equally, the remainder is split by activity.
+FLOOR_FRACTION = 0.5
+# Weight of the most recent measurement in the (exponentially averaged) activity.
+ACTIVITY_SMOOTHING = 0.5
+# Granularity of the cache limits, to avoid churning on tiny changes.
+ALLOCATION_GRANULARITY = 64 * 1024**2
+# Relative change of the limit of a mount for which it is remounted.
+REMOUNT_THRESHOLD = 0.25
+REMOUNT_TIMEOUT_SECONDS = 60
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+@dataclass
+class CoordinatorConfig:
+    """Configuration of the coordinator, as resolved when preparing the mounts."""
+
+    cache_root: str
+    budget: str
+    max_age: str
+
+
+@dataclass
+class MountState:
+    """Activity of a single mount as tracked across rebalance runs."""
+
+    bytes_fetched: int = 0
+    activity: float = 0.0
+
+
+def main() -> None:
+    """Main function that dispatches to the requested command."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    prepare_parser = subparsers.add_parser("prepare")
+    prepare_parser.add_argument("--buckets", nargs="*", default=[])
+    prepare_parser.add_argument(
+        "--volume",
+        default="data-disk",
+        help="Volume for the caches: 'data-disk', 'local-ssd' or an absolute path",
+    )
+    prepare_parser.add_argument(
+        "--budget",
+        default="50%",
+        help="Total cache size, either absolute (e.g. '20G') or a percentage of the volume",
+    )
+    prepare_parser.add_argument("--max-age", default="24h")
+
+    subparsers.add_parser("rebalance")
+
+    args = parser.parse_args()
+
+    if args.command == "prepare":
+        prepare(
+            buckets=args.buckets,
+            volume=args.volume,
+            budget=args.budget,
+            max_age=args.max_age,
+        )
+    else:
+        rebalance()
+
+
+def prepare(buckets: List[str], volume: str, budget: str, max_age: str) -> None:
+    """Resolves the cache location and writes the initial cache limits of the mounts."""
+
+    cache_root = resolve_cache_root(volume)
+    for bucket in buckets:
+        make_user_dir(cache_root / bucket)
+
+    config = CoordinatorConfig(
+        cache_root=str(cache_root), budget=budget, max_age=max_age
+    )
+    write_json(CONFIG_PATH, asdict(config))
+
+    # The caches are kept across reboots, the space they use is part of the budget.
+    total = resolve_budget(config, used_by_caches=directory_size(cache_root))
+    share = round_allocation(total // max(len(buckets), 1))
+    logging.info(
+        f"Placing caches in '{cache_root}' with a budget of {format_size(total)}"
+        f" ({format_size(share)} per mount for {len(buckets)} mounts)"
+    )
+
+    # rclone picks up the RCLONE_VFS_* variables as defaults for the corresponding
+    # flags, RCLONE_CACHE_ROOT isn't read by rclone but expanded by the mount units
+    # (into the cache dir of each bucket).
+    ENV_PATH.write_text(
+        f"RCLONE_CACHE_ROOT={cache_root}\n"
+        f"RCLONE_VFS_CACHE_MAX_AGE={max_age}\n"
+        f"RCLONE_VFS_CACHE_MAX_SIZE={format_size(share)}\n"
+    )
+    for bucket in buckets:
+        write_mount_env(bucket, share)
+    write_json(ALLOCATIONS_PATH, {bucket: share for bucket in buckets})
+
+
+def rebalance() -> None:
+    """Redistributes the cache budget across the running mounts."""
+
+    if not CONFIG_PATH.exists():
+        logging.info(f"{CONFIG_PATH} not found (no buckets mounted), nothing to do")
+        return
+
+    config = CoordinatorConfig(**json.loads(CONFIG_PATH.read_text()))
+    previous_state = read_state()
+
+    state: Dict[str, MountState] = {}
+    vfs_stats_of: Dict[str, Dict[str, Any]] = {}
+    used_by_caches = 0
+
+    for bucket in list_mounts():
+        try:
+            core_stats = rc_call(bucket, "core/stats")
+            vfs_stats = rc_call(bucket, "vfs/stats")
+        except RcloneRcError as error:
+            logging.warning(f"Skipping mount '{bucket}': {error}")
+            continue
+
+        bytes_fetched = int(core_stats.get("bytes", 0))
+        previous = previous_state.get(bucket, MountState())
+        # The counter resets when a mount is restarted.
+        delta = bytes_fetched - previous.bytes_fetched
+        if delta < 0:
+            delta = bytes_fetched
+
+        state[bucket] = MountState(
+            bytes_fetched=bytes_fetched,
+            activity=ACTIVITY_SMOOTHING * delta
+            + (1 - ACTIVITY_SMOOTHING) * previous.activity,
+        )
+        vfs_stats_of[bucket] = vfs_stats
+        used_by_caches += int(vfs_stats.get("diskCache", {}).get("bytesUsed", 0))
+
+    if not state:
+        logging.info("No running mounts found, nothing to do")
+        return
+
+    total = resolve_budget(config, used_by_caches=used_by_caches)
+    allocations = allocate(
+        total, {bucket: mount.activity for bucket, mount in state.items()}
+    )
+
+    for bucket, allocation in allocations.items():
+        logging.info(
+            f"Limiting cache of '{bucket}' to {format_size(allocation)}"
+            f" (recent activity: {format_size(int(state[bucket].activity))})"
+        )
+        apply_limit(bucket, allocation, vfs_stats_of[bucket])
+
+    write_json(STATE_PATH, {bucket: asdict(mount) for bucket, mount in state.items()})
+    write_json(ALLOCATIONS_PATH, allocations)
+
+
+def apply_limit(bucket: str, allocation: int, vfs_stats: Dict[str, Any]) -> None:
+    """
+    Applies the cache limit of a mount: written for its next mount, and remounted now
+    if the limit changed significantly and the mount is idle.
+    """
+
+    write_mount_env(bucket, allocation)
+
+    current = read_cache_limit(vfs_stats)
+    if current is not None and abs(allocation - current) <= current * REMOUNT_THRESHOLD:
+        logging.info(f"Keeping '{bucket}' at its limit of {format_size(current)}")
+    elif not is_idle(bucket, vfs_stats):
+        logging.info(f"'{bucket}' is busy, applying the limit when it's remounted")
+    else:
+        remount(bucket, allocation)
+
+
+def write_mount_env(bucket: str, allocation: int) -> None:
+    """Writes the cache limit of a mount, read by its unit when it's (re)mounted."""
+    (RC_SOCKET_DIR / f"{bucket}.env").write_text(
+        f"RCLONE_VFS_CACHE_MAX_SIZE={format_size(allocation)}\n"
+    )
+
+
+def read_cache_limit(vfs_stats: Dict[str, Any]) -> Optional[int]:
+    """Returns the cache limit a mount runs with (None if unknown or unlimited)."""
+
+    value = vfs_stats.get("opt", {}).get("CacheMaxSize")
+    if isinstance(value, (int, float)):
+        return int(value) if value >= 0 else None
+    try:
+        return parse_size(str(value))
+    except ValueError:
+        return None
+
+
+def is_idle(bucket: str, vfs_stats: Dict[str, Any]) -> bool:
+    """Whether a mount has no pending uploads and no files (or dirs) in use."""
+
+    disk_cache = vfs_stats.get("diskCache", {})
+    if disk_cache.get("uploadsInProgress", 0) or disk_cache.get("uploadsQueued", 0):
+        return False
+
+    mount_dir = MOUNT_DIR / bucket
+    for process in Path("/proc").iterdir():
+        if not process.name.isdigit():
+            continue
+        try:
+            paths = [process / "cwd"] + list((process / "fd").iterdir())
+            for path in paths:
+                target = Path(os.readlink(path))
+                if target == mount_dir or mount_dir in target.parents:
+                    return False
+        except OSError:
+            # The process exited (or the fd was closed) in the meantime.
+            continue
+    return True
+
+
+def remount(bucket: str, allocation: int) -> None:
+    """Remounts an idle mount so that it picks up its new cache limit."""
+
+    service = f"rclone-mount@{bucket}.service"
+    if subprocess.run(
+        ["systemctl", "is-active", "--quiet", service], check=False
+    ).returncode:
+        # Automount mode: mounted again (with the new limit) on the next access.
+        unit = subprocess.run(
+            ["systemd-escape", "--path", "--suffix=mount", str(MOUNT_DIR / bucket)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        logging.info(f"Unmounting '{bucket}', the limit applies on the next access")
+        subprocess.run(["systemctl", "stop", unit], check=True)
+        return
+
+    logging.info(f"Remounting '{bucket}' to apply its limit")
+    subprocess.run(["systemctl", "restart", service], check=True)
+    deadline = time.monotonic() + REMOUNT_TIMEOUT_SECONDS
+    while True:
+        try:
+            limit = read_cache_limit(rc_call(bucket, "vfs/stats"))
+            break
+        except RcloneRcError:
+            if time.monotonic() > deadline:
+                logging.warning(f"'{bucket}' didn't come back after the remount")
+                return
+            time.sleep(1)
+    if limit != allocation:
+        logging.warning(
+            f"'{bucket}' runs with a limit of {format_size(limit or 0)}"
+            f" instead of {format_size(allocation)} after the remount"
+        )
+
+
+def make_user_dir(path: Path) -> None:
+    """Creates a dir and its missing parents, owned by the user (unlike existing dirs)."""
+
+    missing = []
+    while not path.exists():
+        missing.append(path)
+        path = path.parent
+    for directory in reversed(missing):
+        directory.mkdir()
+        shutil.chown(directory, USER, USER)
+
+
+def directory_size(path: Path) -> int:
+    """Returns the disk space used by the files in a dir (recursively)."""
+
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_blocks * 512
+            except FileNotFoundError:
+                continue
+    return size
+
+
+def resolve_cache_root(volume: str) -> Path:
+    """Resolves the directory in which the caches are placed for the given volume."""
+
+    if volume == "data-disk":
+        return USER_HOME_DIR / ".cache" / "rclone-mount"
+    if volume == "local-ssd":
+        if os.path.ismount(LOCAL_SSD_DIR):
+            return LOCAL_SSD_DIR / "rclone-mount"
+        logging.warning("No local SSD mounted, falling back to the data disk")
+        return resolve_cache_root("data-disk")
+    if os.path.isabs(volume):
+        return Path(volume)
+    raise ValueError(f"Unsupported cache volume: '{volume}'")
+
+
+def resolve_budget(config: CoordinatorConfig, used_by_caches: int) -> int:
+    """
+    Resolves the total budget in bytes, capped by what is available on the volume
+    (i.e. the free space plus what the caches are already using, minus a reserve).
+    """
+
+    stat = os.statvfs(config.cache_root)
+    volume_size = stat.f_blocks * stat.f_frsize
+    free = stat.f_bavail * stat.f_frsize
+
+    if config.budget.endswith("%"):
+        budget = int(volume_size * float(config.budget[:-1]) / 100)
+    else:
+        budget = parse_size(config.budget)
+
+    available = free + used_by_caches - int(volume_size * RESERVED_FRACTION)
+    return max(min(budget, available), 0)
+
+
+def allocate(total: int, activity: Dict[str, float]) -> Dict[str, int]:
+    """
+    Splits the total budget across mounts. Every mount gets an equal minimum share,
+    the remainder is divided proportionally to the recent activity of each mount.
+    """
+
+    floor = total * FLOOR_FRACTION / len(activity)
+    remainder = total - floor * len(activity)
+    total_activity = sum(activity.values())
+
+    allocations = {}
+    for bucket, bucket_activity in activity.items():
+        if total_activity > 0:
+            share = remainder * bucket_activity / total_activity
+        else:
+            share = remainder / len(activity)
+        allocations[bucket] = round_allocation(int(floor + share))
+    return allocations
+
+
+def round_allocation(value: int) -> int:
+    """Rounds an allocation down to the allocation granularity."""
+    return max(value // ALLOCATION_GRANULARITY, 1) * ALLOCATION_GRANULARITY
+
+
+def read_state() -> Dict[str, MountState]:
+    """Reads the mount activity recorded by the previous rebalance run."""
+    if not STATE_PATH.exists():
+        return {}
+    return {
+        bucket: MountState(**values)
+        for bucket, values in json.loads(STATE_PATH.read_text()).items()
+    }
+
+
+def write_json(path: Path, value: object) -> None:
+    """Writes a value as JSON to the given path."""
+    path.write_text(json.dumps(value, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
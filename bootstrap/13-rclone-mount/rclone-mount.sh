@@ -4,17 +4,92 @@ set -o errexit
 set -o pipefail
 set -o nounset
 
+RC_SOCKET_DIR=/run/rclone-mount
+UNIT_DIR=/run/systemd/system
+
+get_attribute() {
+    curl --fail "http://metadata.google.internal/computeMetadata/v1/instance/attributes/$1" -H "Metadata-Flavor: Google"
+}
+
+# Writes a .mount/.automount unit pair that mounts the given bucket on first access
+# and unmounts it again once it has been idle for the given timeout.
+write_automount_units() {
+    local BUCKET=$1
+    local IDLE_TIMEOUT=$2
+    local UNIT_NAME
+    UNIT_NAME=$(systemd-escape --path "/gcs/${BUCKET}")
+
+    sudo tee ${UNIT_DIR}/${UNIT_NAME}.mount > /dev/null << EOF
+[Unit]
+Description=Rclone mount for bucket ${BUCKET} (on demand)
+Wants=network-online.target
+After=network-online.target
+Requires=rclone-rc-socket@${BUCKET}.service
+After=rclone-rc-socket@${BUCKET}.service
+Wants=rclone-rc-socket-access@${BUCKET}.service
+
+[Mount]
+Type=rclone
+What=:gcs:${BUCKET}
+Where=/gcs/${BUCKET}
+EnvironmentFile=${RC_SOCKET_DIR}/rclone-mount.env
+EnvironmentFile=-${RC_SOCKET_DIR}/${BUCKET}.env
+Options=rw,_netdev,allow_other,args2env,uid=$(id -u ubuntu),gid=$(id -g ubuntu),gcs-object-acl=,gcs-bucket-policy-only,vfs-cache-mode=full,cache-dir=${RCLONE_CACHE_ROOT}/${BUCKET},no-modtime,drive-use-trash=false,stats=0,checkers=16,rc,rc-addr=unix://${RC_SOCKET_DIR}/${BUCKET}.sock,rc-no-auth
+EOF
+
+    sudo tee ${UNIT_DIR}/${UNIT_NAME}.automount > /dev/null << EOF
+[Unit]
+Description=Automount for bucket ${BUCKET}
+
+[Automount]
+Where=/gcs/${BUCKET}
+TimeoutIdleSec=${IDLE_TIMEOUT}
+EOF
+}
+
 set +o errexit
-RCLONE_BUCKETS=$(curl --fail "http://metadata.google.internal/computeMetadata/v1/instance/attributes/rclone-mount-buckets" -H "Metadata-Flavor: Google")
+RCLONE_BUCKETS=$(get_attribute rclone-mount-buckets)
 RCLONE_BUCKETS_SET=$?
 set -o errexit
 
 if [ $RCLONE_BUCKETS_SET -eq 0 ]; then
     IFS=';' read -ra BUCKETS <<< "$RCLONE_BUCKETS"
-    for BUCKET in "${BUCKETS[@]}"; do
-        echo $BUCKET
-        sudo mkdir -p /gcs/${BUCKET}
-        sudo chown ubuntu:ubuntu /gcs/${BUCKET}
-        sudo systemctl start rclone-mount@${BUCKET}
-    done
+
+    # Directory holding the rc sockets + cache config of the mounts.
+    sudo mkdir -p ${RC_SOCKET_DIR}
+    sudo chown ubuntu:ubuntu ${RC_SOCKET_DIR}
+    sudo chmod 0750 ${RC_SOCKET_DIR}
+
+    # Place the VFS caches of all mounts on the chosen volume and split the cache budget.
+    sudo python3 /opt/rclone-mount/rclone-cache-coordinator.py prepare \
+        --buckets "${BUCKETS[@]}" \
+        --volume "$(get_attribute rclone-cache-volume || echo data-disk)" \
+        --budget "$(get_attribute rclone-cache-budget || echo 50%)" \
+        --max-age "$(get_attribute rclone-cache-max-age || echo 24h)"
+
+    # Mount eagerly (default) or generate automount units that mount on first access.
+    RCLONE_MOUNT_MODE=$(get_attribute rclone-mount-mode || echo eager)
+
+    if [ "${RCLONE_MOUNT_MODE}" == "automount" ]; then
+        source ${RC_SOCKET_DIR}/rclone-mount.env
+        RCLONE_IDLE_TIMEOUT=$(get_attribute rclone-automount-idle-timeout || echo 10min)
+
+        for BUCKET in "${BUCKETS[@]}"; do
+            echo $BUCKET
+            sudo mkdir -p /gcs/${BUCKET}
+            write_automount_units ${BUCKET} ${RCLONE_IDLE_TIMEOUT}
+        done
+
+        sudo systemctl daemon-reload
+        for BUCKET in "${BUCKETS[@]}"; do
+            sudo systemctl start "$(systemd-escape --path --suffix=automount "/gcs/${BUCKET}")"
+        done
+    else
+        for BUCKET in "${BUCKETS[@]}"; do
+            echo $BUCKET
+            sudo mkdir -p /gcs/${BUCKET}
+            sudo chown ubuntu:ubuntu /gcs/${BUCKET}
+            sudo systemctl start rclone-mount@${BUCKET}
+        done
+    fi
 fi
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+"""
+Command line tool for inspecting and controlling the rclone bucket mounts under /gcs
+through their remote control API.
+
+Examples:
+* rclone-mountctl stats                      Show stats of all mounts.
+* rclone-mountctl refresh my-bucket data -r  Warm the directory cache of my-bucket/data.
+* rclone-mountctl forget my-bucket data/     Drop the cached listings of my-bucket/data.
+* rclone-mountctl flush my-bucket --wait     Upload pending writes of my-bucket now.
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List
+
+from rclone_rc import RcloneRcError, list_mounts, rc_call
+
+
+def main() -> None:
+    """Main function that dispatches to the requested command."""
+
+    parser = argparse.ArgumentParser(
+        prog="rclone-mountctl",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stats_parser = subparsers.add_parser("stats", help="Show stats of the mounts")
+    stats_parser.add_argument("buckets", nargs="*")
+
+    refresh_parser = subparsers.add_parser(
+        "refresh", help="Warm the directory cache of a mount"
+    )
+    refresh_parser.add_argument("bucket")
+    refresh_parser.add_argument("dirs", nargs="*", help="Relative to the bucket")
+    refresh_parser.add_argument("-r", "--recursive", action="store_true")
+
+    forget_parser = subparsers.add_parser(
+        "forget", help="Drop the cached directory listings of a mount"
+    )
+    forget_parser.add_argument("bucket")
+    forget_parser.add_argument(
+        "paths",
+        nargs="*",
+        help="Relative to the bucket, directories end with a '/' (e.g. data/)",
+    )
+
+    flush_parser = subparsers.add_parser(
+        "flush", help="Upload the pending writes of a mount immediately"
+    )
+    flush_parser.add_argument("bucket")
+    flush_parser.add_argument(
+        "--wait", action="store_true", help="Wait until all uploads have finished"
+    )
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "stats":
+            show_stats(args.buckets or list(list_mounts()))
+        elif args.command == "refresh":
+            refresh(args.bucket, args.dirs, recursive=args.recursive)
+        elif args.command == "forget":
+            forget(args.bucket, args.paths)
+        else:
+            flush(args.bucket, wait=args.wait)
+    except RcloneRcError as error:
+        sys.exit(f"Error: {error}")
+
+
+def show_stats(buckets: List[str]) -> None:
+    """Prints the core and VFS stats of the given mounts."""
+
+    stats = {
+        bucket: {
+            "core": rc_call(bucket, "core/stats"),
+            "vfs": rc_call(bucket, "vfs/stats"),
+        }
+        for bucket in buckets
+    }
+    print(json.dumps(stats, indent=2))
+
+
+def refresh(bucket: str, dirs: List[str], recursive: bool) -> None:
+    """Reads the listings of the given directories (or the root) into the cache."""
+
+    params: Dict[str, Any] = {"recursive": str(recursive).lower()}
+    for index, directory in enumerate(dirs):
+        params["dir" if index == 0 else f"dir{index + 1}"] = directory
+
+    result = rc_call(bucket, "vfs/refresh", params, timeout=3600)
+    print(json.dumps(result.get("result", {}), indent=2))
+
+
+def forget(bucket: str, paths: List[str]) -> None:
+    """Drops the given paths (or everything) from the directory cache."""
+
+    # rclone forgets files and directories using separate (numbered) parameters.
+    params = {}
+    for index, path in enumerate(paths):
+        kind = "dir" if path.endswith("/") else "file"
+        params[f"{kind}{index + 1}"] = path.rstrip("/")
+    result = rc_call(bucket, "vfs/forget", params)
+    print(json.dumps(result, indent=2))
+
+
+def flush(bucket: str, wait: bool) -> None:
+    """Expires the upload delay of all queued writes so they are uploaded right away."""
+
+    queue = rc_call(bucket, "vfs/queue").get("queue", [])
+    for item in queue:
+        rc_call(bucket, "vfs/queue-set-expiry", {"id": item["id"], "expiry": 0})
+    print(f"Flushing {len(queue)} queued uploads of '{bucket}'")
+
+    while wait:
+        disk_cache = rc_call(bucket, "vfs/stats").get("diskCache", {})
+        pending = disk_cache.get("uploadsQueued", 0) + disk_cache.get(
+            "uploadsInProgress", 0
+        )
+        if pending == 0:
+            break
+        print(f"Waiting for {pending} uploads to finish")
+        time.sleep(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+"""
+Script that prewarms the VFS caches of the rclone bucket mounts by reading a list of
+bucket prefixes through the mounts, so that jobs reading the same data after boot
+don't pay the latency of fetching it from GCS.
+
+Prewarming is limited to a total size budget, never uses more than a fraction of the
+cache budget given to each mount by the cache coordinator and is rate-limited so
+that it doesn't starve interactive reads.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Dict, Iterator, List, Set, Tuple
+
+from rclone_rc import RC_SOCKET_DIR, format_size
+from workbench_utils import parse_size
+
+MOUNT_DIR = Path("/gcs")
+ALLOCATIONS_PATH = RC_SOCKET_DIR / "cache-allocations.json"
+
+# Maximum fraction of a mount's cache allocation that is used for prewarming.
+MAX_CACHE_FRACTION = 0.8
+CHUNK_SIZE = 1024**2
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+@dataclass
+class PrewarmEntry:
+    """A bucket prefix that should be prewarmed."""
+
+    bucket: str
+    prefix: str
+
+
+class RateLimiter:  # pylint: disable=too-few-public-methods
+    """Token bucket limiting the number of bytes read per second across threads."""
+
+    def __init__(self, rate: int) -> None:
+        self.rate = rate
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount: int) -> None:
+        """Blocks until the given amount of bytes may be read."""
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.tokens + (now - self.updated) * self.rate, float(self.rate)
+            )
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+def main() -> None:
+    """Main function that prewarms the given prefixes."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--entries", required=True, help="Semicolon-separated 'bucket/prefix' entries"
+    )
+    parser.add_argument("--max-size", default="10G", help="Total prewarm budget")
+    parser.add_argument("--rate", default="50M", help="Maximum bytes read per second")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--mount-timeout",
+        type=float,
+        default=600,
+        help="Seconds to wait for the mounts to become ready",
+    )
+    args = parser.parse_args()
+
+    files = select_files(
+        entries=parse_entries(args.entries),
+        budget=parse_size(args.max_size),
+        mount_timeout=args.mount_timeout,
+    )
+
+    total = sum(size for _, size in files)
+    logging.info(f"Prewarming {len(files)} files ({format_size(total)})")
+
+    start = time.monotonic()
+    limiter = RateLimiter(parse_size(args.rate))
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        warmed = sum(executor.map(lambda file: read_file(file[0], limiter), files))
+    duration = time.monotonic() - start
+
+    logging.info(
+        f"Prewarmed {format_size(warmed)} in {duration:.1f}s"
+        f" ({format_size(int(warmed / max(duration, 1)))}/s)"
+    )
+
+
+def parse_entries(value: str) -> List[PrewarmEntry]:
+    """Parses semicolon-separated 'bucket/prefix' entries."""
+
+    entries = []
+    for item in value.split(";"):
+        item = item.strip().strip("/")
+        if item:
+            bucket, _, prefix = item.partition("/")
+            entries.append(PrewarmEntry(bucket=bucket, prefix=prefix))
+    return entries
+
+
+def select_files(
+    entries: List[PrewarmEntry], budget: int, mount_timeout: float
+) -> List[Tuple[Path, int]]:
+    """
+    Selects the files to prewarm (with their sizes), staying within both the total
+    budget and the budget of each bucket.
+    """
+
+    bucket_budgets = get_bucket_budgets()
+    bucket_sizes: Dict[str, int] = {}
+    files: List[Tuple[Path, int]] = []
+    seen: Set[Path] = set()
+
+    for entry in entries:
+        if not wait_for_mount(entry.bucket, timeout=mount_timeout):
+            logging.warning(f"Mount of '{entry.bucket}' is not ready, skipping")
+            continue
+
+        for path, size in list_files(entry):
+            if budget <= 0:
+                break
+            if path in seen:
+                continue
+            seen.add(path)
+            bucket_size = bucket_sizes.get(entry.bucket, 0)
+            if size > budget or bucket_size + size > bucket_budgets.get(
+                entry.bucket, budget
+            ):
+                continue
+            files.append((path, size))
+            bucket_sizes[entry.bucket] = bucket_size + size
+            budget -= size
+
+    return files
+
+
+def get_bucket_budgets() -> Dict[str, int]:
+    """Returns the maximum number of bytes to prewarm per bucket, based on its cache size."""
+
+    if not ALLOCATIONS_PATH.exists():
+        return {}
+    allocations: Dict[str, int] = json.loads(ALLOCATIONS_PATH.read_text())
+    return {
+        bucket: int(allocation * MAX_CACHE_FRACTION)
+        for bucket, allocation in allocations.items()
+    }
+
+
+def wait_for_mount(bucket: str, timeout: float) -> bool:
+    """Waits until the given bucket is mounted."""
+
+    deadline = time.monotonic() + timeout
+    while not os.path.ismount(MOUNT_DIR / bucket):
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(5)
+    return True
+
+
+def list_files(entry: PrewarmEntry) -> Iterator[Tuple[Path, int]]:
+    """
+    Lists the files (with their sizes) under the given prefix. Like GCS prefixes, the
+    prefix can either be a directory or the start of a file/directory name.
+    """
+
+    path = MOUNT_DIR / entry.bucket / entry.prefix
+    if path.is_file():
+        yield path, path.stat().st_size
+        return
+
+    if path.is_dir():
+        roots = [path]
+    else:
+        roots = [
+            child
+            for child in sorted(path.parent.glob(f"{path.name}*"))
+            if child.is_dir() or child.is_file()
+        ]
+
+    for root in roots:
+        if root.is_file():
+            yield root, root.stat().st_size
+            continue
+        for dirpath, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                file_path = Path(dirpath) / filename
+                yield file_path, file_path.stat().st_size
+
+
+def read_file(path: Path, limiter: RateLimiter) -> int:
+    """Reads a file through the mount (which stores it in the cache)."""
+
+    read = 0
+    try:
+        with open(path, "rb") as file:
+            while True:
+                limiter.acquire(CHUNK_SIZE)
+                chunk = file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                read += len(chunk)
+    except OSError as error:
+        logging.warning(f"Failed to prewarm '{path}': {error}")
+    return read
+
+
+if __name__ == "__main__":
+    main()
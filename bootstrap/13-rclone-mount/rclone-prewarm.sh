@@ -0,0 +1,21 @@
+#!/usr/bin/env bash
+
+set -o errexit
+set -o pipefail
+set -o nounset
+
+get_attribute() {
+    curl --fail "http://metadata.google.internal/computeMetadata/v1/instance/attributes/$1" -H "Metadata-Flavor: Google"
+}
+
+set +o errexit
+RCLONE_PREWARM=$(get_attribute rclone-prewarm)
+RCLONE_PREWARM_SET=$?
+set -o errexit
+
+if [ $RCLONE_PREWARM_SET -eq 0 ]; then
+    python3 /opt/rclone-mount/rclone-prewarm.py \
+        --entries "${RCLONE_PREWARM}" \
+        --max-size "$(get_attribute rclone-prewarm-max-size || echo 10G)" \
+        --rate "$(get_attribute rclone-prewarm-rate || echo 50M)"
+fi
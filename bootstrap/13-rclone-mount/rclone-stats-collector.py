@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+"""
+Script that periodically collects statistics from the rclone bucket mounts (using the
+core/stats and vfs/stats calls of their remote control API) and exposes them as metrics
+in the Prometheus text format, so they can be picked up by e.g. the node exporter's
+textfile collector or the Ops Agent.
+
+Metrics are reported per bucket and include throughput, cache usage, upload queue
+length and error counts.
+"""
+
+import argparse
+import logging
+import os
+from pathlib import Path
+import time
+from typing import Dict, List, Tuple
+
+from rclone_rc import RcloneRcError, list_mounts, rc_call
+
+METRICS_PATH = Path("/var/lib/workbench-metrics/rclone-mount.prom")
+
+# Metrics as (name, type, help) tuples, in the order they are written.
+METRICS = [
+    ("rclone_mount_up", "gauge", "Whether the rc API of the mount is reachable."),
+    ("rclone_mount_bytes_total", "counter", "Bytes transferred from/to GCS."),
+    (
+        "rclone_mount_throughput_bytes",
+        "gauge",
+        "Bytes per second transferred since the previous collection.",
+    ),
+    ("rclone_mount_transfers_total", "counter", "Completed file transfers."),
+    ("rclone_mount_errors_total", "counter", "Errors encountered by the mount."),
+    ("rclone_mount_cache_bytes", "gauge", "Bytes used by the VFS cache."),
+    ("rclone_mount_cache_files", "gauge", "Files in the VFS cache."),
+    ("rclone_mount_cache_out_of_space", "gauge", "Whether the VFS cache is full."),
+    ("rclone_mount_uploads_queued", "gauge", "Uploads waiting in the queue."),
+    ("rclone_mount_uploads_in_progress", "gauge", "Uploads currently running."),
+]
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+def main() -> None:
+    """Main function that collects the statistics until stopped."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--interval", type=float, default=30, help="In seconds")
+    parser.add_argument("--output", type=Path, default=METRICS_PATH)
+    parser.add_argument("--once", action="store_true", help="Collect only once")
+    args = parser.parse_args()
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    previous: Dict[str, Tuple[float, int]] = {}
+
+    while True:
+        samples = collect(previous)
+        write_metrics(args.output, samples)
+
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+def collect(previous: Dict[str, Tuple[float, int]]) -> Dict[str, Dict[str, float]]:
+    """
+    Collects the metrics of all mounts, keyed by bucket. The (time, bytes) of the
+    previous collection are used to compute throughput and are updated in place.
+    """
+
+    samples: Dict[str, Dict[str, float]] = {}
+
+    for bucket in list_mounts():
+        try:
+            core_stats = rc_call(bucket, "core/stats", timeout=10)
+            vfs_stats = rc_call(bucket, "vfs/stats", timeout=10)
+        except RcloneRcError as error:
+            logging.warning(f"Failed to collect stats for '{bucket}': {error}")
+            samples[bucket] = {"rclone_mount_up": 0}
+            previous.pop(bucket, None)
+            continue
+
+        now = time.monotonic()
+        transferred = int(core_stats.get("bytes", 0))
+        previous_time, previous_transferred = previous.get(bucket, (now, transferred))
+        previous[bucket] = (now, transferred)
+
+        throughput = 0.0
+        if now > previous_time and transferred >= previous_transferred:
+            throughput = (transferred - previous_transferred) / (now - previous_time)
+
+        disk_cache = vfs_stats.get("diskCache", {})
+        samples[bucket] = {
+            "rclone_mount_up": 1,
+            "rclone_mount_bytes_total": transferred,
+            "rclone_mount_throughput_bytes": throughput,
+            "rclone_mount_transfers_total": core_stats.get("transfers", 0),
+            "rclone_mount_errors_total": core_stats.get("errors", 0),
+            "rclone_mount_cache_bytes": disk_cache.get("bytesUsed", 0),
+            "rclone_mount_cache_files": disk_cache.get("files", 0),
+            "rclone_mount_cache_out_of_space": int(disk_cache.get("outOfSpace", False)),
+            "rclone_mount_uploads_queued": disk_cache.get("uploadsQueued", 0),
+            "rclone_mount_uploads_in_progress": disk_cache.get("uploadsInProgress", 0),
+        }
+
+    return samples
+
+
+def write_metrics(path: Path, samples: Dict[str, Dict[str, float]]) -> None:
+    """Writes the samples in the Prometheus text format (atomically)."""
+
+    lines: List[str] = []
+    for name, metric_type, description in METRICS:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for bucket, values in samples.items():
+            if name in values:
+                lines.append(f'{name}{{bucket="{bucket}"}} {values[name]}')
+
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    main()
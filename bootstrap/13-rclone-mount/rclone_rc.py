@@ -0,0 +1,88 @@
+"""
+Shared helpers for talking to the remote control (rc) API of the rclone mounts.
+
+Each bucket mount (rclone-mount@<bucket>.service) serves its rc API on a unix socket
+in RC_SOCKET_DIR, named after the bucket. See https://rclone.org/rc/ for the API.
+"""
+
+import http.client
+import json
+import socket
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from workbench_utils import SIZE_SUFFIXES
+
+RC_SOCKET_DIR = Path("/run/rclone-mount")
+
+
+class RcloneRcError(Exception):
+    """Error raised if an rc call to an rclone mount fails."""
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a unix socket instead of TCP."""
+
+    def __init__(self, path: Path, timeout: float) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(str(self.path))
+        self.sock = sock
+
+
+def socket_path(bucket: str) -> Path:
+    """Returns the path of the rc socket of the given bucket mount."""
+    return RC_SOCKET_DIR / f"{bucket}.sock"
+
+
+def list_mounts() -> Dict[str, Path]:
+    """Returns the rc sockets of all (possibly) running bucket mounts, keyed by bucket."""
+    return {path.stem: path for path in sorted(RC_SOCKET_DIR.glob("*.sock"))}
+
+
+def rc_call(
+    bucket: str,
+    command: str,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: float = 30,
+) -> Dict[str, Any]:
+    """Calls the given rc command (e.g. 'core/stats') on the mount of a bucket."""
+
+    connection = UnixHTTPConnection(socket_path(bucket), timeout=timeout)
+    try:
+        connection.request(
+            "POST",
+            f"/{command}",
+            body=json.dumps(params or {}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        response = connection.getresponse()
+        content = response.read().decode()
+    except OSError as error:
+        raise RcloneRcError(
+            f"Failed to call '{command}' on '{bucket}': {error}"
+        ) from error
+    finally:
+        connection.close()
+
+    result: Dict[str, Any] = json.loads(content) if content else {}
+    if response.status != 200:
+        raise RcloneRcError(
+            f"Call '{command}' on '{bucket}' failed: {result.get('error', content)}"
+        )
+    return result
+
+
+def format_size(value: int) -> str:
+    """
+    Formats a number of bytes using the largest suffix that fits exactly. Note that rclone
+    interprets sizes without a suffix as KiB, so plain byte counts get a 'B' suffix.
+    """
+    for suffix in ("T", "G", "M", "K"):
+        if value >= SIZE_SUFFIXES[suffix] and value % SIZE_SUFFIXES[suffix] == 0:
+            return f"{value // SIZE_SUFFIXES[suffix]}{suffix}"
+    return f"{value}B"
@@ -0,0 +1 @@
+../shared/workbench_utils.py
\ No newline at end of file
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark that compares loading the IDE directly from openvscode-server with loading
+it through the front proxy. For both, fetches the workbench page plus all static
+assets it references (like a browser with an empty cache would), and reports the
+number of bytes transferred and the time taken as JSON.
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from typing import Dict, List, Union
+from urllib.parse import urljoin
+from urllib.request import Request, urlopen
+
+ASSET_PATTERN = re.compile(r"""(?:src|href)=["']([^"']*/static/[^"']+)["']""")
+
+
+def main() -> None:
+    """Main function that runs the benchmark."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--direct-url", default="http://127.0.0.1:8080/")
+    parser.add_argument("--proxy-url", default="http://127.0.0.1:8082/")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {
+        "direct": benchmark(args.direct_url, args.repeat),
+        "front_proxy": benchmark(args.proxy_url, args.repeat),
+    }
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+def benchmark(url: str, repeat: int) -> Dict[str, Union[int, float]]:
+    """Loads the workbench a number of times, returning the bytes and (best) time."""
+
+    durations = []
+    transferred = 0
+    assets = 0
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        page = fetch(url)
+        asset_urls = find_assets(url, page.decode(errors="replace"))
+        transferred = len(page) + sum(len(fetch(asset)) for asset in asset_urls)
+        durations.append(time.perf_counter() - start)
+        assets = len(asset_urls)
+
+    return {
+        "assets": assets,
+        "bytes_transferred": transferred,
+        "best_seconds": min(durations),
+        "mean_seconds": sum(durations) / len(durations),
+    }
+
+
+def find_assets(base_url: str, page: str) -> List[str]:
+    """Finds the URLs of the static assets referenced by the workbench page."""
+    return sorted({urljoin(base_url, path) for path in ASSET_PATTERN.findall(page)})
+
+
+def fetch(url: str) -> bytes:
+    """Fetches a URL like a browser would, returning the (possibly compressed) body."""
+
+    request = Request(url, headers={"Accept-Encoding": "br, gzip"})
+    with urlopen(request, timeout=60) as response:
+        body: bytes = response.read()
+    return body
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+
+"""
+Lightweight front proxy that sits between the proxy agent and openvscode-server.
+
+Static assets of the IDE (which live under a versioned path, e.g.
+'/stable-<commit>/static/out/...', and are therefore immutable) are served directly
+from disk with long-lived cache headers, using the gzip/brotli versions precompressed
+at image build time (see precompress-assets.sh). This avoids transferring several MB
+of uncompressed JavaScript through the tunnel on every page load.
+
+All other requests, including websockets, are passed through to openvscode-server.
+
+In multi-user mode (see configure-multi-user.sh), the front proxy also routes the
+requests of each user to their own openvscode-server instance: opening
+'/_user/<name>?tkn=<token>' with the connection token of the user selects their
+instance using a cookie, which routes all following requests (including websockets) to
+the port of that user, and passes the token on to the instance (which requires it on
+every request, so selecting the instance of another user without their token doesn't
+give access to it). The default instance (of the default user) requires a token as
+well, and requests without the cookie of a user are rejected rather than passed to it.
+Without multi-user mode, all requests are passed to the default upstream.
+"""
+
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+import hashlib
+import hmac
+from http.cookies import CookieError, SimpleCookie
+import json
+import logging
+import mimetypes
+import os
+from pathlib import Path
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+APP_ROOT = Path("/opt/openvscode-server")
+PRECOMPRESSED_ROOT = Path("/opt/openvscode-server-precompressed")
+
+STATIC_PATH_PATTERN = re.compile(r"^/[^/]+-[0-9a-f]{40}/static/(?P<path>.+)$")
+# Encodings in order of preference, with the suffix of the precompressed files.
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+MAX_HEAD_SIZE = 64 * 1024
+
+# Ports and connection tokens of the users in multi-user mode, written by
+# configure-multi-user.sh (the default user has no token).
+USERS_PATH = Path("/run/openvscode-users/users.json")
+TOKENS_PATH = Path("/run/openvscode-users/tokens.json")
+USER_PATH_PATTERN = re.compile(r"^/_user/(?P<user>[a-z_][a-z0-9_]*)/?$")
+USER_COOKIE = "workbench-ide-user"
+# Answered by the front proxy itself, for the health checks of the proxy agent.
+HEALTH_PATH = "/_health"
+NO_USER_MESSAGE = "Open /_user/<name>?tkn=<token> to select your IDE.\n"
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+@dataclass
+class RequestHead:
+    """Parsed request line + headers of an HTTP request."""
+
+    method: str
+    target: str
+    version: str
+    headers: Dict[str, str]
+    raw: bytes
+
+    @property
+    def keep_alive(self) -> bool:
+        """Whether the client wants to keep the connection open after the request."""
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+@dataclass
+class JsonFile:
+    """JSON file that is reloaded when it changes (empty while it doesn't exist)."""
+
+    path: Path
+    value: Dict[str, Any] = field(default_factory=dict)
+    mtime: int = 0
+
+    def load(self) -> Dict[str, Any]:
+        """Returns the content of the file, reloading it when it changed."""
+
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        if mtime != self.mtime:
+            self.value = json.loads(self.path.read_text(encoding="utf-8"))
+            self.mtime = mtime
+            logging.info(f"Loaded {len(self.value)} entries from {self.path}")
+        return self.value
+
+
+class FrontProxy:
+    """Front proxy serving static assets and forwarding everything else."""
+
+    def __init__(
+        self,
+        upstream_host: str,
+        upstream_port: int,
+        users_path: Path = USERS_PATH,
+        tokens_path: Path = TOKENS_PATH,
+    ) -> None:
+        self.upstream_host = upstream_host
+        self.upstream_port = upstream_port
+        self.users_file = JsonFile(users_path)
+        self.tokens_file = JsonFile(tokens_path)
+        self.first_request_seen = False
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Handles a client connection."""
+
+        try:
+            while True:
+                head = await read_head(reader)
+                if head is None:
+                    break
+
+                # Logged for the boot analysis (see workbench-boot-analysis), health
+                # checks of the proxy agent aren't sent by a browser.
+                if not self.first_request_seen and is_browser_request(head):
+                    self.first_request_seen = True
+                    logging.info(f"First proxied request: {head.method} {head.target}")
+
+                target = urlsplit(head.target)
+                if target.path == HEALTH_PATH:
+                    await write_response(writer, "200 OK", [], b"OK\n")
+                    break
+
+                match = USER_PATH_PATTERN.match(target.path)
+                if match is not None:
+                    token = parse_qs(target.query).get("tkn", [""])[0]
+                    await self.select_user(match.group("user"), token, writer)
+                    break
+
+                asset = resolve_asset(head)
+                if asset is None:
+                    port = self.route(head)
+                    if port is None:
+                        await write_response(
+                            writer, "403 Forbidden", [], NO_USER_MESSAGE.encode()
+                        )
+                        break
+                    # Hand the rest of the connection over to the upstream.
+                    await self.forward(head, port, reader, writer)
+                    break
+
+                await serve_asset(head, asset, writer)
+                if not head.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as error:
+            logging.debug(f"Closing connection: {error}")
+        finally:
+            writer.close()
+
+    async def forward(
+        self,
+        head: RequestHead,
+        port: int,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """Forwards a request (and the rest of the connection) to an upstream port."""
+
+        upstream_reader, upstream_writer = await asyncio.open_connection(
+            self.upstream_host, port
+        )
+
+        # Ask the upstream to close the connection after the response (unless it's an
+        # upgrade to a websocket), so that following requests of the client arrive on
+        # a new connection and can be served from the static assets again.
+        if "upgrade" not in head.headers.get("connection", "").lower():
+            head = with_header(head, "Connection", "close")
+
+        upstream_writer.write(head.raw)
+        to_upstream = asyncio.ensure_future(pipe(reader, upstream_writer))
+        try:
+            await pipe(upstream_reader, writer)
+        finally:
+            to_upstream.cancel()
+            upstream_writer.close()
+
+    def route(self, head: RequestHead) -> Optional[int]:
+        """
+        Returns the upstream port of a request, based on the user cookie. In multi-user
+        mode (i.e. when the users have tokens), requests without the cookie of a known
+        user aren't routed (None).
+        """
+
+        cookie: SimpleCookie = SimpleCookie()
+        try:
+            cookie.load(head.headers.get("cookie", ""))
+        except CookieError:
+            pass
+        users = self.users_file.load()
+        if USER_COOKIE in cookie and cookie[USER_COOKIE].value in users:
+            port: int = users[cookie[USER_COOKIE].value]
+            return port
+        return None if self.tokens_file.load() else self.upstream_port
+
+    async def select_user(
+        self, user: str, token: str, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Selects the instance of a user with a cookie and redirects to the IDE, passing
+        the connection token on to the instance (which keeps it in its own cookie).
+        """
+
+        expected_token: Optional[str] = self.tokens_file.load().get(user)
+        if user not in self.users_file.load():
+            await write_response(writer, "404 Not Found", [])
+        elif expected_token is not None and not hmac.compare_digest(
+            token.encode(), expected_token.encode()
+        ):
+            logging.warning(f"Invalid connection token for the user {user}")
+            await write_response(writer, "403 Forbidden", [])
+        else:
+            await write_response(
+                writer,
+                "302 Found",
+                [
+                    f"Location: /?tkn={token}"
+                    if expected_token is not None
+                    else "Location: /",
+                    f"Set-Cookie: {USER_COOKIE}={user}; Path=/; HttpOnly; SameSite=Lax",
+                ],
+            )
+
+
+async def write_response(
+    writer: asyncio.StreamWriter, status: str, headers: List[str], body: bytes = b""
+) -> None:
+    """Writes a response generated by the front proxy itself, closing the connection."""
+
+    lines = [f"HTTP/1.1 {status}", *headers]
+    lines += [f"Content-Length: {len(body)}", "Connection: close"]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def read_head(reader: asyncio.StreamReader) -> Optional[RequestHead]:
+    """Reads the head of the next request on a connection (None if it was closed)."""
+
+    try:
+        raw = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as error:
+        if error.partial.strip():
+            raise
+        return None
+    except asyncio.LimitOverrunError as error:
+        raise ValueError("Request head too large") from error
+
+    lines = raw.decode("latin-1").split("\r\n")
+    method, target, version = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            key, _, value = line.partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+    return RequestHead(
+        method=method, target=target, version=version, headers=headers, raw=raw
+    )
+
+
+def is_browser_request(head: RequestHead) -> bool:
+    """Whether a request was sent by a browser (rather than e.g. a health check)."""
+    return "mozilla" in head.headers.get("user-agent", "").lower()
+
+
+def with_header(head: RequestHead, name: str, value: str) -> RequestHead:
+    """Returns a copy of the request head with the given header set."""
+
+    lines = head.raw.decode("latin-1").split("\r\n")
+    lines = [lines[0]] + [
+        line
+        for line in lines[1:]
+        if line and line.partition(":")[0].strip().lower() != name.lower()
+    ]
+    raw = "\r\n".join(lines + [f"{name}: {value}", "", ""]).encode("latin-1")
+    return RequestHead(
+        method=head.method,
+        target=head.target,
+        version=head.version,
+        headers={**head.headers, name.lower(): value},
+        raw=raw,
+    )
+
+
+def resolve_asset(head: RequestHead) -> Optional[Path]:
+    """Returns the static asset on disk requested by the request (if any)."""
+
+    if head.method not in ("GET", "HEAD"):
+        return None
+
+    match = STATIC_PATH_PATTERN.match(urlsplit(head.target).path)
+    if match is None:
+        return None
+
+    relative_path = os.path.normpath(unquote(match.group("path")))
+    if relative_path.startswith(("/", "..")):
+        return None
+
+    path = APP_ROOT / relative_path
+    return path if path.is_file() else None
+
+
+def select_encoding(head: RequestHead, asset: Path) -> Tuple[Optional[str], Path]:
+    """Selects the best precompressed version of an asset accepted by the client."""
+
+    accepted = {
+        encoding.split(";")[0].strip()
+        for encoding in head.headers.get("accept-encoding", "").lower().split(",")
+    }
+    relative_path = asset.relative_to(APP_ROOT)
+
+    for encoding, suffix in ENCODINGS:
+        precompressed = PRECOMPRESSED_ROOT / f"{relative_path}{suffix}"
+        if encoding in accepted and precompressed.is_file():
+            return encoding, precompressed
+    return None, asset
+
+
+async def serve_asset(
+    head: RequestHead, asset: Path, writer: asyncio.StreamWriter
+) -> None:
+    """Serves a static asset (using a precompressed version if possible)."""
+
+    encoding, path = select_encoding(head, asset)
+    stat = path.stat()
+    digest = hashlib.sha1(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    etag = f'"{digest.hexdigest()}"'
+
+    headers = {
+        "Content-Type": mimetypes.guess_type(asset.name)[0]
+        or "application/octet-stream",
+        "Cache-Control": CACHE_CONTROL,
+        "ETag": etag,
+        "Vary": "Accept-Encoding",
+        "Connection": "keep-alive" if head.keep_alive else "close",
+    }
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+
+    if head.headers.get("if-none-match") == etag:
+        status = "304 Not Modified"
+        body = b""
+    else:
+        status = "200 OK"
+        body = b"" if head.method == "HEAD" else path.read_bytes()
+        headers["Content-Length"] = str(stat.st_size)
+
+    lines = [f"HTTP/1.1 {status}"] + [
+        f"{key}: {value}" for key, value in headers.items()
+    ]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Copies data from a reader to a writer until the reader is closed."""
+
+    try:
+        while True:
+            data = await reader.read(64 * 1024)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        if writer.can_write_eof():
+            try:
+                writer.write_eof()
+            except OSError:
+                pass
+
+
+async def serve(host: str, port: int, proxy: FrontProxy) -> None:
+    """Runs the front proxy until stopped."""
+
+    server = await asyncio.start_server(proxy.handle, host, port, limit=MAX_HEAD_SIZE)
+    logging.info(f"Listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    """Main function that starts the front proxy."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--upstream-host", default="127.0.0.1")
+    parser.add_argument("--upstream-port", type=int, default=8080)
+    parser.add_argument("--users-file", type=Path, default=USERS_PATH)
+    parser.add_argument("--tokens-file", type=Path, default=TOKENS_PATH)
+    args = parser.parse_args()
+
+    mimetypes.add_type("application/javascript", ".js")
+    mimetypes.add_type("application/wasm", ".wasm")
+
+    proxy = FrontProxy(
+        args.upstream_host, args.upstream_port, args.users_file, args.tokens_file
+    )
+    asyncio.run(serve(args.host, args.port, proxy))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+#!/usr/bin/env bash
+
+# Precompresses the static assets of openvscode-server with gzip and brotli, so that
+# the front proxy can serve them compressed without compressing on every request.
+
+set -o errexit
+set -o pipefail
+set -o nounset
+
+APP_ROOT=/opt/openvscode-server
+PRECOMPRESSED_ROOT=/opt/openvscode-server-precompressed
+
+rm -rf ${PRECOMPRESSED_ROOT}
+export PRECOMPRESSED_ROOT
+
+cd ${APP_ROOT}
+find out extensions node_modules -type f -size +1k \
+    \( -name '*.js' -o -name '*.css' -o -name '*.json' -o -name '*.html' -o -name '*.svg' -o -name '*.ttf' -o -name '*.wasm' \) \
+    -print0 |
+xargs -0 -n 50 -P "$(nproc)" bash -c '
+    for FILE; do
+        mkdir -p "${PRECOMPRESSED_ROOT}/$(dirname "${FILE}")"
+        gzip -9 --no-name --stdout "${FILE}" > "${PRECOMPRESSED_ROOT}/${FILE}.gz"
+        brotli --best --stdout "${FILE}" > "${PRECOMPRESSED_ROOT}/${FILE}.br"
+    done
+' _
+
+du -sh ${PRECOMPRESSED_ROOT}
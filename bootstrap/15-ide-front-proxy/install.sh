@@ -0,0 +1,25 @@
+#!/usr/bin/env bash
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+SCRIPT_DIR=`dirname $0 | xargs realpath`
+
+# Install dependencies (unless already installed in a batch by build-runner.py).
+if [ -z "${WORKBENCH_APT_BATCHED:-}" ]; then
+    apt-get update
+    apt-get install -y brotli
+fi
+
+# Install scripts.
+mkdir -p /opt/ide-front-proxy
+cp ${SCRIPT_DIR}/ide-front-proxy/* /opt/ide-front-proxy/
+
+# Precompress the static assets of openvscode-server.
+bash /opt/ide-front-proxy/precompress-assets.sh
+
+# Install + enable service to start on boot.
+cp ${SCRIPT_DIR}/ide-front-proxy.service /etc/systemd/system/ide-front-proxy.service
+systemctl enable ide-front-proxy
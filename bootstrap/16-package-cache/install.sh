@@ -0,0 +1,36 @@
+#!/usr/bin/env bash
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+SCRIPT_DIR=`dirname $0 | xargs realpath`
+
+WHEELHOUSE_DIR=/opt/wheelhouse
+
+# Install scripts.
+mkdir -p /opt/package-cache
+cp ${SCRIPT_DIR}/package-cache/* /opt/package-cache/
+
+# Install the CLI for restoring the venvs of poetry projects from the venv cache.
+chmod +x /opt/package-cache/poetry-venv-cache.py
+ln -sf /opt/package-cache/poetry-venv-cache.py /usr/local/bin/poetry-venv-cache
+
+# Build the wheelhouse for all Python versions installed using pyenv (before
+# 20-user-bootstrap moves pyenv out of the home dir).
+PYENV_ROOT=/home/ubuntu/.pyenv
+
+mkdir -p ${WHEELHOUSE_DIR}
+for PYTHON in ${PYENV_ROOT}/versions/*/bin/python; do
+    ${PYTHON} -m pip wheel --no-cache-dir --wheel-dir ${WHEELHOUSE_DIR} \
+        --requirement ${SCRIPT_DIR}/wheelhouse.txt
+done
+chmod -R a+rX ${WHEELHOUSE_DIR}
+
+# Install + enable services to configure the cache on boot and prune it periodically.
+cp ${SCRIPT_DIR}/package-cache.service /etc/systemd/system/
+cp ${SCRIPT_DIR}/package-cache-prune.service /etc/systemd/system/
+cp ${SCRIPT_DIR}/package-cache-prune.timer /etc/systemd/system/
+systemctl enable package-cache
+systemctl enable package-cache-prune.timer
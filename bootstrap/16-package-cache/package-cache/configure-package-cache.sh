@@ -0,0 +1,74 @@
+#!/usr/bin/env bash
+
+# Configures pip + poetry to share a persistent package cache (on the data disk by
+# default) and to prefer the prebuilt wheels in the wheelhouse of the image. The size
+# of the cache is capped by package-cache-prune.py, which is run periodically.
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+USER=ubuntu
+USER_HOME_DIR=/home/ubuntu
+LOCAL_SSD_MOUNT_DIR=/mnt/disks/local-ssd
+WHEELHOUSE_DIR=/opt/wheelhouse
+POETRY=${USER_HOME_DIR}/.poetry/bin/poetry
+
+get_attribute() {
+    curl --fail "http://metadata.google.internal/computeMetadata/v1/instance/attributes/$1" -H "Metadata-Flavor: Google"
+}
+
+CACHE_VOLUME=$(get_attribute package-cache-volume || echo data-disk)
+CACHE_MAX_SIZE=$(get_attribute package-cache-max-size || echo 20G)
+VENV_CACHE_MAX_SIZE=$(get_attribute poetry-venv-cache-max-size || echo 10G)
+
+case ${CACHE_VOLUME} in
+    data-disk)
+        CACHE_ROOT=${USER_HOME_DIR}/.cache
+        ;;
+    local-ssd)
+        if mountpoint -q ${LOCAL_SSD_MOUNT_DIR} ; then
+            CACHE_ROOT=${LOCAL_SSD_MOUNT_DIR}/package-cache
+        else
+            echo "No local SSD mounted, using the data disk for the package cache"
+            CACHE_ROOT=${USER_HOME_DIR}/.cache
+        fi
+        ;;
+    /*)
+        CACHE_ROOT=${CACHE_VOLUME}
+        ;;
+    *)
+        echo "Unsupported package cache volume: ${CACHE_VOLUME}"
+        exit 1
+        ;;
+esac
+
+mkdir -p ${CACHE_ROOT}/pip ${CACHE_ROOT}/pypoetry
+chown ${USER}:${USER} ${CACHE_ROOT} ${CACHE_ROOT}/pip ${CACHE_ROOT}/pypoetry
+
+# Configure pip (which is also used by poetry to install packages, see below).
+cat << EOF > /etc/pip.conf
+[global]
+cache-dir = ${CACHE_ROOT}/pip
+find-links = ${WHEELHOUSE_DIR}
+EOF
+
+# Configure poetry to use the shared cache and to install packages using pip, so that
+# the wheelhouse and the wheels built + cached by pip are used.
+if [ -x ${POETRY} ]; then
+    runuser --user ${USER} -- ${POETRY} config cache-dir ${CACHE_ROOT}/pypoetry
+    runuser --user ${USER} -- ${POETRY} config experimental.new-installer false
+fi
+
+# Used by package-cache-prune.service and poetry-venv-cache.py.
+cat << EOF > /run/package-cache.env
+PACKAGE_CACHE_ROOT=${CACHE_ROOT}
+PACKAGE_CACHE_MAX_SIZE=${CACHE_MAX_SIZE}
+POETRY_VENV_CACHE_MAX_SIZE=${VENV_CACHE_MAX_SIZE}
+EOF
+
+# The venv cache metrics are written by poetry-venv-cache, which is run by the user.
+mkdir -p /var/lib/workbench-metrics
+touch /var/lib/workbench-metrics/poetry-venv-cache.prom
+chown ${USER}:${USER} /var/lib/workbench-metrics/poetry-venv-cache.prom
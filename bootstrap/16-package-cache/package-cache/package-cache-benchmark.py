@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark that measures `poetry install` of a sample project with a cold cache (empty
+caches and no wheelhouse) versus a warm cache (the shared package cache and wheelhouse
+configured by configure-package-cache.sh). Reports the timings as JSON. Run as the
+user that owns the package cache.
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+POETRY = Path("/home/ubuntu/.poetry/bin/poetry")
+
+DEFAULT_DEPENDENCIES = ["numpy", "pandas", "scikit-learn", "requests"]
+
+
+def main() -> None:
+    """Main function that runs the benchmark."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--python", default="python3", help="Python used for the project venv"
+    )
+    parser.add_argument("--dependencies", nargs="+", default=DEFAULT_DEPENDENCIES)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        project_dir = Path(temp_dir) / "sample-project"
+        create_project(project_dir, args.dependencies)
+        python = shutil.which(args.python) or args.python
+
+        # Lock once up front, so that only the installs themselves are measured.
+        run_poetry(project_dir, ["env", "use", python], {})
+        run_poetry(project_dir, ["lock"], {})
+
+        cold_cache_dir = Path(temp_dir) / "cold-cache"
+        cold_env = {
+            "PIP_CONFIG_FILE": os.devnull,
+            "PIP_CACHE_DIR": str(cold_cache_dir / "pip"),
+            "POETRY_CACHE_DIR": str(cold_cache_dir / "pypoetry"),
+        }
+        results = {"cold_seconds": time_install(project_dir, python, cold_env)}
+
+        # First warm install fills the shared cache (if needed), second one is measured.
+        time_install(project_dir, python, {})
+        results["warm_seconds"] = time_install(project_dir, python, {})
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+def create_project(project_dir: Path, dependencies: List[str]) -> None:
+    """Creates a sample poetry project with the given dependencies."""
+
+    project_dir.mkdir(parents=True)
+    requirements = "\n".join(f'{name} = "*"' for name in dependencies)
+    (project_dir / "pyproject.toml").write_text(
+        f"""[tool.poetry]
+name = "sample-project"
+version = "0.1.0"
+description = ""
+authors = []
+
+[tool.poetry.dependencies]
+python = ">=3.8,<3.12"
+{requirements}
+
+[build-system]
+requires = ["poetry-core"]
+build-backend = "poetry.core.masonry.api"
+""",
+        encoding="utf-8",
+    )
+
+
+def time_install(project_dir: Path, python: str, env: Dict[str, str]) -> float:
+    """Installs the project into a fresh venv, returning the time taken."""
+
+    shutil.rmtree(project_dir / ".venv", ignore_errors=True)
+    run_poetry(project_dir, ["env", "use", python], env)
+
+    start = time.perf_counter()
+    run_poetry(project_dir, ["install", "--no-root"], env)
+    return time.perf_counter() - start
+
+
+def run_poetry(project_dir: Path, args: List[str], env: Dict[str, str]) -> None:
+    """Runs a poetry command in the project dir."""
+
+    subprocess.run(
+        [str(POETRY), *args],
+        cwd=project_dir,
+        env={**os.environ, "POETRY_VIRTUALENVS_IN_PROJECT": "true", **env},
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+"""
+Script that caps the size of the shared pip/poetry package cache by evicting the least
+recently used files (based on their access or modification time, whichever is most
+recent) until the cache fits within its maximum size.
+"""
+
+import argparse
+from dataclasses import dataclass
+import logging
+import os
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from workbench_utils import parse_size
+
+# Sub dirs of the cache root that hold the caches of pip and poetry.
+CACHE_DIRS = ["pip", "pypoetry"]
+# Sub dirs that are stored in the cache dir, but aren't caches.
+EXCLUDED_DIRS = ["pypoetry/virtualenvs"]
+
+METRICS_PATH = Path("/var/lib/workbench-metrics/package-cache.prom")
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+@dataclass
+class CachedFile:
+    """File in the package cache."""
+
+    path: Path
+    size: int
+    last_used: float
+
+
+def main() -> None:
+    """Main function that prunes the package cache."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--root", type=Path, required=True)
+    parser.add_argument("--max-size", required=True, help="E.g. '20G'")
+    args = parser.parse_args()
+
+    max_size = parse_size(args.max_size)
+    files = list_files(args.root)
+    size = sum(file.size for file in files)
+
+    evicted_files = evicted_bytes = 0
+    for file in sorted(files, key=lambda file: file.last_used):
+        if size <= max_size:
+            break
+        try:
+            file.path.unlink()
+        except FileNotFoundError:
+            pass
+        size -= file.size
+        evicted_files += 1
+        evicted_bytes += file.size
+
+    remove_empty_dirs(args.root)
+    logging.info(
+        f"Package cache uses {size} of {max_size} bytes,"
+        f" evicted {evicted_files} files ({evicted_bytes} bytes)"
+    )
+
+    METRICS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    METRICS_PATH.write_text(
+        "# HELP package_cache_size_bytes Size of the shared package cache.\n"
+        "# TYPE package_cache_size_bytes gauge\n"
+        f"package_cache_size_bytes {size}\n"
+        "# HELP package_cache_max_size_bytes Maximum size of the shared package cache.\n"
+        "# TYPE package_cache_max_size_bytes gauge\n"
+        f"package_cache_max_size_bytes {max_size}\n"
+        "# HELP package_cache_evicted_bytes Bytes evicted by the last prune.\n"
+        "# TYPE package_cache_evicted_bytes gauge\n"
+        f"package_cache_evicted_bytes {evicted_bytes}\n",
+        encoding="utf-8",
+    )
+
+
+def walk_cache(root: Path) -> Iterator[Tuple[Path, List[str]]]:
+    """Walks the dirs of the package cache (top-down), yielding the files per dir."""
+
+    excluded = {root / path for path in EXCLUDED_DIRS}
+    for cache_dir in CACHE_DIRS:
+        for dir_path, dir_names, file_names in os.walk(root / cache_dir):
+            dir_names[:] = [
+                name for name in dir_names if Path(dir_path, name) not in excluded
+            ]
+            yield Path(dir_path), file_names
+
+
+def list_files(root: Path) -> List[CachedFile]:
+    """Lists all files in the package cache."""
+
+    files = []
+    for dir_path, file_names in walk_cache(root):
+        for file_name in file_names:
+            path = dir_path / file_name
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append(
+                CachedFile(
+                    path=path,
+                    size=stat.st_size,
+                    last_used=max(stat.st_atime, stat.st_mtime),
+                )
+            )
+    return files
+
+
+def remove_empty_dirs(root: Path) -> None:
+    """Removes the dirs that were left empty after evicting files."""
+
+    cache_dirs = {root / cache_dir for cache_dir in CACHE_DIRS}
+    dirs = [path for path, _ in walk_cache(root) if path not in cache_dirs]
+    # Remove sub dirs before their parents.
+    for path in reversed(dirs):
+        try:
+            path.rmdir()
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    main()
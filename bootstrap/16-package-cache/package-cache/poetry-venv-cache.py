@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+
+"""
+Cache of the virtualenvs of poetry projects, keyed by the poetry.lock of the project,
+the Python version and the platform. Instead of rebuilding the .venv of a project
+after every clone or branch switch with an unchanged poetry.lock, the venv is restored
+from the cache using reflinks (or hardlinks if the filesystem doesn't support reflinks),
+which takes seconds. Run in the project dir (as the user):
+
+  poetry-venv-cache install   # Restores the .venv, or runs `poetry install` + saves it.
+  poetry-venv-cache stats     # Reports the hits/misses and the size of the cache.
+
+The cache is stored next to the shared package cache (on the data disk by default) and
+capped in size by evicting the least recently restored venvs.
+"""
+
+import argparse
+from dataclasses import asdict, dataclass
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import shutil
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from workbench_utils import parse_size
+
+PACKAGE_CACHE_ENV = Path("/run/package-cache.env")
+METRICS_PATH = Path("/var/lib/workbench-metrics/poetry-venv-cache.prom")
+POETRY = Path.home() / ".poetry" / "bin" / "poetry"
+KEY_FILE = ".poetry-venv-cache-key"
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+@dataclass
+class Entry:
+    """Metadata of a cached venv."""
+
+    key: str
+    venv_path: str
+    size: int
+    created: float
+    last_used: float
+
+
+class VenvCache:
+    """Cache of venvs stored in a directory, with an entry dir per key."""
+
+    def __init__(self, root: Path, max_size: int) -> None:
+        self.root = root
+        self.max_size = max_size
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def lookup(self, key: str) -> Optional[Entry]:
+        """Returns the entry of a key (None if it isn't cached)."""
+
+        metadata_path = self.root / key / "metadata.json"
+        if not metadata_path.exists():
+            return None
+        return Entry(**json.loads(metadata_path.read_text(encoding="utf-8")))
+
+    def restore(self, entry: Entry, venv_path: Path, mode: str) -> str:
+        """Restores a cached venv into the given path, returning the link mode used."""
+
+        temp_path = venv_path.with_name(f"{venv_path.name}.restoring")
+        shutil.rmtree(temp_path, ignore_errors=True)
+        mode = link_tree(self.root / entry.key / "venv", temp_path, mode)
+        relocate(temp_path, entry.venv_path, str(venv_path))
+        (temp_path / KEY_FILE).write_text(entry.key, encoding="utf-8")
+
+        shutil.rmtree(venv_path, ignore_errors=True)
+        temp_path.rename(venv_path)
+
+        entry.last_used = time.time()
+        self.write_entry(entry)
+        return mode
+
+    def save(self, key: str, venv_path: Path) -> Entry:
+        """
+        Saves a venv in the cache. The venv is copied (using reflinks if possible), so
+        that later changes to the venv of the project don't change the cached venv.
+        """
+
+        temp_path = self.root / f"{key}.{os.getpid()}.tmp"
+        shutil.rmtree(temp_path, ignore_errors=True)
+        temp_path.mkdir()
+        subprocess.run(
+            ["cp", "-a", "--reflink=auto", str(venv_path), str(temp_path / "venv")],
+            check=True,
+        )
+        (temp_path / "venv" / KEY_FILE).unlink(missing_ok=True)
+
+        now = time.time()
+        entry = Entry(
+            key=key,
+            venv_path=str(venv_path),
+            size=tree_size(temp_path / "venv"),
+            created=now,
+            last_used=now,
+        )
+        (temp_path / "metadata.json").write_text(
+            json.dumps(asdict(entry)), encoding="utf-8"
+        )
+        try:
+            temp_path.rename(self.root / key)
+        except OSError:
+            # Saved concurrently by another project.
+            shutil.rmtree(temp_path, ignore_errors=True)
+        return entry
+
+    def write_entry(self, entry: Entry) -> None:
+        """Writes the metadata of an entry."""
+
+        (self.root / entry.key / "metadata.json").write_text(
+            json.dumps(asdict(entry)), encoding="utf-8"
+        )
+
+    def entries(self) -> List[Entry]:
+        """Returns all cached entries."""
+
+        entries = []
+        for metadata_path in self.root.glob("*/metadata.json"):
+            entries.append(Entry(**json.loads(metadata_path.read_text("utf-8"))))
+        return entries
+
+    def prune(self) -> int:
+        """Evicts the least recently used venvs until the cache fits, returns the count."""
+
+        entries = sorted(self.entries(), key=lambda entry: entry.last_used)
+        size = sum(entry.size for entry in entries)
+        evicted = 0
+        for entry in entries:
+            if size <= self.max_size:
+                break
+            logging.info(f"Evicting venv {entry.key} ({entry.size} bytes)")
+            shutil.rmtree(self.root / entry.key, ignore_errors=True)
+            size -= entry.size
+            evicted += 1
+
+        if evicted:
+            stats = self.load_stats()
+            stats["evictions"] += evicted
+            self.save_stats(stats)
+        return evicted
+
+    def record(self, outcome: str, seconds: float) -> None:
+        """Records the outcome (hit/miss) of an install in the stats."""
+
+        stats = self.load_stats()
+        stats[{"hit": "hits", "miss": "misses"}[outcome]] += 1
+        stats[f"last_{outcome}_seconds"] = seconds
+        self.save_stats(stats)
+
+    def load_stats(self) -> Dict[str, float]:
+        """Loads the recorded stats."""
+
+        stats: Dict[str, float] = {"hits": 0, "misses": 0, "evictions": 0}
+        stats_path = self.root / "stats.json"
+        if stats_path.exists():
+            stats.update(json.loads(stats_path.read_text(encoding="utf-8")))
+        return stats
+
+    def save_stats(self, stats: Dict[str, float]) -> None:
+        """Saves the recorded stats."""
+
+        (self.root / "stats.json").write_text(json.dumps(stats), encoding="utf-8")
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the recorded stats together with the size of the cache."""
+
+        stats = self.load_stats()
+        entries = self.entries()
+        stats["entries"] = len(entries)
+        stats["size_bytes"] = sum(entry.size for entry in entries)
+        stats["max_size_bytes"] = self.max_size
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+def main() -> None:
+    """Main function of the CLI."""
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "command", choices=["install", "restore", "save", "prune", "stats"]
+    )
+    parser.add_argument("project_dir", type=Path, nargs="?", default=Path("."))
+    parser.add_argument("--python", default="python3", help="Python of the venv")
+    parser.add_argument(
+        "--mode", choices=["auto", "reflink", "hardlink", "copy"], default="auto"
+    )
+    parser.add_argument("--cache-dir", type=Path)
+    parser.add_argument("--max-size")
+    args = parser.parse_args()
+
+    settings = read_package_cache_env()
+    cache = VenvCache(
+        root=args.cache_dir
+        or Path(settings.get("PACKAGE_CACHE_ROOT", Path.home() / ".cache"))
+        / "poetry-venvs",
+        max_size=parse_size(
+            args.max_size or settings.get("POETRY_VENV_CACHE_MAX_SIZE", "10G")
+        ),
+    )
+
+    if args.command == "stats":
+        json.dump(cache.stats(), sys.stdout, indent=2)
+        print()
+        return
+    if args.command == "prune":
+        logging.info(f"Evicted {cache.prune()} venvs")
+        write_metrics(cache.stats())
+        return
+
+    project_dir = args.project_dir.resolve()
+    venv_path = project_dir / ".venv"
+    key = compute_key(project_dir, args.python)
+
+    if args.command == "save":
+        cache.save(key, venv_path)
+        cache.prune()
+        return
+
+    start = time.perf_counter()
+    entry = cache.lookup(key)
+    if entry is not None:
+        if read_venv_key(venv_path) == key:
+            logging.info(f"{venv_path} is up to date ({key})")
+            return
+        mode = cache.restore(entry, venv_path, args.mode)
+        seconds = time.perf_counter() - start
+        logging.info(
+            f"Restored {venv_path} from cache ({key}, {mode}) in {seconds:.1f}s"
+        )
+        cache.record("hit", seconds)
+    elif args.command == "restore":
+        logging.info(f"No cached venv for {project_dir} ({key})")
+        cache.record("miss", 0.0)
+        write_metrics(cache.stats())
+        sys.exit(1)
+    else:
+        logging.info(
+            f"No cached venv for {project_dir} ({key}), running poetry install"
+        )
+        shutil.rmtree(venv_path, ignore_errors=True)
+        run_poetry(project_dir, ["env", "use", python_info(args.python)["executable"]])
+        run_poetry(project_dir, ["install"])
+        cache.save(key, venv_path)
+        (venv_path / KEY_FILE).write_text(key, encoding="utf-8")
+        seconds = time.perf_counter() - start
+        logging.info(f"Installed + saved {venv_path} ({key}) in {seconds:.1f}s")
+        cache.record("miss", seconds)
+        cache.prune()
+
+    write_metrics(cache.stats())
+
+
+def compute_key(project_dir: Path, python: str) -> str:
+    """Computes the key of a project's venv: its lock file, Python version + platform."""
+
+    lock_path = project_dir / "poetry.lock"
+    if not lock_path.exists():
+        sys.exit(f"No poetry.lock found in {project_dir}, run `poetry lock` first")
+
+    info = python_info(python)
+    digest = hashlib.sha256()
+    digest.update(lock_path.read_bytes())
+    digest.update(f"{info['version']}|{info['platform']}|{info['executable']}".encode())
+    return digest.hexdigest()[:16]
+
+
+def python_info(python: str) -> Dict[str, str]:
+    """Returns the version, platform and (resolved) executable of a Python."""
+
+    output = subprocess.run(
+        [
+            python,
+            "-c",
+            "import json, platform, sys; print(json.dumps({'version': sys.version,"
+            " 'platform': platform.platform(), 'executable': sys.executable}))",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    info: Dict[str, str] = json.loads(output)
+    info["executable"] = os.path.realpath(info["executable"])
+    return info
+
+
+def read_venv_key(venv_path: Path) -> Optional[str]:
+    """Returns the key of the venv that was restored/saved in a project (if any)."""
+
+    key_path = venv_path / KEY_FILE
+    return key_path.read_text(encoding="utf-8") if key_path.exists() else None
+
+
+def link_tree(source: Path, target: Path, mode: str) -> str:
+    """Copies a tree using reflinks, hardlinks or a plain copy, returns the mode used."""
+
+    modes = ["reflink", "hardlink", "copy"] if mode == "auto" else [mode]
+    for candidate in modes:
+        option = {
+            "reflink": "--reflink=always",
+            "hardlink": "--link",
+            "copy": "--reflink=never",
+        }[candidate]
+        result = subprocess.run(
+            ["cp", "-a", option, str(source), str(target)],
+            check=False,
+            capture_output=True,
+        )
+        if result.returncode == 0:
+            return candidate
+        shutil.rmtree(target, ignore_errors=True)
+    raise RuntimeError(f"Failed to copy {source} to {target}")
+
+
+def relocate(venv_path: Path, old_path: str, new_path: str) -> None:
+    """
+    Rewrites the absolute paths of the venv (in the scripts, activation scripts and
+    .pth files) from the path the venv was saved from to its new path. The files are
+    replaced instead of changed in place, so files linked to the cache aren't changed.
+    """
+
+    old_project, new_project = str(Path(old_path).parent), str(Path(new_path).parent)
+    if old_project == new_project:
+        return
+
+    files = [path for path in (venv_path / "bin").iterdir() if path.is_file()]
+    files += venv_path.glob("lib/python*/site-packages/*.pth")
+    pattern = re.compile(re.escape(old_project.encode()) + rb"(?=[/\s\"':]|$)")
+    for path in files:
+        content = path.read_bytes()
+        if b"\0" in content[:1024] or old_project.encode() not in content:
+            continue
+        temp_path = path.with_name(f".{path.name}.tmp")
+        temp_path.write_bytes(pattern.sub(new_project.encode(), content))
+        shutil.copymode(path, temp_path)
+        temp_path.replace(path)
+
+
+def tree_size(path: Path) -> int:
+    """Returns the size of all files in a tree."""
+
+    size = 0
+    for dir_path, _, file_names in os.walk(path):
+        for file_name in file_names:
+            size += os.lstat(os.path.join(dir_path, file_name)).st_size
+    return size
+
+
+def run_poetry(project_dir: Path, args: List[str]) -> None:
+    """Runs a poetry command in the project dir."""
+
+    subprocess.run(
+        [str(POETRY), *args],
+        cwd=project_dir,
+        env={**os.environ, "POETRY_VIRTUALENVS_IN_PROJECT": "true"},
+        check=True,
+    )
+
+
+def read_package_cache_env() -> Dict[str, str]:
+    """Reads the settings of the package cache (written by configure-package-cache.sh)."""
+
+    if not PACKAGE_CACHE_ENV.exists():
+        return {}
+    return dict(
+        line.split("=", 1)
+        for line in PACKAGE_CACHE_ENV.read_text(encoding="utf-8").splitlines()
+        if "=" in line
+    )
+
+
+def write_metrics(stats: Dict[str, float]) -> None:
+    """Writes the stats of the cache as Prometheus metrics (if writable)."""
+
+    metrics = {
+        "hits": ("counter", "Installs served from the venv cache."),
+        "misses": ("counter", "Installs that had to run poetry install."),
+        "evictions": ("counter", "Venvs evicted from the cache."),
+        "entries": ("gauge", "Number of cached venvs."),
+        "size_bytes": ("gauge", "Size of the venv cache."),
+        "max_size_bytes": ("gauge", "Maximum size of the venv cache."),
+    }
+    lines = []
+    for name, (metric_type, help_text) in metrics.items():
+        lines += [
+            f"# HELP poetry_venv_cache_{name} {help_text}",
+            f"# TYPE poetry_venv_cache_{name} {metric_type}",
+            f"poetry_venv_cache_{name} {stats.get(name, 0)}",
+        ]
+    try:
+        METRICS_PATH.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    except OSError as error:
+        logging.warning(f"Failed to write metrics: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,35 @@ set -o pipefail
 set -o nounset
 set -o xtrace
 
+USER=ubuntu
+USER_HOME_DIR=/home/ubuntu
+
 SCRIPT_DIR=`dirname $0 | xargs realpath`
 
 mkdir -p /opt/user-bootstrap
 cp ${SCRIPT_DIR}/user-bootstrap/* /opt/user-bootstrap/
 
+# 11-pyenv and 12-poetry install the toolchains into the home dir, as the pyenv shims
+# and the scripts of the poetry venv refer to their install location. The home dir is
+# replaced by the data disk on boot, so move them to the boot disk to seed them from.
+# They are seeded into the home dir using an overlay (if possible), which requires
+# them to be owned by the user (see seed-toolchain.sh).
+for TOOLCHAIN in pyenv poetry; do
+    if [ -d ${USER_HOME_DIR}/.${TOOLCHAIN} ]; then
+        rm -rf /opt/${TOOLCHAIN}
+        mv ${USER_HOME_DIR}/.${TOOLCHAIN} /opt/${TOOLCHAIN}
+        chown -R ${USER}:${USER} /opt/${TOOLCHAIN}
+    fi
+done
+
+# Build content-hashed manifests of the toolchains, used to sync the changes of
+# image updates into toolchains that were seeded on earlier boots.
+for TOOLCHAIN in pyenv poetry; do
+    if [ -d /opt/${TOOLCHAIN} ]; then
+        python3 /opt/user-bootstrap/toolchain-manifest.py build \
+            /opt/${TOOLCHAIN} /opt/user-bootstrap/manifests/${TOOLCHAIN}.json
+    fi
+done
+
 cp ${SCRIPT_DIR}/user-bootstrap.service /etc/systemd/system/user-bootstrap.service
 systemctl enable user-bootstrap
@@ -0,0 +1,105 @@
+#!/usr/bin/env bash
+
+# Seeds a toolchain (e.g. pyenv or poetry) from the boot disk into the users home dir,
+# without copying the whole toolchain up front. Usage:
+#
+#   seed-toolchain.sh <source dir> <target dir> <mode>
+#
+# Supported modes are:
+# - overlay: mounts an overlayfs on the target dir, with the toolchain on the boot disk
+#   as (read-only) lower layer and a directory on the data disk as upper layer. Only
+#   files that the user changes are copied (to the upper layer). Note that the overlay
+#   is (re)mounted on every boot.
+# - reflink: copies the toolchain using reflinks, which only share the data blocks
+#   (requires the source and target to be on the same filesystem supporting reflinks).
+# - copy: plain recursive copy of the toolchain.
+# - auto: tries overlay, then reflink and finally falls back to copy.
+#
+# For the overlay the toolchain on the boot disk needs to be owned by the user (see
+# install.sh), as the ownership of the lower layer is retained when files are copied up.
+#
+# The target is only seeded once, after that the seeded toolchain is managed by the user.
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+USER=ubuntu
+USER_HOME_DIR=/home/ubuntu
+
+SOURCE_DIR=$1
+TARGET_DIR=$2
+MODE=$3
+
+NAME=$(basename "${TARGET_DIR}" | sed 's/^\.//')
+OVERLAY_DIR=${USER_HOME_DIR}/.local/share/toolchain-overlays/${NAME}
+METRICS_FILE=/var/lib/workbench-metrics/toolchain-seed-${NAME}.prom
+
+seed_overlay() {
+    # Created as the user, so that new parent dirs (e.g. ~/.local) are owned by the user.
+    runuser --user ${USER} -- mkdir -p "${OVERLAY_DIR}/upper" "${OVERLAY_DIR}/work" "${TARGET_DIR}"
+    mountpoint -q "${TARGET_DIR}" || mount -t overlay overlay \
+        -o "lowerdir=${SOURCE_DIR},upperdir=${OVERLAY_DIR}/upper,workdir=${OVERLAY_DIR}/work" \
+        "${TARGET_DIR}"
+}
+
+seed_reflink() {
+    rm -rf "${TARGET_DIR}.tmp"
+    if ! cp -a --reflink=always "${SOURCE_DIR}" "${TARGET_DIR}.tmp" ; then
+        rm -rf "${TARGET_DIR}.tmp"
+        return 1
+    fi
+    mv "${TARGET_DIR}.tmp" "${TARGET_DIR}"
+    chown -R ${USER}:${USER} "${TARGET_DIR}"
+}
+
+seed_copy() {
+    cp -a "${SOURCE_DIR}" "${TARGET_DIR}"
+    chown -R ${USER}:${USER} "${TARGET_DIR}"
+}
+
+# Overlays need to be remounted on every boot.
+if [ -d "${OVERLAY_DIR}/upper" ]; then
+    MODE=overlay
+elif [ -e "${TARGET_DIR}" ]; then
+    echo "${TARGET_DIR} has already been seeded"
+    exit 0
+fi
+
+START=$(date +%s%N)
+
+case ${MODE} in
+    overlay|reflink|copy)
+        seed_${MODE}
+        ;;
+    auto)
+        if seed_overlay ; then
+            MODE=overlay
+        else
+            # Clean up the remains of the failed overlay.
+            rm -rf "${OVERLAY_DIR}"
+            rmdir "${TARGET_DIR}" || true
+            if seed_reflink ; then
+                MODE=reflink
+            else
+                seed_copy
+                MODE=copy
+            fi
+        fi
+        ;;
+    *)
+        echo "Unsupported seed mode: ${MODE}"
+        exit 1
+        ;;
+esac
+
+DURATION=$(awk "BEGIN { print ($(date +%s%N) - ${START}) / 1e9 }")
+echo "Seeded ${TARGET_DIR} from ${SOURCE_DIR} using ${MODE} in ${DURATION}s"
+
+mkdir -p "$(dirname "${METRICS_FILE}")"
+cat << EOF > "${METRICS_FILE}"
+# HELP toolchain_seed_seconds Time taken to seed the toolchain into the home dir.
+# TYPE toolchain_seed_seconds gauge
+toolchain_seed_seconds{toolchain="${NAME}",mode="${MODE}"} ${DURATION}
+EOF
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+"""
+Builds and syncs content-hashed manifests of the toolchains (pyenv, poetry) that are
+seeded into the users home dir.
+
+At image build time a manifest of each toolchain on the boot disk is built. On boot,
+the manifest of the current image is compared with the manifest of the image that was
+last synced into the home dir, and only files that were added or changed in the image
+are transferred. Files that the user modified (i.e. that no longer match the manifest
+stored in the home dir) are left alone.
+"""
+
+import argparse
+from dataclasses import dataclass
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import pwd
+import shutil
+from typing import Dict, Optional, Tuple
+
+MANIFEST_VERSION = 1
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+Entry = Dict[str, object]
+Manifest = Dict[str, Entry]
+
+
+@dataclass
+class SyncStats:
+    """Stats of a toolchain sync."""
+
+    files_transferred: int = 0
+    bytes_transferred: int = 0
+    files_skipped: int = 0
+
+
+def main() -> None:
+    """Main function that dispatches to the requested command."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build a toolchain manifest")
+    build_parser.add_argument("root", type=Path)
+    build_parser.add_argument("manifest", type=Path)
+
+    sync_parser = subparsers.add_parser(
+        "sync", help="Sync changes of the toolchain into the home dir"
+    )
+    sync_parser.add_argument("source", type=Path, help="Toolchain on the boot disk")
+    sync_parser.add_argument("source_manifest", type=Path)
+    sync_parser.add_argument("target", type=Path, help="Toolchain in the home dir")
+    sync_parser.add_argument("target_manifest", type=Path)
+    sync_parser.add_argument("--user", default="ubuntu")
+    sync_parser.add_argument("--metrics-file", type=Path)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        manifest = build_manifest(args.root)
+        write_manifest(args.manifest, manifest)
+        logging.info(f"Wrote manifest of {len(manifest)} files to {args.manifest}")
+        return
+
+    if os.path.ismount(args.target):
+        # Toolchains seeded using an overlay see the new image as their lower layer.
+        logging.info(f"{args.target} is an overlay, nothing to sync")
+        return
+
+    stats = sync(
+        args.source,
+        read_manifest(args.source_manifest) or {},
+        args.target,
+        read_manifest(args.target_manifest),
+        args.user,
+    )
+    logging.info(
+        f"Synced {args.target}: transferred {stats.files_transferred} files"
+        f" ({stats.bytes_transferred} bytes), skipped {stats.files_skipped} files"
+        " modified by the user"
+    )
+
+    args.target_manifest.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(args.source_manifest, args.target_manifest)
+    shutil.chown(args.target_manifest, args.user, args.user)
+    if args.metrics_file:
+        write_metrics(args.metrics_file, args.target.name.lstrip("."), stats)
+
+
+def build_manifest(root: Path) -> Manifest:
+    """Builds the manifest of all files and symlinks under the given root."""
+
+    manifest: Manifest = {}
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in file_names:
+            path = Path(dir_path) / file_name
+            manifest[str(path.relative_to(root))] = get_entry(path)
+    return manifest
+
+
+def get_entry(path: Path) -> Entry:
+    """Returns the manifest entry of a single file or symlink."""
+
+    if path.is_symlink():
+        return {"type": "symlink", "target": os.readlink(path)}
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    stat = path.stat()
+    return {
+        "type": "file",
+        "sha256": digest.hexdigest(),
+        "size": stat.st_size,
+        "mode": stat.st_mode & 0o7777,
+    }
+
+
+def sync(
+    source: Path,
+    source_manifest: Manifest,
+    target: Path,
+    target_manifest: Optional[Manifest],
+    user: str,
+) -> SyncStats:
+    """
+    Transfers the files that were added or changed in the source manifest, compared
+    to the target manifest (which describes the last synced image). Without a target
+    manifest, only missing files are transferred.
+    """
+
+    stats = SyncStats()
+    for relative_path, entry in sorted(source_manifest.items()):
+        previous = (target_manifest or {}).get(relative_path)
+        if previous == entry:
+            continue
+
+        path = target / relative_path
+        if path.exists() or path.is_symlink():
+            # Only replace files that the user didn't touch since the last sync.
+            if previous is None or not matches(path, previous):
+                stats.files_skipped += 1
+                continue
+
+        transfer(source / relative_path, path, target, entry, user)
+        stats.files_transferred += 1
+        stats.bytes_transferred += int(str(entry.get("size", 0)))
+
+    return stats
+
+
+def matches(path: Path, entry: Entry) -> bool:
+    """Whether a file in the home dir still matches its manifest entry."""
+
+    try:
+        return get_entry(path) == entry
+    except OSError:
+        return False
+
+
+def transfer(source: Path, path: Path, root: Path, entry: Entry, user: str) -> None:
+    """Atomically copies a file or symlink into the home dir, owned by the user."""
+
+    create_parents(path.parent, root, user)
+    temp_path = path.with_name(f".{path.name}.toolchain-sync")
+    if temp_path.is_symlink() or temp_path.exists():
+        temp_path.unlink()
+
+    if entry["type"] == "symlink":
+        os.symlink(str(entry["target"]), temp_path)
+    else:
+        shutil.copy2(source, temp_path)
+    os.chown(temp_path, *get_ids(user), follow_symlinks=False)
+    os.replace(temp_path, path)
+
+
+def create_parents(path: Path, root: Path, user: str) -> None:
+    """Creates the (missing) parent dirs of a file, owned by the user."""
+
+    missing = []
+    while not path.exists() and path != root:
+        missing.append(path)
+        path = path.parent
+    for directory in reversed(missing):
+        directory.mkdir()
+        shutil.chown(directory, user, user)
+
+
+def get_ids(user: str) -> Tuple[int, int]:
+    """Returns the UID and GID of a user."""
+
+    entry = pwd.getpwnam(user)
+    return entry.pw_uid, entry.pw_gid
+
+
+def read_manifest(path: Path) -> Optional[Manifest]:
+    """Reads a manifest (None if it doesn't exist or has an unknown version)."""
+
+    if not path.exists():
+        return None
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if data.get("version") != MANIFEST_VERSION:
+        return None
+    files: Manifest = data["files"]
+    return files
+
+
+def write_manifest(path: Path, manifest: Manifest) -> None:
+    """Writes a manifest."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps({"version": MANIFEST_VERSION, "files": manifest}, sort_keys=True),
+        encoding="utf-8",
+    )
+
+
+def write_metrics(path: Path, toolchain: str, stats: SyncStats) -> None:
+    """Writes the sync stats as Prometheus metrics."""
+
+    labels = f'toolchain="{toolchain}"'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        "# HELP toolchain_sync_files_transferred Files transferred by the last sync.\n"
+        "# TYPE toolchain_sync_files_transferred gauge\n"
+        f"toolchain_sync_files_transferred{{{labels}}} {stats.files_transferred}\n"
+        "# HELP toolchain_sync_bytes_transferred Bytes transferred by the last sync.\n"
+        "# TYPE toolchain_sync_bytes_transferred gauge\n"
+        f"toolchain_sync_bytes_transferred{{{labels}}} {stats.bytes_transferred}\n"
+        "# HELP toolchain_sync_files_skipped Files skipped as modified by the user.\n"
+        "# TYPE toolchain_sync_files_skipped gauge\n"
+        f"toolchain_sync_files_skipped{{{labels}}} {stats.files_skipped}\n",
+        encoding="utf-8",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@
 # This script handles any specific user configuration that can't be done
 # when the image has been built and therefore needs to be done at boot time.
 #
-# For example, here we copy + set up pyenv + poetry in the users home directory.
+# For example, here we seed + set up pyenv + poetry in the users home directory.
 # This can't be done at build time because the users home directory may be mounted
 # on the data disk, which isn't available at that time. Also, we can't keep
 # poetry/pyenv on the boot disk, as that would mean that anything the user changes
@@ -18,40 +18,55 @@ set -o xtrace
 USER=ubuntu
 USER_HOME_DIR=/home/ubuntu
 
-# Setup pyenv for the user.
-if [ ! -d "${USER_HOME_DIR}/.pyenv" ]; then
-    # Copy pyenv to the home dir so it can be managed by the user and
-    # will not dissappear/downgrade on boot disk updates.
-    cp -r /opt/pyenv ${USER_HOME_DIR}/.pyenv
-    chown -R ${USER}:${USER} ${USER_HOME_DIR}/.pyenv
-
-    # Setup bashrc to include pyenv inits.
-    if ! grep -q ".pyenv" ${USER_HOME_DIR}/.bashrc; then
-        cat << 'EOF' >> ${USER_HOME_DIR}/.bashrc
-export PYENV_ROOT="${HOME}/.pyenv"
-export PATH="${PYENV_ROOT}/bin:$PATH"
-eval "$(pyenv init --path)"
-eval "$(pyenv virtualenv-init -)"
-EOF
+get_attribute() {
+    curl --fail "http://metadata.google.internal/computeMetadata/v1/instance/attributes/$1" -H "Metadata-Flavor: Google"
+}
+
+# How pyenv/poetry are seeded into the home dir (see seed-toolchain.sh).
+SEED_MODE=$(get_attribute toolchain-seed-mode || echo "auto")
+
+[ -d "${USER_HOME_DIR}/.pyenv" ] && PYENV_SEEDED=true || PYENV_SEEDED=false
+[ -d "${USER_HOME_DIR}/.poetry" ] && POETRY_SEEDED=true || POETRY_SEEDED=false
+
+# Seed pyenv + poetry into the home dir so they can be managed by the user and
+# will not dissappear/downgrade on boot disk updates. This is done on every boot,
+# as toolchains seeded using an overlay need to be remounted.
+bash /opt/user-bootstrap/seed-toolchain.sh /opt/pyenv ${USER_HOME_DIR}/.pyenv "${SEED_MODE}"
+bash /opt/user-bootstrap/seed-toolchain.sh /opt/poetry ${USER_HOME_DIR}/.poetry "${SEED_MODE}"
+
+# Sync the changes of the toolchains in updated images into toolchains seeded on
+# earlier boots (see toolchain-manifest.py). Freshly seeded toolchains are up to date.
+for TOOLCHAIN in pyenv poetry; do
+    SEEDED=$([ "${TOOLCHAIN}" = pyenv ] && echo ${PYENV_SEEDED} || echo ${POETRY_SEEDED})
+    TOOLCHAIN_MANIFEST=${USER_HOME_DIR}/.local/share/toolchain-manifests/${TOOLCHAIN}.json
+    if [ "${SEEDED}" = true ]; then
+        python3 /opt/user-bootstrap/toolchain-manifest.py sync \
+            /opt/${TOOLCHAIN} /opt/user-bootstrap/manifests/${TOOLCHAIN}.json \
+            ${USER_HOME_DIR}/.${TOOLCHAIN} "${TOOLCHAIN_MANIFEST}" \
+            --user ${USER} \
+            --metrics-file /var/lib/workbench-metrics/toolchain-sync-${TOOLCHAIN}.prom
+    else
+        runuser --user ${USER} -- mkdir -p "$(dirname "${TOOLCHAIN_MANIFEST}")"
+        install --owner ${USER} --group ${USER} --mode 644 \
+            /opt/user-bootstrap/manifests/${TOOLCHAIN}.json "${TOOLCHAIN_MANIFEST}"
     fi
+done
+
+# Setup pyenv for the user.
+if [ "${PYENV_SEEDED}" = false ]; then
+    # The .bashrc is set up by pyenv-shell-init.service, which runs after this script.
 
-    # Rehash and set global Python version to fix stuck Python issue.
-    # TODO: Generate Python version from `pyenv versions`.
+    # Rehash and set global Python version to fix stuck Python issue. The global version
+    # of the image is the first of the PYTHON_VERSIONS it was built with (see 11-pyenv).
+    PYTHON_VERSION=$(head -n 1 /opt/pyenv/version)
     su ${USER} -c "${USER_HOME_DIR}/.pyenv/bin/pyenv rehash"
-    su ${USER} -c "${USER_HOME_DIR}/.pyenv/bin/pyenv global 3.9.14"
+    su ${USER} -c "${USER_HOME_DIR}/.pyenv/bin/pyenv global ${PYTHON_VERSION}"
 fi
 
 # Setup poetry for the user.
-if [ ! -d "${USER_HOME_DIR}/.poetry" ]; then
-    # Also copy Poetry to the home dir.
-    cp -r /opt/poetry ${USER_HOME_DIR}/.poetry
-    chown -R ${USER}:${USER} ${USER_HOME_DIR}/.poetry
-
-    # Add poetry to bashrc.
-    if ! grep -q ".poetry/bin" ${USER_HOME_DIR}/.bashrc; then
-        echo 'export PATH="${HOME}/.poetry/bin:$PATH"' >> ${USER_HOME_DIR}/.bashrc
-        su ${USER} -c "${USER_HOME_DIR}/.poetry/bin/poetry config virtualenvs.in-project true"
-    fi
+if [ "${POETRY_SEEDED}" = false ]; then
+    # Poetry is added to the PATH by pyenv-shell-init.service.
+    su ${USER} -c "${USER_HOME_DIR}/.poetry/bin/poetry config virtualenvs.in-project true"
 fi
 
 # Pre-create the openvscode-server extensions dir to avoid extension installation issues.
@@ -6,20 +6,16 @@ set -o nounset
 
 SCRIPT_DIR=$(dirname "$0" | xargs realpath)
 
-# Delay a moment for apt to be ready
-sleep 10
+# Run the steps as declared in their step.json (see build-runner.py): the apt packages
+# of all steps are installed in a single batch (after cloud-init has released apt),
+# independent steps run concurrently and unchanged steps are restored from the cache.
+# Disabled steps (13-rclone-mount, 20-user-bootstrap) can be enabled in their step.json.
+python3 "${SCRIPT_DIR}/build-runner.py" --steps-dir "${SCRIPT_DIR}"
 
-# Install critical components.
-bash "${SCRIPT_DIR}/00-user-config/install.sh"
-bash "${SCRIPT_DIR}/01-docker/install.sh"
-bash "${SCRIPT_DIR}/02-workbench-bootstrap/install.sh"
+# The grub config isn't cached (it's generated, e.g. from the kernel versions), only the
+# drop-ins in /etc/default/grub.d are: regenerate it with the drop-ins of all steps, as
+# the steps that run update-grub themselves may have been restored from the cache.
+update-grub
 
-# Install customizations.
-bash "${SCRIPT_DIR}/10-openvscode-server/install.sh"
-bash "${SCRIPT_DIR}/11-pyenv/install.sh"
-bash "${SCRIPT_DIR}/12-poetry/install.sh"
-# bash "${SCRIPT_DIR}/13-rclone-mount/install.sh"
-bash "${SCRIPT_DIR}/14-github-cli/install.sh"
-
-# Setup post-processing for configuring the user at boot.
-# bash "${SCRIPT_DIR}/20-user-bootstrap/install.sh"
+# The build cache is only reused through the bucket (if any), keep it out of the image.
+rm -rf /var/cache/workbench-build
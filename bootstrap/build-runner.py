@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+
+"""
+Runs the steps that build the image (the NN-*/install.sh scripts), based on the
+declaration of each step in its step.json:
+
+  {
+    "depends": ["01-docker"],       Steps that need to run before this step.
+    "apt": ["jq"],                  Ubuntu packages needed by the step.
+    "inputs": ["../shared"],        Extra inputs (the step dir is always an input).
+    "env": ["PYTHON_VERSIONS"],     Environment variables the step depends on.
+    "outputs": ["/opt/my-step"],    Files/dirs produced by the step (for caching).
+    "cacheable": true,              Whether the outputs fully capture the step.
+    "enabled": true                 Whether the step is part of the image.
+  }
+
+Independent steps are run concurrently. The apt packages of all steps are installed
+in a single batch up front (steps then skip their own apt calls, as signalled by the
+WORKBENCH_APT_BATCHED environment variable). The outputs of cacheable steps are stored
+as tarballs in a cache dir, keyed by a hash of the inputs of the step (and the keys of
+its dependencies), so that unchanged steps are restored from the cache instead of
+being run again. Finally, a per-step timing report is printed and written as JSON.
+
+To test the runner, point it to a dir of stub steps and skip the apt operations, e.g.
+in a container: python3 build-runner.py --steps-dir /tmp/stub-steps --skip-apt
+(tests/build-runner/test-build-runner.sh does so with a set of stub steps).
+"""
+
+import argparse
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Set
+
+STEP_FILE = "step.json"
+# Lets concurrent apt/dpkg calls of steps wait for each other instead of failing.
+APT_LOCK_CONFIG = Path("/etc/apt/apt.conf.d/90-workbench-build-lock")
+
+logging.basicConfig(format="[%(asctime)s] %(message)s", level=logging.INFO)
+
+
+@dataclass
+class Step:  # pylint: disable=too-many-instance-attributes
+    """Declaration of a build step."""
+
+    name: str
+    path: Path
+    depends: List[str] = field(default_factory=list)
+    apt: List[str] = field(default_factory=list)
+    inputs: List[str] = field(default_factory=list)
+    env: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    cacheable: bool = True
+    enabled: bool = True
+
+
+@dataclass
+class StepResult:
+    """Result of running (or restoring) a build step, used for the report."""
+
+    name: str
+    status: str
+    seconds: float
+    key: Optional[str] = None
+
+
+def main() -> None:
+    """Main function that runs the build."""
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--steps-dir", type=Path, default=Path(__file__).resolve().parent
+    )
+    parser.add_argument(
+        "--cache-dir", type=Path, default=Path("/var/cache/workbench-build")
+    )
+    parser.add_argument(
+        "--cache-bucket",
+        default=os.environ.get("WORKBENCH_BUILD_CACHE_BUCKET") or None,
+        help="GCS path to sync the cache with (e.g. gs://my-bucket/workbench-build)",
+    )
+    parser.add_argument(
+        "--log-dir", type=Path, default=Path("/var/log/workbench-build")
+    )
+    parser.add_argument(
+        "--report", type=Path, default=Path("/var/log/workbench-build/report.json")
+    )
+    # Most steps mostly wait on downloads, so run more steps than there are CPUs.
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--skip-apt", action="store_true", help="E.g. for stub steps")
+    parser.add_argument("--no-cache", action="store_true", help="Run all steps")
+    args = parser.parse_args()
+
+    steps = {
+        name: step for name, step in load_steps(args.steps_dir).items() if step.enabled
+    }
+    check_dependencies(steps)
+    keys = compute_keys(steps)
+
+    start = time.perf_counter()
+    results: List[StepResult] = []
+    env = dict(os.environ)
+
+    if not args.skip_apt:
+        apt_start = time.perf_counter()
+        install_apt_packages(
+            sorted({name for step in steps.values() for name in step.apt})
+        )
+        results.append(StepResult("apt", "built", time.perf_counter() - apt_start))
+        env["WORKBENCH_APT_BATCHED"] = "1"
+
+    args.log_dir.mkdir(parents=True, exist_ok=True)
+    args.cache_dir.mkdir(parents=True, exist_ok=True)
+    runner = StepRunner(
+        keys=keys,
+        env=env,
+        cache_dir=args.cache_dir,
+        cache_bucket=args.cache_bucket,
+        log_dir=args.log_dir,
+        use_cache=not args.no_cache,
+    )
+
+    try:
+        results += run_steps(steps, runner, args.jobs)
+    finally:
+        if not args.skip_apt:
+            APT_LOCK_CONFIG.unlink(missing_ok=True)
+        report(results, time.perf_counter() - start, args.report)
+
+    if any(result.status == "failed" for result in results):
+        sys.exit(1)
+
+
+def load_steps(steps_dir: Path) -> Dict[str, Step]:
+    """Loads the declarations of all steps in the steps dir."""
+
+    steps = {}
+    for step_file in sorted(steps_dir.glob(f"*/{STEP_FILE}")):
+        declaration = json.loads(step_file.read_text(encoding="utf-8"))
+        name = step_file.parent.name
+        steps[name] = Step(name=name, path=step_file.parent, **declaration)
+    return steps
+
+
+def check_dependencies(steps: Dict[str, Step]) -> None:
+    """Checks that all dependencies exist (and are enabled) and there are no cycles."""
+
+    for step in steps.values():
+        for dependency in step.depends:
+            if dependency not in steps:
+                raise ValueError(f"{step.name} depends on unknown step {dependency}")
+
+    done: Set[str] = set()
+    while len(done) < len(steps):
+        ready = [
+            name
+            for name, step in steps.items()
+            if name not in done and set(step.depends) <= done
+        ]
+        if not ready:
+            raise ValueError(f"Cyclic dependencies between {set(steps) - done}")
+        done.update(ready)
+
+
+def compute_keys(steps: Dict[str, Step]) -> Dict[str, str]:
+    """
+    Computes the cache key of each step, from its declaration, inputs and environment
+    variables, plus the keys of its dependencies (so that changing a step also
+    invalidates the steps that depend on it).
+    """
+
+    keys: Dict[str, str] = {}
+
+    def compute_key(step: Step) -> str:
+        if step.name not in keys:
+            digest = hashlib.sha256()
+            digest.update(step.name.encode())
+            for path in [step.path] + [step.path / path for path in step.inputs]:
+                hash_path(digest, path.resolve())
+            for name in step.env:
+                digest.update(f"{name}={os.environ.get(name, '')}".encode())
+            for dependency in sorted(step.depends):
+                digest.update(compute_key(steps[dependency]).encode())
+            keys[step.name] = digest.hexdigest()[:16]
+        return keys[step.name]
+
+    for step in steps.values():
+        compute_key(step)
+    return keys
+
+
+def hash_path(digest: "hashlib._Hash", path: Path) -> None:
+    """Adds the names, modes and contents of all files under a path to a digest."""
+
+    files = sorted(path.rglob("*")) if path.is_dir() else [path]
+    for file in files:
+        if file.is_file():
+            digest.update(str(file).encode())
+            digest.update(str(file.stat().st_mode & 0o777).encode())
+            digest.update(file.read_bytes())
+
+
+def install_apt_packages(packages: List[str]) -> None:
+    """Installs the apt packages of all steps in a single batch."""
+
+    # Wait for cloud-init to finish, as it may still be running apt on first boot.
+    if shutil.which("cloud-init"):
+        subprocess.run(["cloud-init", "status", "--wait"], check=False)
+
+    APT_LOCK_CONFIG.write_text('DPkg::Lock::Timeout "600";\n', encoding="utf-8")
+
+    logging.info(f"Installing apt packages: {' '.join(packages)}")
+    apt_env = {**os.environ, "DEBIAN_FRONTEND": "noninteractive"}
+    subprocess.run(["apt-get", "update"], check=True, env=apt_env)
+    if packages:
+        subprocess.run(["apt-get", "install", "-y", *packages], check=True, env=apt_env)
+
+
+class StepRunner:  # pylint: disable=too-few-public-methods
+    """Runs a single step, or restores its outputs from the cache."""
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        keys: Dict[str, str],
+        env: Dict[str, str],
+        cache_dir: Path,
+        cache_bucket: Optional[str],
+        log_dir: Path,
+        use_cache: bool,
+    ) -> None:
+        self.keys = keys
+        self.env = env
+        self.cache_dir = cache_dir
+        self.cache_bucket = cache_bucket
+        self.log_dir = log_dir
+        self.use_cache = use_cache
+
+    def run(self, step: Step) -> StepResult:
+        """Runs the step, returning its result."""
+
+        start = time.perf_counter()
+        key = self.keys[step.name]
+        cacheable = step.cacheable and bool(step.outputs)
+        tarball = self.cache_dir / f"{step.name}-{key}.tar.gz"
+
+        if cacheable and self.use_cache and self.fetch(tarball):
+            logging.info(f"Restoring {step.name} from cache ({key})")
+            subprocess.run(["tar", "-xzpf", str(tarball), "-C", "/"], check=True)
+            return StepResult(step.name, "cached", time.perf_counter() - start, key)
+
+        logging.info(f"Running {step.name}")
+        log_path = self.log_dir / f"{step.name}.log"
+        with open(log_path, "wb") as log:
+            result = subprocess.run(
+                ["bash", str(step.path / "install.sh")],
+                env=self.env,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                check=False,
+            )
+        if result.returncode != 0:
+            output = log_path.read_text(encoding="utf-8", errors="replace")
+            logging.error(f"{step.name} failed, last output:\n{output[-4000:]}")
+            return StepResult(step.name, "failed", time.perf_counter() - start, key)
+
+        if cacheable:
+            self.store(step, tarball)
+        return StepResult(step.name, "built", time.perf_counter() - start, key)
+
+    def fetch(self, tarball: Path) -> bool:
+        """Whether the tarball is in the cache (fetching it from the bucket if needed)."""
+
+        if not tarball.exists() and self.cache_bucket:
+            subprocess.run(
+                ["gsutil", "-q", "cp", f"{self.cache_bucket}/{tarball.name}", tarball],
+                check=False,
+                capture_output=True,
+            )
+        return tarball.exists()
+
+    def store(self, step: Step, tarball: Path) -> None:
+        """Stores the outputs of a step in the cache."""
+
+        outputs = [
+            output.lstrip("/") for output in step.outputs if os.path.lexists(output)
+        ]
+        temp_tarball = tarball.with_suffix(".tmp")
+        subprocess.run(
+            ["tar", "-czpf", str(temp_tarball), "-C", "/", *outputs], check=True
+        )
+        temp_tarball.rename(tarball)
+
+        if self.cache_bucket:
+            subprocess.run(
+                ["gsutil", "-q", "cp", tarball, f"{self.cache_bucket}/{tarball.name}"],
+                check=False,
+            )
+
+
+def run_steps(
+    steps: Dict[str, Step], runner: StepRunner, jobs: int
+) -> List[StepResult]:
+    """Runs all steps, running independent steps concurrently."""
+
+    results: List[StepResult] = []
+    done: Set[str] = set()
+    failed: Set[str] = set()
+    running: Dict["Future[StepResult]", str] = {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while True:
+            for name, step in steps.items():
+                if name in done or name in failed or name in running.values():
+                    continue
+                if set(step.depends) & failed:
+                    failed.add(name)
+                    results.append(StepResult(name, "skipped", 0.0))
+                elif set(step.depends) <= done:
+                    running[executor.submit(runner.run, step)] = name
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                result = future.result()
+                results.append(result)
+                (failed if result.status == "failed" else done).add(name)
+
+    return results
+
+
+def report(results: List[StepResult], seconds: float, path: Path) -> None:
+    """Prints the timing report and writes it as JSON."""
+
+    print(f"\n{'STEP':<28} {'STATUS':<8} {'SECONDS':>9}  KEY")
+    for result in results:
+        print(
+            f"{result.name:<28} {result.status:<8} {result.seconds:>9.1f}"
+            f"  {result.key or '-'}"
+        )
+    print(f"{'total':<28} {'':<8} {seconds:>9.1f}")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps(
+            {"seconds": seconds, "steps": [asdict(result) for result in results]},
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+
+
+if __name__ == "__main__":
+    main()
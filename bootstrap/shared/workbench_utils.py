@@ -0,0 +1,47 @@
+"""
+Shared helpers of the scripts installed by the bootstrap steps.
+
+The module lives in bootstrap/shared and is symlinked into the script dirs that use it,
+so that it is installed next to the scripts (the install.sh scripts copy the content).
+"""
+
+import re
+from typing import Optional
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+SIZE_SUFFIXES = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def get_attribute_value(key: str) -> Optional[str]:
+    """Fetches an attribute of the current VM (None if it isn't set)."""
+
+    request = Request(
+        f"http://metadata/computeMetadata/v1/instance/attributes/{key}",
+        headers={"Metadata-Flavor": "Google"},
+    )
+    try:
+        with urlopen(request, timeout=5) as result:
+            value: str = result.read().decode()
+    except (HTTPError, URLError):
+        return None
+    return value
+
+
+def get_total_memory() -> int:
+    """Returns the total memory of the machine in bytes."""
+
+    with open("/proc/meminfo", encoding="utf-8") as file:
+        for line in file:
+            if line.startswith("MemTotal:"):
+                return int(line.split()[1]) * 1024
+    raise ValueError("MemTotal not found in /proc/meminfo")
+
+
+def parse_size(value: str) -> int:
+    """Parses a size with an optional binary suffix (e.g. '512M', '20G') into bytes."""
+
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)I?B?\s*", value.upper())
+    if match is None:
+        raise ValueError(f"Invalid size '{value}'")
+    return int(float(match.group(1)) * SIZE_SUFFIXES[match.group(2)])
@@ -0,0 +1,10 @@
+#!/usr/bin/env bash
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+mkdir -p /tmp/workbench-build-test/outputs
+echo "${STUB_VALUE:-}" > /tmp/workbench-build-test/outputs/02-dependent
+echo 02-dependent >> /tmp/workbench-build-test/runs
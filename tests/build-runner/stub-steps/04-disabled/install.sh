@@ -0,0 +1,4 @@
+#!/usr/bin/env bash
+
+echo "Disabled steps must not be run"
+exit 1
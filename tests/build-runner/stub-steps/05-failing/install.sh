@@ -0,0 +1,12 @@
+#!/usr/bin/env bash
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+if [ -n "${STUB_FAIL:-}" ]; then
+    echo "Failing on request"
+    exit 1
+fi
+echo 05-failing >> /tmp/workbench-build-test/runs
@@ -0,0 +1,8 @@
+#!/usr/bin/env bash
+
+set -o errexit
+set -o pipefail
+set -o nounset
+set -o xtrace
+
+echo 06-after-failing >> /tmp/workbench-build-test/runs
@@ -0,0 +1,104 @@
+#!/usr/bin/env bash
+
+# Runs bootstrap/build-runner.py on the stub steps without the apt operations (so it
+# can be run e.g. in a container, without root) and checks the status of each step in
+# the reports: dependency order, skipping disabled steps, restoring unchanged steps
+# from the cache, invalidation through the environment and failing steps.
+
+set -o errexit
+set -o pipefail
+set -o nounset
+
+SCRIPT_DIR=$(dirname "$0" | xargs realpath)
+RUNNER=${SCRIPT_DIR}/../../bootstrap/build-runner.py
+# Also hardcoded in the outputs of the stub steps.
+TEST_DIR=/tmp/workbench-build-test
+
+run_build() {
+    local NAME=$1
+    shift
+    rm -f ${TEST_DIR}/runs
+    python3 "${RUNNER}" --steps-dir "${SCRIPT_DIR}/stub-steps" --skip-apt \
+        --cache-dir ${TEST_DIR}/cache \
+        --log-dir ${TEST_DIR}/logs \
+        --report ${TEST_DIR}/${NAME}.json \
+        "$@" > ${TEST_DIR}/${NAME}.log 2>&1
+}
+
+# Checks the status of the steps in a report, e.g. expect_statuses fresh 01-base=built.
+expect_statuses() {
+    python3 - ${TEST_DIR}/$1.json "${@:2}" << 'EOF'
+import json
+import sys
+
+report = json.load(open(sys.argv[1], encoding="utf-8"))
+statuses = {step["name"]: step["status"] for step in report["steps"]}
+expected = dict(arg.split("=") for arg in sys.argv[2:])
+if statuses != expected:
+    sys.exit(f"{sys.argv[1]}: expected {expected}, got {statuses}")
+EOF
+}
+
+# Checks the steps that ran (in any order, concurrent steps may interleave).
+expect_runs() {
+    local RUNS
+    RUNS=$(sort ${TEST_DIR}/runs 2> /dev/null | xargs || true)
+    if [ "${RUNS}" != "$*" ]; then
+        echo "Expected the steps '$*' to run, got '${RUNS}'"
+        exit 1
+    fi
+}
+
+expect_output() {
+    if [ "$(cat ${TEST_DIR}/outputs/$1)" != "$2" ]; then
+        echo "Expected output '$2' for $1, got '$(cat ${TEST_DIR}/outputs/$1)'"
+        exit 1
+    fi
+}
+
+rm -rf ${TEST_DIR}
+mkdir -p ${TEST_DIR}
+
+echo "Fresh build: all enabled steps are run, dependencies first"
+STUB_VALUE=1 run_build fresh
+expect_statuses fresh 01-base=built 02-dependent=built 03-uncacheable=built \
+    05-failing=built 06-after-failing=built
+expect_runs 01-base 02-dependent 03-uncacheable 05-failing 06-after-failing
+if [ "$(grep -n -e 01-base -e 02-dependent ${TEST_DIR}/runs | cut -d: -f2 | xargs)" != "01-base 02-dependent" ]; then
+    echo "Expected 01-base to run before 02-dependent"
+    exit 1
+fi
+
+echo "Unchanged build: cacheable steps are restored from the cache"
+rm -rf ${TEST_DIR}/outputs
+STUB_VALUE=1 run_build unchanged
+expect_statuses unchanged 01-base=cached 02-dependent=cached 03-uncacheable=built \
+    05-failing=built 06-after-failing=built
+expect_runs 03-uncacheable 05-failing 06-after-failing
+expect_output 01-base 1
+expect_output 02-dependent 1
+
+echo "Changed environment: only the steps depending on it are run again"
+STUB_VALUE=2 run_build changed
+expect_statuses changed 01-base=cached 02-dependent=built 03-uncacheable=built \
+    05-failing=built 06-after-failing=built
+expect_runs 02-dependent 03-uncacheable 05-failing 06-after-failing
+expect_output 02-dependent 2
+
+echo "Failing step: the build fails and the steps depending on it are skipped"
+if STUB_VALUE=2 STUB_FAIL=1 run_build failing; then
+    echo "Expected the build to fail"
+    exit 1
+fi
+expect_statuses failing 01-base=cached 02-dependent=cached 03-uncacheable=built \
+    05-failing=failed 06-after-failing=skipped
+expect_runs 03-uncacheable
+
+echo "Build without cache: all steps are run"
+STUB_VALUE=2 run_build no-cache --no-cache
+expect_statuses no-cache 01-base=built 02-dependent=built 03-uncacheable=built \
+    05-failing=built 06-after-failing=built
+expect_runs 01-base 02-dependent 03-uncacheable 05-failing 06-after-failing
+
+rm -rf ${TEST_DIR}
+echo "All build runner tests passed"